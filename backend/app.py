@@ -1,7 +1,9 @@
 # app.py - Main Flask application
+import atexit
 import os
 import sys
 import logging
+import threading
 from flask import Flask
 from flask_cors import CORS
 
@@ -9,6 +11,8 @@ from flask_cors import CORS
 from config import Config
 from database import db_manager
 from routes import register_routes
+from key_manager import key_manager
+from fast_json import install_json_provider
 
 # Import RSA core from demo folder
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
@@ -46,10 +50,21 @@ def create_app():
     """Create and configure Flask application"""
     app = Flask(__name__)
     CORS(app)
+    app.config['JSON_ENCODER_NAME'] = install_json_provider(app, Config.JSON_ENCODER)
     
     # Register routes
     register_routes(app)
     
+    # Set up log retention and indexes without holding up startup when MongoDB is slow or down
+    threading.Thread(target=db_manager.init_collection, name='mongo-init', daemon=True).start()
+    
+    # Write out queued logs when the process exits
+    atexit.register(db_manager.close)
+    
+    # Start the key pool (skip the debug reloader's watcher process)
+    if Config.KEY_POOL_ENABLED and (not Config.DEBUG or os.environ.get('WERKZEUG_RUN_MAIN') == 'true'):
+        key_manager.start_pool()
+    
     return app
 
 def main():
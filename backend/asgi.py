@@ -0,0 +1,159 @@
+# asgi.py - ASGI serving mode: admission control in front of the Flask routes, RSA math in a process pool
+#
+#   python asgi.py            (or: uvicorn asgi:app --host 0.0.0.0 --port 5000)
+import asyncio
+import json
+import logging
+from typing import Optional
+
+from a2wsgi import WSGIMiddleware
+
+from config import Config
+
+# Request handlers hand their rsa_core calls to the process pool (see offload.py)
+Config.CPU_OFFLOAD = True
+
+from app import create_app, setup_logging
+
+logger = logging.getLogger(__name__)
+
+# Routes that run RSA math; everything else (logs, stats, key listing...) is cheap or I/O bound
+CPU_PATHS = (
+    '/api/generate-key', '/api/encrypt', '/api/decrypt', '/api/sign', '/api/verify',
+    '/api/factor', '/api/keys/audit'
+)
+# Never queued, so health checks answer even under overload
+BYPASS_PATHS = ('/', '/api/health', '/api/metrics')
+# Server-sent event streams: long-lived and mostly idle, so they get their own lane instead of
+# holding io slots that /api/logs and /api/stats need
+SSE_PREFIX = '/api/jobs/'
+SSE_SUFFIX = '/events'
+
+class Lane:
+    """A concurrency limit plus a bounded queue of requests waiting for it"""
+
+    def __init__(self, name: str, limit: int, max_queue: int):
+        self.name = name
+        self.limit = max(1, limit)
+        self.max_queue = max_queue
+        self.active = 0
+        self.waiting = 0
+        self.admitted = 0
+        self.rejected = 0
+        self._sem: Optional[asyncio.Semaphore] = None
+
+    @property
+    def sem(self) -> asyncio.Semaphore:
+        # created lazily so it binds to the server's event loop
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(self.limit)
+        return self._sem
+
+    def stats(self) -> dict:
+        return {
+            'limit': self.limit,
+            'max_queue': self.max_queue,
+            'active': self.active,
+            'waiting': self.waiting,
+            'admitted': self.admitted,
+            'rejected': self.rejected
+        }
+
+class AdmissionControl:
+    """ASGI middleware: per-lane concurrency limits, bounded wait queues and fast 503s on overload"""
+
+    def __init__(self, app, cpu: Lane, io: Lane, sse: Lane, queue_timeout: float, retry_after: int):
+        self.app = app
+        self.lanes = {'cpu': cpu, 'io': io, 'sse': sse}
+        self.queue_timeout = queue_timeout
+        self.retry_after = retry_after
+
+    def lane_for(self, path: str) -> Optional[Lane]:
+        if path in BYPASS_PATHS:
+            return None
+        if path.startswith(CPU_PATHS):
+            return self.lanes['cpu']
+        if path.startswith(SSE_PREFIX) and path.endswith(SSE_SUFFIX):
+            return self.lanes['sse']
+        return self.lanes['io']
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await self._lifespan(receive, send)
+        if scope['type'] != 'http':
+            return await self.app(scope, receive, send)
+
+        lane = self.lane_for(scope['path'])
+        if lane is None:
+            return await self.app(scope, receive, send)
+
+        if lane.sem.locked() and lane.waiting >= lane.max_queue:
+            return await self._reject(send, lane, 'queue full')
+        lane.waiting += 1
+        try:
+            await asyncio.wait_for(lane.sem.acquire(), self.queue_timeout)
+        except asyncio.TimeoutError:
+            return await self._reject(send, lane, 'queue timeout')
+        finally:
+            lane.waiting -= 1
+
+        lane.active += 1
+        lane.admitted += 1
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            lane.active -= 1
+            lane.sem.release()
+
+    async def _reject(self, send, lane: Lane, reason: str):
+        lane.rejected += 1
+        logger.warning(f"Rejected request ({lane.name} lane, {reason}): {lane.active} active, {lane.waiting} waiting")
+        body = json.dumps({'success': False, 'error': 'Server busy, please retry later'}).encode()
+        await send({
+            'type': 'http.response.start',
+            'status': 503,
+            'headers': [
+                (b'content-type', b'application/json'),
+                (b'content-length', str(len(body)).encode()),
+                (b'retry-after', str(self.retry_after).encode())
+            ]
+        })
+        await send({'type': 'http.response.body', 'body': body})
+
+    async def _lifespan(self, receive, send):
+        # the wrapped WSGI app has no lifespan support; the Flask side needs no async setup
+        while True:
+            message = await receive()
+            if message['type'] == 'lifespan.startup':
+                await send({'type': 'lifespan.startup.complete'})
+            elif message['type'] == 'lifespan.shutdown':
+                await send({'type': 'lifespan.shutdown.complete'})
+                return
+
+    def stats(self) -> dict:
+        return {name: lane.stats() for name, lane in self.lanes.items()}
+
+def create_asgi_app() -> AdmissionControl:
+    """Flask app behind a thread-pool WSGI bridge and admission control"""
+    flask_app = create_app()
+    cpu = Lane('cpu', Config.ASGI_CPU_CONCURRENCY, Config.ASGI_CPU_QUEUE)
+    io = Lane('io', Config.ASGI_IO_CONCURRENCY, Config.ASGI_IO_QUEUE)
+    sse = Lane('sse', Config.ASGI_SSE_CONCURRENCY, 0)
+    # one bridge thread per admitted request, plus a few for bypass routes
+    bridge = WSGIMiddleware(flask_app, workers=cpu.limit + io.limit + sse.limit + 4)
+    admission = AdmissionControl(bridge, cpu, io, sse, Config.ASGI_QUEUE_TIMEOUT, Config.ASGI_RETRY_AFTER)
+    flask_app.config['ADMISSION'] = admission
+    return admission
+
+setup_logging()
+app = create_asgi_app()
+
+def main():
+    """Serve the API with uvicorn (single process; RSA math runs in the process pool)"""
+    import uvicorn
+
+    logger.info("Starting RSA Demo API Server (ASGI)")
+    uvicorn.run(app, host=Config.HOST, port=Config.PORT, log_level=Config.LOG_LEVEL.lower())
+
+if __name__ == '__main__':
+    main()
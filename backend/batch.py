@@ -0,0 +1,162 @@
+# batch.py - Batch encrypt/decrypt/verify with per-item results and process-pool fan-out
+import base64
+import binascii
+import logging
+import os
+import sys
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Import RSA core from demo folder
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+demo_dir = os.path.join(project_root, 'demo')
+sys.path.insert(0, demo_dir)
+
+from rsa_core import (
+    RSAKey, get_pool,
+    rsa_encrypt_text, rsa_decrypt_text,
+    rsa_encrypt_packed, rsa_decrypt_packed,
+    pack_packed, unpack_packed,
+    int_list_to_b64, b64_to_int_list,
+    rsa_sign, rsa_verify
+)
+from config import Config
+from metrics import observe_modexp
+from offload import run_cpu
+from validators import (
+    validate_encryption_request, validate_decryption_request,
+    validate_verify_request, ValidationError
+)
+
+logger = logging.getLogger(__name__)
+
+def _mode(item: dict) -> str:
+    return (item.get('mode') or 'text').strip().lower()
+
+def encrypt_item(key: RSAKey, item: dict) -> Dict[str, Any]:
+    """Encrypt one batch item, same result shape as /api/encrypt"""
+    mode = _mode(item)
+    if mode == 'text':
+        blocks_b64 = int_list_to_b64(rsa_encrypt_text(item['message'], key))
+        return {'success': True, 'mode': 'text', 'ciphertext_blocks_b64': blocks_b64,
+                'block_count': len(blocks_b64)}
+    if mode == 'packed':
+        blocks, sizes = rsa_encrypt_packed(item['message'], key)
+        return {'success': True, 'mode': 'packed', 'ciphertext': pack_packed(blocks, sizes),
+                'block_count': len(blocks)}
+    raise ValidationError("Invalid mode. Use 'text' or 'packed'")
+
+def decrypt_item(key: RSAKey, item: dict) -> Dict[str, Any]:
+    """Decrypt one batch item, same result shape as /api/decrypt"""
+    mode = _mode(item)
+    if mode == 'text':
+        plaintext = rsa_decrypt_text(b64_to_int_list(item['ciphertext_blocks_b64']), key)
+    else:
+        blocks, sizes = unpack_packed(item['ciphertext'])
+        plaintext = rsa_decrypt_packed(blocks, sizes, key)
+    return {'success': True, 'mode': mode, 'plaintext': plaintext}
+
+def sign_item(key: RSAKey, item: dict) -> Dict[str, Any]:
+    """Sign one message (CRT private operation), returning base64 signature and salt"""
+    signature, salt = rsa_sign(item['message'], key)
+    return {'success': True, 'signature': int_list_to_b64([signature])[0],
+            'salt': base64.b64encode(salt).decode()}
+
+def verify_item(key: RSAKey, item: dict) -> Dict[str, Any]:
+    """Verify one PSS-like signature against the key's public exponent"""
+    try:
+        signature = int.from_bytes(base64.b64decode(item['signature'], validate=True), 'big')
+        salt = base64.b64decode(item['salt'], validate=True)
+    except binascii.Error:
+        raise ValidationError('signature and salt must be base64 strings')
+    return {'success': True, 'is_valid': rsa_verify(item['message'], signature, salt, key)}
+
+OPERATIONS: Dict[str, Tuple[Callable[[dict], None], Callable[[RSAKey, dict], Dict[str, Any]]]] = {
+    'encrypt': (validate_encryption_request, encrypt_item),
+    'decrypt': (validate_decryption_request, decrypt_item),
+    'verify': (validate_verify_request, verify_item),
+}
+
+def _blocks(op: str, item: dict, result: Dict[str, Any]) -> int:
+    """Blocks one successful item went through, for the modexp metrics"""
+    if op == 'encrypt':
+        return result['block_count']
+    if op == 'decrypt':
+        return len(item['ciphertext_blocks_b64'] if _mode(item) == 'text' else item['ciphertext']['c'])
+    return 1
+
+def process_chunk(op: str, key: RSAKey, items: List[Tuple[int, dict]]) -> List[Tuple[int, Dict[str, Any], float]]:
+    """Run one operation over items sharing a key; runs inline or in a pool worker.
+
+    Each result carries its own timing, since metrics recorded in a pool worker never reach /api/metrics.
+    """
+    handler = OPERATIONS[op][1]
+    results = []
+    for idx, item in items:
+        start = time.perf_counter()
+        try:
+            results.append((idx, handler(key, item), time.perf_counter() - start))
+        except Exception as e:
+            results.append((idx, {'success': False, 'error': str(e)}, 0.0))
+    return results
+
+def _collect(op: str, key: RSAKey, items: list, done, results: list):
+    """Store a chunk's results and record modexp metrics for the items that succeeded"""
+    for idx, result, seconds in done:
+        results[idx] = result
+        if result['success']:
+            mode = 'pss' if op == 'verify' else result['mode']
+            observe_modexp(op, mode, key.n.bit_length(), _blocks(op, items[idx], result), seconds)
+
+def run_batch(op: str, items: list, get_key: Callable[[str], Optional[RSAKey]]) -> List[Dict[str, Any]]:
+    """Validate every item, look each key up once and fan the work out per key"""
+    validate, _ = OPERATIONS[op]
+    results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+    keys: Dict[str, Optional[RSAKey]] = {}
+    groups: Dict[str, List[Tuple[int, dict]]] = {}
+
+    for idx, item in enumerate(items):
+        try:
+            if not isinstance(item, dict):
+                raise ValidationError('Item must be an object')
+            validate(item)
+        except ValidationError as e:
+            results[idx] = {'success': False, 'error': str(e)}
+            continue
+
+        key_id = item['key_id']
+        if key_id not in keys:
+            keys[key_id] = get_key(key_id)
+        if keys[key_id] is None:
+            results[idx] = {'success': False, 'error': 'Key not found'}
+            continue
+        groups.setdefault(key_id, []).append((idx, item))
+
+    pending = sum(len(g) for g in groups.values())
+    workers = Config.BATCH_WORKERS
+    if workers > 1 and pending >= Config.BATCH_PARALLEL_MIN_ITEMS:
+        pool = get_pool(workers)
+        futures = []
+        for key_id, group in groups.items():
+            step = max(1, -(-len(group) // workers))
+            for i in range(0, len(group), step):
+                chunk = group[i:i + step]
+                futures.append((key_id, chunk, pool.submit(process_chunk, op, keys[key_id], chunk)))
+        for key_id, chunk, future in futures:
+            try:
+                done = future.result()
+            except Exception as e:
+                logger.error(f"Batch {op} worker failed: {e}", exc_info=True)
+                done = [(idx, {'success': False, 'error': str(e)}, 0.0) for idx, _ in chunk]
+            _collect(op, keys[key_id], items, done, results)
+    else:
+        # small batches: one offloadable call per key, so ASGI bridge threads still skip the math
+        for key_id, group in groups.items():
+            try:
+                done = run_cpu(process_chunk, op, keys[key_id], group)
+            except Exception as e:
+                logger.error(f"Batch {op} failed: {e}", exc_info=True)
+                done = [(idx, {'success': False, 'error': str(e)}, 0.0) for idx, _ in group]
+            _collect(op, keys[key_id], items, done, results)
+
+    return results
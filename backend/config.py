@@ -20,9 +20,123 @@ class Config:
     MAX_KEY_SIZE = 4096
     MIN_KEY_SIZE = 32
     
-    # Rate limiting
+    # Key storage: 'memory' (per process) or 'sqlite' (shared by all workers, survives restarts)
+    KEY_STORE = os.environ.get('KEY_STORE', 'memory')
+    KEY_STORE_PATH = os.environ.get('KEY_STORE_PATH', 'data/rsa_keys.sqlite3')
+    
+    # In-memory key cache bounds: LRU over entry count and bytes, optional default TTL in seconds (0 = none)
+    KEY_CACHE_MAX_ENTRIES = int(os.environ.get('KEY_CACHE_MAX_ENTRIES', 10000))
+    KEY_CACHE_MAX_BYTES = int(os.environ.get('KEY_CACHE_MAX_BYTES', 64 * 1024 * 1024))
+    KEY_CACHE_TTL = int(os.environ.get('KEY_CACHE_TTL', 0))
+    KEY_CACHE_SWEEP_INTERVAL = 30
+    
+    # Shared-prime audit (/api/keys/audit): key count allowed on the pure-Python big-int backend
+    AUDIT_PYTHON_MAX_KEYS = int(os.environ.get('AUDIT_PYTHON_MAX_KEYS', 500))
+    
+    # Key generation: >1 searches for p and q across a process pool
+    KEYGEN_WORKERS = int(os.environ.get('KEYGEN_WORKERS', 1))
+    
+    # Packed decryption: shard across a process pool above THRESHOLD (block count x key bits)
+    DECRYPT_WORKERS = int(os.environ.get('DECRYPT_WORKERS', os.cpu_count() or 1))
+    PARALLEL_DECRYPT_THRESHOLD = int(os.environ.get('PARALLEL_DECRYPT_THRESHOLD', 64 * 2048))
+    
+    # Run RSA math for request handlers in the shared process pool (turned on by asgi.py)
+    CPU_OFFLOAD = os.environ.get('CPU_OFFLOAD', 'False').lower() == 'true'
+    CPU_OFFLOAD_WORKERS = int(os.environ.get('CPU_OFFLOAD_WORKERS', os.cpu_count() or 1))
+    
+    # ASGI mode admission control: concurrent requests per lane, how many may wait, and for how long
+    ASGI_CPU_CONCURRENCY = int(os.environ.get('ASGI_CPU_CONCURRENCY', os.cpu_count() or 1))
+    ASGI_CPU_QUEUE = int(os.environ.get('ASGI_CPU_QUEUE', 32))
+    ASGI_IO_CONCURRENCY = int(os.environ.get('ASGI_IO_CONCURRENCY', 32))
+    ASGI_IO_QUEUE = int(os.environ.get('ASGI_IO_QUEUE', 256))
+    ASGI_SSE_CONCURRENCY = int(os.environ.get('ASGI_SSE_CONCURRENCY', 64))  # open job event streams; no queue
+    ASGI_QUEUE_TIMEOUT = float(os.environ.get('ASGI_QUEUE_TIMEOUT', 10))
+    ASGI_RETRY_AFTER = int(os.environ.get('ASGI_RETRY_AFTER', 2))
+    
+    # Pre-generated key pool, refilled in the background
+    KEY_POOL_ENABLED = os.environ.get('KEY_POOL_ENABLED', 'True').lower() == 'true'
+    KEY_POOL_SIZES = [int(b) for b in os.environ.get('KEY_POOL_SIZES', '1024,2048,4096').split(',') if b.strip()]
+    KEY_POOL_LOW_WATERMARK = int(os.environ.get('KEY_POOL_LOW_WATERMARK', 1))
+    KEY_POOL_HIGH_WATERMARK = int(os.environ.get('KEY_POOL_HIGH_WATERMARK', 3))
+    KEY_POOL_MAX_BYTES = int(os.environ.get('KEY_POOL_MAX_BYTES', 1024 * 1024))
+    
+    # Log writes: queued and flushed in batches by a background thread (False = insert_one per request)
+    LOG_WRITER_ENABLED = os.environ.get('LOG_WRITER_ENABLED', 'True').lower() == 'true'
+    LOG_QUEUE_SIZE = int(os.environ.get('LOG_QUEUE_SIZE', 10000))
+    LOG_BATCH_SIZE = int(os.environ.get('LOG_BATCH_SIZE', 500))
+    LOG_FLUSH_INTERVAL = float(os.environ.get('LOG_FLUSH_INTERVAL', 1.0))
+    LOG_OVERFLOW_POLICY = os.environ.get('LOG_OVERFLOW_POLICY', 'drop_oldest')  # or 'drop_new'
+    LOG_SHUTDOWN_TIMEOUT = 10
+    LOG_BATCH_MAX_ITEMS = 1000
+    
+    # Log retention: 'ttl' (TTL index on timestamp), 'capped' (fixed-size collection) or 'none'
+    LOG_RETENTION_MODE = os.environ.get('LOG_RETENTION_MODE', 'ttl').strip().lower()
+    LOG_RETENTION_DAYS = float(os.environ.get('LOG_RETENTION_DAYS', 30))
+    LOG_CAPPED_SIZE_MB = int(os.environ.get('LOG_CAPPED_SIZE_MB', 256))
+    LOG_CAPPED_MAX_DOCS = int(os.environ.get('LOG_CAPPED_MAX_DOCS', 0))
+    LOG_PRUNE_BATCH_SIZE = 1000
+    LOG_PRUNE_PAUSE_MS = 20
+    LOG_PRUNE_MAX_BATCHES = 100  # per HTTP request; callers repeat while the response says 'more'
+    LOG_PRUNE_MAX_DAYS = 36500
+    
+    # /api/stats: rollup granularity (seconds) and the most buckets one query may return per series
+    STATS_ROLLUP_SECONDS = 60
+    STATS_MAX_BUCKETS = 1440
+    
+    # Log retrieval: page size cap for GET /api/logs, documents per Mongo batch for the NDJSON export
+    LOG_PAGE_MAX = 1000
+    LOG_EXPORT_BATCH_SIZE = 1000
+    
+    # JSON encoder for responses: 'auto' (orjson if installed), 'orjson' or 'json'
+    JSON_ENCODER = os.environ.get('JSON_ENCODER', 'auto')
+    
+    # Batch encrypt/decrypt
+    BATCH_MAX_ITEMS = 1000
+    VERIFY_BATCH_MAX_ITEMS = 10000
+    BATCH_WORKERS = int(os.environ.get('BATCH_WORKERS', os.cpu_count() or 1))
+    BATCH_PARALLEL_MIN_ITEMS = 32
+    
+    # Factorization engine (demo-size moduli)
+    FACTOR_MAX_BITS = 256
+    FACTOR_DEFAULT_BUDGET_MS = 5000
+    FACTOR_MAX_BUDGET_MS = 60000
+    FACTOR_DEFAULT_WAIT_MS = 1000
+    FACTOR_WORKERS = int(os.environ.get('FACTOR_WORKERS', min(4, os.cpu_count() or 1)))
+    FACTOR_MAX_JOBS = 64
+    FACTOR_CACHE_SIZE = 1024
+    FACTOR_JOB_TTL = 600  # seconds a finished job stays queryable
+    
+    # Background key generation jobs (/api/jobs)
+    JOB_WORKERS = int(os.environ.get('JOB_WORKERS', min(4, os.cpu_count() or 1)))
+    JOB_MAX_JOBS = 32  # queued + running
+    JOB_RESULT_TTL = 600  # seconds a finished job stays queryable
+    JOB_SSE_INTERVAL = 0.5  # seconds between progress events
+    
+    # Streaming encrypt/decrypt
+    STREAM_CHUNK_SIZE = 64 * 1024
+    STREAM_MAX_LINE = 8 * 1024
+    STREAM_UNKNOWN_LENGTH_BYTES = 1024 * 1024  # size the rate limiter charges for chunked bodies
+    
+    # Rate limiting: a token bucket per client holding MAX_REQUESTS_PER_WINDOW cost units, refilled over
+    # RATE_LIMIT_WINDOW. A request costs 1 unit plus 1 per RATE_LIMIT_COST_UNIT_MS of estimated RSA work.
+    # Backend 'memory' (per process) or 'sqlite' (shared by all workers on the host)
+    RATE_LIMIT_ENABLED = os.environ.get('RATE_LIMIT_ENABLED', 'True').lower() == 'true'
     RATE_LIMIT_WINDOW = 60  # seconds
-    MAX_REQUESTS_PER_WINDOW = 100
+    MAX_REQUESTS_PER_WINDOW = int(os.environ.get('MAX_REQUESTS_PER_WINDOW', 100))
+    RATE_LIMIT_COST_UNIT_MS = float(os.environ.get('RATE_LIMIT_COST_UNIT_MS', 25))
+    RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+    RATE_LIMIT_PATH = os.environ.get('RATE_LIMIT_PATH', 'data/rate_limits.sqlite3')
+    RATE_LIMIT_MAX_CLIENTS = 100000
+    RATE_LIMIT_TRUST_PROXY = os.environ.get('RATE_LIMIT_TRUST_PROXY', 'False').lower() == 'true'  # client = X-Forwarded-For
+    
+    # Prometheus-style metrics at /api/metrics (per process)
+    METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'True').lower() == 'true'
+    
+    # Per-request profiling: send 'X-Profile: 1' (or ?profile=1) to trace that one request. Off unless
+    # PROFILING_ENABLED; with PROFILE_TOKEN set, the header must carry the token instead of 1
+    PROFILING_ENABLED = os.environ.get('PROFILING_ENABLED', 'False').lower() == 'true'
+    PROFILE_TOKEN = os.environ.get('PROFILE_TOKEN', '')
+    PROFILE_STORE_MAX = 50
     
     # Logging
     LOG_LEVEL = os.environ.get('LOG_LEVEL', 'INFO')
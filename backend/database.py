@@ -1,33 +1,57 @@
 # database.py - Database connection and operations
+import base64
 import logging
-from typing import Optional, Dict, Any, List
-from pymongo import MongoClient
+import time
+from datetime import datetime, timezone
+from typing import Optional, Dict, Any, Iterator, List, Tuple
+from bson import ObjectId, json_util
+from pymongo import ASCENDING, DESCENDING, MongoClient, UpdateOne
 from pymongo.collection import Collection
 from config import Config
+from log_writer import LogWriter
+from metrics import MONGO_WRITE_LATENCY, MONGO_WRITE_FAILURES
+from stats import rollup_updates, stats_pipeline, summarize
 
 logger = logging.getLogger(__name__)
 
+# Fields returned by log queries (everything the API stores)
+LOG_PROJECTION = {
+    'type': 1, 'message': 1, 'timestamp': 1, 'operation': 1, 'keyId': 1, 'duration': 1,
+    'blockCount': 1, 'isValid': 1, 'bitLength': 1, 'signatureLength': 1
+}
+
 class DatabaseManager:
     """Manages database connections and operations"""
     
-    def __init__(self):
+    def __init__(self, client: Optional[MongoClient] = None):
         self.client: Optional[MongoClient] = None
         self.db = None
         self.logs_collection: Optional[Collection] = None
-        self._connect()
+        self.rollups_collection: Optional[Collection] = None
+        self.writer: Optional[LogWriter] = None
+        self._connect(client)
+        if Config.LOG_WRITER_ENABLED:
+            self.writer = LogWriter(
+                self._insert_many,
+                max_queue=Config.LOG_QUEUE_SIZE,
+                batch_size=Config.LOG_BATCH_SIZE,
+                flush_interval=Config.LOG_FLUSH_INTERVAL,
+                overflow=Config.LOG_OVERFLOW_POLICY
+            )
     
-    def _connect(self):
-        """Establish MongoDB connection"""
+    def _connect(self, client: Optional[MongoClient] = None):
+        """Establish MongoDB connection (client lets tests pass e.g. a mongomock client)"""
         try:
             logger.info(f"Connecting to MongoDB: {Config.MONGODB_URI[:30]}...")
             
-            self.client = MongoClient(
+            self.client = client or MongoClient(
                 Config.MONGODB_URI,
                 serverSelectionTimeoutMS=5000,
                 tlsAllowInvalidCertificates=True
             )
             self.db = self.client.get_database(Config.DATABASE_NAME)
             self.logs_collection = self.db.logs
+            self.rollups_collection = self.db.log_rollups
             
             logger.info("MongoDB client created successfully")
         except Exception as e:
@@ -35,57 +59,331 @@ class DatabaseManager:
             self.client = None
             self.db = None
             self.logs_collection = None
+            self.rollups_collection = None
     
     def is_connected(self) -> bool:
         """Check if database is connected"""
         return self.client is not None and self.logs_collection is not None
     
+    def _insert_many(self, entries: List[Dict[str, Any]]):
+        """Write a batch for the log writer; unordered so one bad document does not stop the rest"""
+        self._timed_write('insert_many', self.logs_collection.insert_many, entries, ordered=False)
+        self._update_rollups(entries)
+    
+    @staticmethod
+    def _timed_write(op: str, write, *args, **kwargs):
+        """Run one MongoDB write, recording its latency or failure"""
+        start = time.perf_counter()
+        try:
+            result = write(*args, **kwargs)
+        except Exception:
+            MONGO_WRITE_FAILURES.labels(op).inc()
+            raise
+        MONGO_WRITE_LATENCY.labels(op).observe(time.perf_counter() - start)
+        return result
+    
+    def _update_rollups(self, entries: List[Dict[str, Any]]):
+        """Fold newly written logs into the per-bucket timing rollups behind /api/stats"""
+        try:
+            updates = rollup_updates(entries, Config.STATS_ROLLUP_SECONDS)
+            if updates:
+                self._timed_write('rollups', self.rollups_collection.bulk_write, updates, ordered=False)
+        except Exception as e:
+            # the logs themselves are stored; only the pre-aggregated stats miss this batch
+            logger.warning(f"Could not update stats rollups: {str(e)[:100]}")
+    
     def save_log(self, log_data: Dict[str, Any]) -> bool:
-        """Save log entry to database"""
+        """Save log entry to database (queued for the background writer when enabled)"""
         if not self.is_connected():
             logger.debug("MongoDB not connected, skipping log save")
             return False
         
+        if self.writer is not None:
+            return self.writer.submit(log_data)
+        
         try:
-            self.logs_collection.insert_one(log_data)
+            self._timed_write('insert_one', self.logs_collection.insert_one, log_data)
+            self._update_rollups([log_data])
             logger.info("Log saved to MongoDB")
             return True
         except Exception as e:
             logger.debug(f"Could not save to MongoDB: {str(e)[:100]}")
             return False
     
-    def get_logs(self, limit: int = 50) -> List[Dict[str, Any]]:
-        """Get logs from database"""
+    def save_logs(self, entries: List[Dict[str, Any]]) -> int:
+        """Save several log entries; returns how many were accepted"""
+        if not self.is_connected():
+            logger.debug("MongoDB not connected, skipping log save")
+            return 0
+        
+        if self.writer is not None:
+            return self.writer.submit_many(entries)
+        
+        try:
+            self._insert_many(entries)
+            return len(entries)
+        except Exception as e:
+            logger.debug(f"Could not save to MongoDB: {str(e)[:100]}")
+            return 0
+    
+    def writer_stats(self) -> Optional[dict]:
+        """Background log writer queue depth and counters (None when writes are synchronous)"""
+        return self.writer.stats() if self.writer is not None else None
+    
+    def init_collection(self):
+        """Startup setup: retention first (a capped collection must exist before indexes create it)"""
+        self.ensure_retention()
+        self.ensure_indexes()
+        self.migrate_legacy_timestamps()
+    
+    def migrate_legacy_timestamps(self, batch_size: Optional[int] = None) -> int:
+        """Convert logs whose timestamp is a local-time ISO string (legacy entries) to BSON dates.
+        
+        Strings sort apart from dates, so until converted these logs are skipped by keyset
+        pagination and never expire under the TTL index. Runs in _id order, batch by batch.
+        """
+        if not self.is_connected():
+            return 0
+        if Config.LOG_RETENTION_MODE == 'capped':
+            # documents in a capped collection cannot change size; they age out instead
+            return 0
+        
+        batch_size = batch_size or Config.LOG_PRUNE_BATCH_SIZE
+        converted = 0
+        last_id = None
+        try:
+            while True:
+                query: Dict[str, Any] = {'timestamp': {'$type': 'string'}}
+                if last_id is not None:
+                    query['_id'] = {'$gt': last_id}
+                docs = list(self.logs_collection.find(query, {'timestamp': 1}).sort('_id', ASCENDING).limit(batch_size))
+                if not docs:
+                    break
+                last_id = docs[-1]['_id']
+                updates = []
+                for doc in docs:
+                    try:
+                        # naive strings are local time; BSON dates are stored as UTC
+                        timestamp = datetime.fromisoformat(doc['timestamp']).astimezone(timezone.utc)
+                    except ValueError:
+                        continue
+                    updates.append(UpdateOne({'_id': doc['_id']}, {'$set': {'timestamp': timestamp}}))
+                if updates:
+                    converted += self.logs_collection.bulk_write(updates, ordered=False).modified_count
+                if len(docs) < batch_size:
+                    break
+                time.sleep(Config.LOG_PRUNE_PAUSE_MS / 1000)
+        except Exception as e:
+            logger.warning(f"Could not migrate legacy log timestamps: {str(e)[:100]}")
+        
+        if converted:
+            logger.info(f"Converted {converted} legacy log timestamps to dates")
+        return converted
+    
+    def ensure_indexes(self) -> bool:
+        """Create the indexes behind log listing, filtering and keyset pagination"""
+        if not self.is_connected():
+            return False
+        
+        try:
+            self.logs_collection.create_index([('timestamp', DESCENDING), ('_id', DESCENDING)], name='timestamp_id')
+            self.logs_collection.create_index([('operation', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)], name='operation_timestamp_id')
+            self.logs_collection.create_index([('keyId', ASCENDING), ('timestamp', DESCENDING), ('_id', DESCENDING)], name='keyId_timestamp_id')
+            self.rollups_collection.create_index([('operation', ASCENDING), ('bitLength', ASCENDING), ('bucket', ASCENDING)],
+                                                 name='operation_bits_bucket', unique=True)
+            self.rollups_collection.create_index('bucket', name='bucket')
+            logger.info("MongoDB log indexes ready")
+            return True
+        except Exception as e:
+            logger.warning(f"Could not create log indexes: {str(e)[:100]}")
+            return False
+    
+    @staticmethod
+    def _log_query(filters: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Translate API filters (operation, keyId, type, since, until) into a Mongo query"""
+        filters = filters or {}
+        query: Dict[str, Any] = {}
+        for field in ('operation', 'keyId', 'type'):
+            if filters.get(field) is not None:
+                query[field] = filters[field]
+        time_range = {}
+        if filters.get('since') is not None:
+            time_range['$gte'] = filters['since']
+        if filters.get('until') is not None:
+            time_range['$lt'] = filters['until']
+        if time_range:
+            query['timestamp'] = time_range
+        return query
+    
+    @staticmethod
+    def encode_cursor(log: Dict[str, Any]) -> str:
+        """Opaque cursor pointing just past a log (its timestamp and _id)"""
+        raw = json_util.dumps([log['timestamp'], log['_id']])
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+    
+    @staticmethod
+    def decode_cursor(cursor: str) -> Tuple[Any, ObjectId]:
+        """Inverse of encode_cursor; raises ValueError on a malformed cursor"""
+        try:
+            timestamp, oid = json_util.loads(base64.urlsafe_b64decode(cursor.encode()))
+        except Exception:
+            raise ValueError('Invalid cursor')
+        if not isinstance(oid, ObjectId):
+            raise ValueError('Invalid cursor')
+        return timestamp, oid
+    
+    def _find_logs(self, filters: Optional[Dict[str, Any]] = None, cursor: Optional[str] = None):
+        """Newest-first cursor over matching logs; keyset pagination continues after `cursor`"""
+        query = self._log_query(filters)
+        if cursor:
+            timestamp, oid = self.decode_cursor(cursor)
+            query = {'$and': [query, {'$or': [
+                {'timestamp': {'$lt': timestamp}},
+                {'timestamp': timestamp, '_id': {'$lt': oid}}
+            ]}]}
+        return self.logs_collection.find(query, LOG_PROJECTION).sort([('timestamp', DESCENDING), ('_id', DESCENDING)])
+    
+    @staticmethod
+    def _to_json(log: Dict[str, Any]) -> Dict[str, Any]:
+        # ObjectId and BSON dates (stored as UTC) become strings for the API
+        log['_id'] = str(log['_id'])
+        if isinstance(log.get('timestamp'), datetime):
+            log['timestamp'] = log['timestamp'].replace(tzinfo=timezone.utc).isoformat()
+        return log
+    
+    def get_logs(self, limit: int = 50, cursor: Optional[str] = None,
+                 filters: Optional[Dict[str, Any]] = None) -> Optional[Tuple[List[Dict[str, Any]], Optional[str]]]:
+        """Get one page of logs, newest first, plus the next page's cursor (None on the last); None if MongoDB is down"""
         if not self.is_connected():
             logger.error("MongoDB not connected")
-            return []
+            return None
         
         try:
-            logs = list(self.logs_collection.find().sort('timestamp', -1).limit(limit))
-            # Convert ObjectId to string
+            # one extra document tells us whether another page exists
+            logs = list(self._find_logs(filters, cursor).limit(limit + 1))
+            next_cursor = self.encode_cursor(logs[limit - 1]) if len(logs) > limit else None
+            logs = logs[:limit]
             for log in logs:
-                log['_id'] = str(log['_id'])
-            return logs
+                self._to_json(log)
+            return logs, next_cursor
+        except ValueError:
+            raise
         except Exception as e:
             logger.error(f"Error getting logs: {e}", exc_info=True)
-            return []
+            return None
     
-    def clear_logs(self) -> int:
-        """Clear all logs from database"""
+    def iter_logs(self, filters: Optional[Dict[str, Any]] = None, batch_size: int = 1000) -> Iterator[Dict[str, Any]]:
+        """Yield every matching log, newest first, holding one server batch in memory at a time"""
         if not self.is_connected():
             logger.error("MongoDB not connected")
-            return 0
+            return
+        
+        for log in self._find_logs(filters).batch_size(batch_size):
+            yield self._to_json(log)
+    
+    def get_stats(self, since: float, until: float, step: int,
+                  filters: Optional[Dict[str, Any]] = None) -> Optional[List[Dict[str, Any]]]:
+        """Timing stats per operation and key size in `step`-second buckets (epoch seconds range)"""
+        if not self.is_connected():
+            logger.error("MongoDB not connected")
+            return None
         
         try:
-            result = self.logs_collection.delete_many({})
-            logger.info(f"Cleared {result.deleted_count} logs")
-            return result.deleted_count
+            groups = self.rollups_collection.aggregate(stats_pipeline(since, until, step, filters or {}))
+            return summarize(groups)
         except Exception as e:
-            logger.error(f"Error clearing logs: {e}", exc_info=True)
+            logger.error(f"Error getting stats: {e}", exc_info=True)
+            return None
+    
+    def _ensure_ttl_index(self, collection: Collection, field: str, name: str, expire: int):
+        """Create a TTL index on field, or change the expiry of the existing one in place"""
+        existing = collection.index_information().get(name)
+        if existing and existing.get('expireAfterSeconds') != expire:
+            # change the expiry in place instead of rebuilding the index
+            self.db.command({'collMod': collection.name,
+                             'index': {'name': name, 'expireAfterSeconds': expire}})
+        elif not existing:
+            collection.create_index(field, name=name, expireAfterSeconds=expire)
+    
+    def ensure_retention(self) -> bool:
+        """Apply Config.LOG_RETENTION_MODE (TTL index on timestamp, or a capped logs collection); rollups always get a TTL"""
+        mode = Config.LOG_RETENTION_MODE
+        if not self.is_connected() or mode == 'none':
+            return False
+        
+        try:
+            expire = int(Config.LOG_RETENTION_DAYS * 86400)
+            if mode == 'ttl':
+                self._ensure_ttl_index(self.logs_collection, 'timestamp', 'timestamp_ttl', expire)
+                logger.info(f"Log retention: TTL index, {Config.LOG_RETENTION_DAYS} days")
+            elif mode == 'capped':
+                name = self.logs_collection.name
+                if name not in self.db.list_collection_names():
+                    options = {'capped': True, 'size': Config.LOG_CAPPED_SIZE_MB * 1024 * 1024}
+                    if Config.LOG_CAPPED_MAX_DOCS:
+                        options['max'] = Config.LOG_CAPPED_MAX_DOCS
+                    self.db.create_collection(name, **options)
+                elif not self.logs_collection.options().get('capped'):
+                    # converting an existing collection copies it under a lock, so leave that to an operator
+                    logger.warning(f"Log retention: '{name}' already exists and is not capped; "
+                                   f"run convertToCapped manually to switch modes")
+                    return False
+                logger.info(f"Log retention: capped collection, {Config.LOG_CAPPED_SIZE_MB} MB")
+            else:
+                raise ValueError(f"Unknown log retention mode: {mode}")
+            # stats rollups outlive the logs they summarize unless they expire too
+            self._ensure_ttl_index(self.rollups_collection, 'start', 'start_ttl', expire)
+            return True
+        except Exception as e:
+            logger.warning(f"Could not apply log retention: {str(e)[:100]}")
+            return False
+    
+    def prune_logs(self, older_than: Optional[datetime] = None, batch_size: Optional[int] = None,
+                   max_batches: Optional[int] = None) -> int:
+        """Delete logs older than `older_than` (all logs if None) in bounded batches, oldest first.
+        
+        Each round deletes at most batch_size documents by _id, with a short pause in between,
+        so other reads and writes are never stuck behind one huge delete.
+        """
+        if not self.is_connected():
+            logger.error("MongoDB not connected")
             return 0
+        
+        batch_size = batch_size or Config.LOG_PRUNE_BATCH_SIZE
+        query: Dict[str, Any] = {}
+        if older_than is not None:
+            # legacy entries kept the local time as an ISO string
+            query = {'$or': [
+                {'timestamp': {'$lt': older_than}},
+                {'timestamp': {'$lt': older_than.astimezone().replace(tzinfo=None).isoformat()}}
+            ]}
+        
+        deleted = 0
+        batches = 0
+        try:
+            while max_batches is None or batches < max_batches:
+                ids = [doc['_id'] for doc in self.logs_collection.find(query, {'_id': 1}).sort('timestamp', ASCENDING).limit(batch_size)]
+                if not ids:
+                    break
+                deleted += self.logs_collection.delete_many({'_id': {'$in': ids}}).deleted_count
+                batches += 1
+                if len(ids) < batch_size:
+                    break
+                time.sleep(Config.LOG_PRUNE_PAUSE_MS / 1000)
+        except Exception as e:
+            logger.error(f"Error pruning logs: {e}", exc_info=True)
+        
+        logger.info(f"Pruned {deleted} logs in {batches} batches")
+        return deleted
+    
+    def clear_logs(self, max_batches: Optional[int] = None) -> int:
+        """Clear all logs from database (in batches, see prune_logs)"""
+        return self.prune_logs(max_batches=max_batches)
     
     def close(self):
-        """Close database connection"""
+        """Flush queued logs and close database connection"""
+        if self.writer is not None:
+            self.writer.stop(timeout=Config.LOG_SHUTDOWN_TIMEOUT)
         if self.client:
             self.client.close()
             logger.info("MongoDB connection closed")
@@ -0,0 +1,233 @@
+# factorization.py - Time-budgeted factorization jobs racing several methods in a process pool
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+# Import RSA core from demo folder
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+demo_dir = os.path.join(project_root, 'demo')
+sys.path.insert(0, demo_dir)
+
+from rsa_core import is_probable_prime
+from rsa_factor import METHODS
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+METHOD_NAMES = list(METHODS)
+
+# Shared memory handed to every pool worker: one cancel flag per job slot and one
+# iteration counter per (slot, method) so the API can report progress without IPC round trips
+_cancel_flags = None
+_progress = None
+
+def _init_worker(cancel_flags, progress):
+    global _cancel_flags, _progress
+    _cancel_flags = cancel_flags
+    _progress = progress
+
+def _run_method(name: str, n: int, slot: int, deadline: float) -> Tuple[str, Optional[int], int]:
+    """Run one method in a worker until it finds a factor, the deadline passes or the slot is cancelled"""
+    counter = slot * len(METHOD_NAMES) + METHOD_NAMES.index(name)
+
+    def should_stop(iterations: int) -> bool:
+        _progress[counter] = iterations
+        return _cancel_flags[slot] != 0 or time.time() > deadline
+
+    factor, iterations = METHODS[name](n, should_stop)
+    _progress[counter] = iterations
+    return name, factor, iterations
+
+@dataclass
+class FactorJob:
+    """State of one factorization request"""
+    job_id: str
+    n: int
+    methods: List[str]
+    budget_ms: int
+    slot: int = -1
+    status: str = 'running'  # running | done | timeout | cancelled | failed
+    method: Optional[str] = None
+    factors: Optional[Tuple[int, int]] = None
+    error: Optional[str] = None
+    cached: bool = False
+    started: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    progress: Dict[str, int] = field(default_factory=dict)
+    pending: int = 0
+    futures: List[Future] = field(default_factory=list, repr=False)
+    done_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        end = self.finished or time.time()
+        return {
+            'job_id': self.job_id,
+            'n': str(self.n),
+            'bit_length': self.n.bit_length(),
+            'status': self.status,
+            'method': self.method,
+            'factors': [str(f) for f in self.factors] if self.factors else None,
+            'error': self.error,
+            'cached': self.cached,
+            'budget_ms': self.budget_ms,
+            'elapsed_ms': round((end - self.started) * 1000, 2),
+            'progress': dict(self.progress)
+        }
+
+class FactorizationEngine:
+    """Races factoring methods per modulus under a time budget, with cancellation and a result cache"""
+
+    def __init__(self, workers: int, slots: int, cache_size: int, job_ttl: int):
+        self.workers = workers
+        self.slots = slots
+        self.cache_size = cache_size
+        self.job_ttl = job_ttl
+        self.jobs: Dict[str, FactorJob] = {}
+        self.cache: 'OrderedDict[int, Tuple[str, Tuple[int, int]]]' = OrderedDict()
+        self._free_slots = list(range(slots))
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cancel_flags = None
+        self._progress = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._cancel_flags = multiprocessing.Array('b', self.slots, lock=False)
+            self._progress = multiprocessing.Array('q', self.slots * len(METHOD_NAMES), lock=False)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self._cancel_flags, self._progress)
+            )
+        return self._pool
+
+    def start(self, n: int, budget_ms: int, methods: Optional[List[str]] = None) -> FactorJob:
+        """Start (or answer from cache) a factorization job; raises ValueError on bad input"""
+        methods = methods or METHOD_NAMES
+        unknown = [m for m in methods if m not in METHODS]
+        if unknown:
+            raise ValueError(f"Unknown methods: {', '.join(unknown)}")
+        if n < 4 or is_probable_prime(n):
+            raise ValueError('n must be composite')
+
+        job = FactorJob(job_id=uuid.uuid4().hex, n=n, methods=list(methods), budget_ms=budget_ms)
+        with self._lock:
+            self._prune()
+            self.jobs[job.job_id] = job
+            hit = self.cache.get(n)
+            if hit is not None:
+                self.cache.move_to_end(n)
+                job.method, job.factors = hit
+                job.status, job.cached = 'done', True
+                job.finished = time.time()
+                job.done_event.set()
+                return job
+            if not self._free_slots:
+                del self.jobs[job.job_id]
+                raise RuntimeError('Factorization engine busy, try again later')
+            job.slot = self._free_slots.pop()
+
+        pool = self._get_pool()
+        self._cancel_flags[job.slot] = 0
+        for i in range(len(METHOD_NAMES)):
+            self._progress[job.slot * len(METHOD_NAMES) + i] = 0
+
+        deadline = job.started + budget_ms / 1000
+        job.pending = len(job.methods)
+        logger.info(f"Factor job {job.job_id}: {n.bit_length()}-bit n, methods={job.methods}, budget={budget_ms}ms")
+        with self._lock:
+            job.futures = [pool.submit(_run_method, name, n, job.slot, deadline) for name in job.methods]
+        for future in job.futures:
+            future.add_done_callback(lambda f, job=job: self._on_result(job, f))
+        return job
+
+    def _on_result(self, job: FactorJob, future: Future):
+        to_cancel: List[Future] = []
+        with self._lock:
+            job.pending -= 1
+            try:
+                # futures cancelled before they started have nothing to report
+                result = None if future.cancelled() else future.result()
+                if result is not None:
+                    name, factor, iterations = result
+                    job.progress[name] = iterations
+                    if factor and job.status == 'running':
+                        # first hit wins; tell the other methods to stop
+                        job.status, job.method = 'done', name
+                        job.factors = (min(factor, job.n // factor), max(factor, job.n // factor))
+                        job.finished = time.time()
+                        self._cancel_flags[job.slot] = 1
+                        to_cancel = job.futures
+                        self._remember(job.n, name, job.factors)
+                        logger.info(f"Factor job {job.job_id} solved by {name} in {job.to_dict()['elapsed_ms']} ms")
+            except Exception as e:
+                logger.error(f"Factor job {job.job_id} worker failed: {e}", exc_info=True)
+                job.error = str(e)
+
+            if job.pending == 0:
+                if job.status == 'running':
+                    job.status = 'failed' if job.error else 'timeout'
+                    job.finished = time.time()
+                self._free_slots.append(job.slot)
+                job.futures = []
+                job.done_event.set()
+        # Methods still queued never need to start; done outside the lock as cancel() runs callbacks inline
+        for f in to_cancel:
+            f.cancel()
+
+    def _remember(self, n: int, method: str, factors: Tuple[int, int]):
+        self.cache[n] = (method, factors)
+        self.cache.move_to_end(n)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def _prune(self):
+        """Drop finished jobs older than the TTL (caller holds the lock)"""
+        cutoff = time.time() - self.job_ttl
+        for job_id in [j.job_id for j in self.jobs.values() if j.finished and j.finished < cutoff]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[FactorJob]:
+        """Look up a job, refreshing live progress counters for running ones"""
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status == 'running' and self._progress is not None:
+                base = job.slot * len(METHOD_NAMES)
+                for name in job.methods:
+                    job.progress[name] = self._progress[base + METHOD_NAMES.index(name)]
+            return job
+
+    def wait(self, job: FactorJob, timeout: float) -> bool:
+        """Wait up to timeout seconds for all of a job's workers to stop"""
+        return job.done_event.wait(timeout)
+
+    def cancel(self, job_id: str) -> Optional[FactorJob]:
+        """Cancel a running job; running workers notice within a few thousand iterations"""
+        to_cancel: List[Future] = []
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status == 'running':
+                job.status = 'cancelled'
+                job.finished = time.time()
+                self._cancel_flags[job.slot] = 1
+                to_cancel = list(job.futures)
+                logger.info(f"Factor job {job_id} cancelled")
+        for f in to_cancel:
+            f.cancel()
+        return job
+
+# Global factorization engine instance
+factor_engine = FactorizationEngine(
+    workers=Config.FACTOR_WORKERS,
+    slots=Config.FACTOR_MAX_JOBS,
+    cache_size=Config.FACTOR_CACHE_SIZE,
+    job_ttl=Config.FACTOR_JOB_TTL
+)
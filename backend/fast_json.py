@@ -0,0 +1,65 @@
+# fast_json.py - Optional orjson-backed JSON provider for Flask responses
+import logging
+from typing import Any
+
+from flask import Flask
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+class OrjsonProvider(DefaultJSONProvider):
+    """Serializes responses with orjson, several times faster than json for large ciphertext lists.
+
+    Dates, dataclasses etc. go through the default provider's ``default`` hook, and anything
+    orjson rejects outright (ints wider than 64 bits) falls back to json, so output does not
+    depend on which encoder handled it.
+    """
+
+    OPTIONS = orjson.OPT_SORT_KEYS | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_PASSTHROUGH_DATACLASS if orjson else 0
+
+    def _orjson_dumps(self, obj: Any) -> bytes:
+        return orjson.dumps(obj, default=self.default, option=self.OPTIONS)
+
+    def dumps(self, obj: Any, **kwargs: Any) -> str:
+        if kwargs:
+            return super().dumps(obj, **kwargs)
+        try:
+            return self._orjson_dumps(obj).decode()
+        except TypeError:
+            return super().dumps(obj)
+
+    def response(self, *args: Any, **kwargs: Any):
+        obj = self._prepare_response_obj(args, kwargs)
+        try:
+            body = self._orjson_dumps(obj)
+        except TypeError:
+            body = super().dumps(obj)
+        return self._app.response_class(body, mimetype=self.mimetype)
+
+    def loads(self, s, **kwargs: Any) -> Any:
+        if kwargs:
+            return super().loads(s, **kwargs)
+        try:
+            return orjson.loads(s)
+        except orjson.JSONDecodeError:
+            # let json raise its usual error (and accept what it accepts, e.g. NaN)
+            return super().loads(s)
+
+def install_json_provider(app: Flask, mode: str = 'auto') -> str:
+    """Switch app.json to orjson when mode is 'orjson' or 'auto' and it is installed; returns the encoder used"""
+    mode = (mode or 'auto').strip().lower()
+    if mode not in ('auto', 'orjson', 'json'):
+        raise ValueError(f"Unknown JSON encoder: {mode}")
+    if mode == 'orjson' and orjson is None:
+        raise ValueError('orjson encoder requested but orjson is not installed')
+    if mode == 'json' or orjson is None:
+        app.json = DefaultJSONProvider(app)
+        return 'json'
+    app.json = OrjsonProvider(app)
+    logger.info("Using orjson for JSON responses")
+    return 'orjson'
@@ -0,0 +1,238 @@
+# jobs.py - Background key generation jobs with live prime-search progress, cancellation and result TTL
+import logging
+import multiprocessing
+import os
+import sys
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from typing import Dict, Optional, Tuple
+
+# Import RSA core from demo folder
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+demo_dir = os.path.join(project_root, 'demo')
+sys.path.insert(0, demo_dir)
+
+from rsa_core import generate_rsa, export_public, export_private, GenerationCancelled, PrimeStats, RSAKey
+from config import Config
+from key_manager import key_manager
+from metrics import KEYGEN_LATENCY, bits_label
+
+logger = logging.getLogger(__name__)
+
+# Shared memory handed to every pool worker: a cancel flag per job slot and, per slot,
+# the prime search counters below, so progress is readable without IPC round trips
+PROGRESS_FIELDS = ('windows', 'sieved', 'mr_tested', 'primes_found')
+_cancel_flags = None
+_progress = None
+
+def _init_worker(cancel_flags, progress):
+    global _cancel_flags, _progress
+    _cancel_flags = cancel_flags
+    _progress = progress
+
+def _run_keygen(bits: int, slot: int) -> Tuple[Optional[RSAKey], PrimeStats]:
+    """Generate one key in a worker, publishing progress to shared memory; None if cancelled"""
+    base = slot * len(PROGRESS_FIELDS)
+    stats = PrimeStats()
+
+    def should_stop(primes_found: int) -> bool:
+        _progress[base] = stats.windows
+        _progress[base + 1] = stats.sieved
+        _progress[base + 2] = stats.mr_tested
+        _progress[base + 3] = primes_found
+        return _cancel_flags[slot] != 0
+
+    try:
+        return generate_rsa(bits, stats, should_stop=should_stop), stats
+    except GenerationCancelled:
+        return None, stats
+
+@dataclass
+class KeyGenJob:
+    """State of one background key generation"""
+    job_id: str
+    bits: int
+    ttl: Optional[float] = None
+    slot: int = -1
+    status: str = 'queued'  # queued | running | done | cancelled | failed
+    key_id: Optional[str] = None
+    result: Optional[dict] = None
+    error: Optional[str] = None
+    created: float = field(default_factory=time.time)
+    finished: Optional[float] = None
+    progress: Dict[str, int] = field(default_factory=lambda: dict.fromkeys(PROGRESS_FIELDS, 0))
+    future: Optional[Future] = field(default=None, repr=False)
+    done_event: threading.Event = field(default_factory=threading.Event, repr=False)
+
+    def to_dict(self) -> dict:
+        end = self.finished or time.time()
+        return {
+            'job_id': self.job_id,
+            'type': 'generate-key',
+            'bits': self.bits,
+            'status': self.status,
+            'progress': dict(self.progress),
+            'result': self.result,
+            'error': self.error,
+            'elapsed_ms': round((end - self.created) * 1000, 2)
+        }
+
+class JobManager:
+    """Runs key generation jobs on a bounded process pool; finished jobs expire after job_ttl seconds"""
+
+    def __init__(self, workers: int, max_jobs: int, job_ttl: int):
+        self.workers = workers
+        self.max_jobs = max_jobs
+        self.job_ttl = job_ttl
+        self.jobs: Dict[str, KeyGenJob] = {}
+        self._free_slots = list(range(max_jobs))
+        self._lock = threading.Lock()
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._cancel_flags = None
+        self._progress = None
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            self._cancel_flags = multiprocessing.Array('b', self.max_jobs, lock=False)
+            self._progress = multiprocessing.Array('q', self.max_jobs * len(PROGRESS_FIELDS), lock=False)
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                initializer=_init_worker,
+                initargs=(self._cancel_flags, self._progress)
+            )
+        return self._pool
+
+    def start_generate_key(self, bits: int, ttl: Optional[float] = None) -> KeyGenJob:
+        """Queue a key generation; raises RuntimeError when max_jobs are already queued or running"""
+        job = KeyGenJob(job_id=uuid.uuid4().hex, bits=bits, ttl=ttl)
+        key = key_manager.pool.take(bits) if key_manager.pool else None
+        if key is not None:
+            # a pre-generated key finishes the job on the spot
+            self._finish(job, key)
+            with self._lock:
+                self._prune()
+                self.jobs[job.job_id] = job
+            return job
+
+        with self._lock:
+            self._prune()
+            if not self._free_slots:
+                raise RuntimeError('Too many key generation jobs, try again later')
+            job.slot = self._free_slots.pop()
+            self.jobs[job.job_id] = job
+
+        pool = self._get_pool()
+        self._cancel_flags[job.slot] = 0
+        base = job.slot * len(PROGRESS_FIELDS)
+        for i in range(len(PROGRESS_FIELDS)):
+            self._progress[base + i] = 0
+
+        logger.info(f"Key generation job {job.job_id}: {bits} bits")
+        with self._lock:
+            job.future = pool.submit(_run_keygen, bits, job.slot)
+        job.future.add_done_callback(lambda f, job=job: self._on_result(job, f))
+        return job
+
+    def _finish(self, job: KeyGenJob, key: RSAKey):
+        job.key_id = key_manager.store_key(key, job.ttl)
+        job.result = {
+            'key_id': job.key_id,
+            'public_key': export_public(key),
+            'private_key': export_private(key),
+            'bit_length': key.n.bit_length()
+        }
+        job.progress['primes_found'] = 2
+        job.status = 'done'
+        job.finished = time.time()
+        job.done_event.set()
+
+    def _on_result(self, job: KeyGenJob, future: Future):
+        key = None
+        with self._lock:
+            self._read_progress(job)
+            self._free_slots.append(job.slot)
+            try:
+                # futures cancelled before they started have nothing to report
+                if not future.cancelled():
+                    key, stats = future.result()
+                    key_manager.prime_stats.add(stats)
+                    job.progress.update({k: v for k, v in asdict(stats).items() if k in job.progress})
+            except Exception as e:
+                logger.error(f"Key generation job {job.job_id} failed: {e}", exc_info=True)
+                job.status, job.error = 'failed', str(e)
+
+        if key is not None and job.status != 'cancelled':
+            try:
+                self._finish(job, key)
+                KEYGEN_LATENCY.labels(bits_label(job.bits), 'job').observe(job.finished - job.created)
+                logger.info(f"Key generation job {job.job_id} done: {job.key_id}")
+                return
+            except Exception as e:
+                logger.error(f"Key generation job {job.job_id} could not store its key: {e}", exc_info=True)
+                job.status, job.error = 'failed', str(e)
+        if job.status in ('queued', 'running'):
+            job.status = 'cancelled'
+        job.finished = job.finished or time.time()
+        job.done_event.set()
+
+    def _read_progress(self, job: KeyGenJob):
+        """Copy live counters from shared memory (caller holds the lock)"""
+        if job.slot < 0 or self._progress is None or job.done_event.is_set():
+            return
+        base = job.slot * len(PROGRESS_FIELDS)
+        for i, name in enumerate(PROGRESS_FIELDS):
+            job.progress[name] = self._progress[base + i]
+        if job.status == 'queued' and job.future is not None and job.future.running():
+            job.status = 'running'
+
+    def _prune(self):
+        """Drop finished jobs older than the TTL (caller holds the lock)"""
+        cutoff = time.time() - self.job_ttl
+        for job_id in [j.job_id for j in self.jobs.values() if j.finished and j.finished < cutoff]:
+            del self.jobs[job_id]
+
+    def get(self, job_id: str) -> Optional[KeyGenJob]:
+        """Look up a job, refreshing live progress for unfinished ones"""
+        with self._lock:
+            self._prune()
+            job = self.jobs.get(job_id)
+            if job is not None and not job.done_event.is_set():
+                self._read_progress(job)
+            return job
+
+    def wait(self, job: KeyGenJob, timeout: float) -> bool:
+        """Wait up to timeout seconds for a job to finish"""
+        return job.done_event.wait(timeout)
+
+    def cancel(self, job_id: str) -> Optional[KeyGenJob]:
+        """Cancel a queued or running job; a running search stops within one sieve window"""
+        future = None
+        with self._lock:
+            job = self.jobs.get(job_id)
+            if job is not None and job.status in ('queued', 'running'):
+                job.status = 'cancelled'
+                job.finished = time.time()
+                self._cancel_flags[job.slot] = 1
+                future = job.future
+                logger.info(f"Key generation job {job_id} cancelled")
+        # outside the lock: cancel() runs the done callback inline for queued futures
+        if future is not None:
+            future.cancel()
+        return job
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self.jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return {'workers': self.workers, 'max_jobs': self.max_jobs, 'jobs': counts}
+
+# Global job manager instance
+job_manager = JobManager(
+    workers=Config.JOB_WORKERS,
+    max_jobs=Config.JOB_MAX_JOBS,
+    job_ttl=Config.JOB_RESULT_TTL
+)
@@ -1,8 +1,10 @@
 # key_manager.py - RSA key management
 import logging
+import math
 import os
 import sys
-from typing import Dict, Optional
+import time
+from typing import MutableMapping, Optional
 from datetime import datetime
 
 # Import RSA core from demo folder
@@ -10,7 +12,13 @@ project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 demo_dir = os.path.join(project_root, 'demo')
 sys.path.insert(0, demo_dir)
 
-from rsa_core import generate_rsa, RSAKey, export_public, export_private
+from config import Config
+import rsa_core
+from rsa_core import generate_rsa, batch_gcd, get_pool, RSAKey, PrimeStats, export_public, export_private
+from key_pool import KeyPool, generate_with_stats
+from offload import run_cpu
+from key_store import create_key_store
+from metrics import KEYGEN_LATENCY, bits_label
 
 logger = logging.getLogger(__name__)
 
@@ -18,21 +26,58 @@ class KeyManager:
     """Manages RSA key storage and operations"""
     
     def __init__(self):
-        self.keys_storage: Dict[str, RSAKey] = {}
+        # Process-local dict, or a shared on-disk store when Config.KEY_STORE = 'sqlite'
+        self.keys_storage: MutableMapping[str, RSAKey] = create_key_store()
+        self.prime_stats = PrimeStats()
+        self.pool: Optional[KeyPool] = None
     
-    def generate_key(self, bits: int) -> tuple[str, RSAKey]:
-        """Generate new RSA key pair"""
+    def start_pool(self) -> KeyPool:
+        """Start the pre-generated key pool"""
+        if self.pool is None:
+            self.pool = KeyPool(
+                Config.KEY_POOL_SIZES,
+                low=Config.KEY_POOL_LOW_WATERMARK,
+                high=Config.KEY_POOL_HIGH_WATERMARK,
+                max_bytes=Config.KEY_POOL_MAX_BYTES,
+                workers=Config.KEYGEN_WORKERS,
+                prime_stats=self.prime_stats
+            )
+            self.pool.start()
+        return self.pool
+    
+    def _new_key_id(self) -> str:
+        """Timestamp key ID, suffixed when several keys are made in the same second"""
+        key_id = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if key_id not in self.keys_storage:
+            return key_id
+        suffix = 1
+        while f"{key_id}_{suffix}" in self.keys_storage:
+            suffix += 1
+        return f"{key_id}_{suffix}"
+    
+    def generate_key(self, bits: int, workers: Optional[int] = None, ttl: Optional[float] = None) -> tuple[str, RSAKey]:
+        """Generate new RSA key pair (workers > 1 runs the prime search on a process pool, ttl in seconds)"""
         try:
             # Convert to int to avoid float issues
             bits = int(float(bits)) if isinstance(bits, (str, float)) else int(bits)
+            workers = Config.KEYGEN_WORKERS if workers is None else int(workers)
             
-            logger.info(f"Generating RSA key with bits: {bits}")
-            key = generate_rsa(bits)
-            
-            # Generate unique key ID
-            key_id = datetime.now().strftime("%Y%m%d_%H%M%S")
-            self.keys_storage[key_id] = key
+            key = self.pool.take(bits) if self.pool else None
+            if key is not None:
+                logger.info(f"Took {bits}-bit key from pool")
+            else:
+                logger.info(f"Generating RSA key with bits: {bits}, workers: {workers}")
+                start = time.perf_counter()
+                if workers > 1:
+                    stats = PrimeStats()
+                    key = generate_rsa(bits, stats, workers)
+                else:
+                    key, stats = run_cpu(generate_with_stats, bits)
+                KEYGEN_LATENCY.labels(bits_label(bits), 'request').observe(time.perf_counter() - start)
+                self.prime_stats.add(stats)
+                logger.info(f"Prime search: {stats.sieved} candidates sieved, {stats.mr_tested} Miller-Rabin tested")
             
+            key_id = self.store_key(key, ttl)
             logger.info(f"Key generated successfully. Key ID: {key_id}, n bits: {key.n.bit_length()}")
             return key_id, key
             
@@ -40,10 +85,21 @@ class KeyManager:
             logger.error(f"Error generating key: {str(e)}", exc_info=True)
             raise
     
+    def store_key(self, key: RSAKey, ttl: Optional[float] = None) -> str:
+        """Store a key under a fresh key ID (another worker may claim the same one first)"""
+        key_id = self._new_key_id()
+        while not self.keys_storage.insert_new(key_id, key, ttl):
+            key_id = self._new_key_id()
+        return key_id
+    
     def get_key(self, key_id: str) -> Optional[RSAKey]:
         """Get key by ID"""
         return self.keys_storage.get(key_id)
     
+    def peek_key(self, key_id: str) -> Optional[RSAKey]:
+        """Get key by ID without counting a cache hit or touching its LRU position"""
+        return self.keys_storage.peek(key_id)
+    
     def key_exists(self, key_id: str) -> bool:
         """Check if key exists"""
         return key_id in self.keys_storage
@@ -65,6 +121,45 @@ class KeyManager:
         """List all stored keys"""
         return list(self.keys_storage.keys())
     
+    def audit_shared_primes(self) -> dict:
+        """Find stored keys whose modulus shares a prime with another stored key (batch GCD).
+
+        Raises RuntimeError when the key count exceeds AUDIT_PYTHON_MAX_KEYS without gmpy2:
+        the pure-Python product/remainder trees take tens of seconds for a few thousand keys.
+        """
+        start = time.perf_counter()
+        # (key_id, n) pairs straight from the store: no cache hits, LRU moves or full key loads
+        items = self.keys_storage.moduli()
+        if rsa_core.BACKEND != 'gmpy2' and len(items) > Config.AUDIT_PYTHON_MAX_KEYS:
+            raise RuntimeError(f'Auditing more than {Config.AUDIT_PYTHON_MAX_KEYS} keys requires the gmpy2 backend')
+        moduli = [n for _, n in items]
+        # Always in a pool process: the trees hold the GIL for the whole computation
+        gcds = get_pool(Config.CPU_OFFLOAD_WORKERS).submit(batch_gcd, moduli).result()
+        
+        affected_idx = [i for i, g in enumerate(gcds) if g != 1]
+        affected = []
+        for i in affected_idx:
+            # Only the (normally tiny) affected set is compared pairwise
+            shares_with = [items[j][0] for j in affected_idx
+                           if j != i and math.gcd(moduli[i], moduli[j]) != 1]
+            affected.append({
+                'key_id': items[i][0],
+                'bit_length': moduli[i].bit_length(),
+                'shares_with': shares_with,
+                'fully_factored': gcds[i] == moduli[i]
+            })
+        
+        duration_ms = round((time.perf_counter() - start) * 1000, 2)
+        if affected:
+            logger.warning(f"Key audit: {len(affected)} of {len(items)} keys share a prime")
+        logger.info(f"Key audit over {len(items)} keys took {duration_ms} ms")
+        return {
+            'key_count': len(items),
+            'affected_count': len(affected),
+            'affected': affected,
+            'duration_ms': duration_ms
+        }
+    
     def delete_key(self, key_id: str) -> bool:
         """Delete key by ID"""
         if key_id in self.keys_storage:
@@ -0,0 +1,146 @@
+# key_pool.py - Pool of pre-generated RSA keys with background refill
+import logging
+import os
+import sys
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, Iterable, Optional, Set, Tuple
+
+# Import RSA core from demo folder
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+demo_dir = os.path.join(project_root, 'demo')
+sys.path.insert(0, demo_dir)
+
+from rsa_core import generate_rsa, get_pool, key_size_bytes, RSAKey, PrimeStats
+from metrics import KEYGEN_LATENCY, bits_label
+
+logger = logging.getLogger(__name__)
+
+def generate_with_stats(bits: int) -> Tuple[RSAKey, PrimeStats]:
+    """Generate one key in a pool process and hand back its prime search stats"""
+    stats = PrimeStats()
+    return generate_rsa(bits, stats), stats
+
+class KeyPool:
+    """Keeps ready-made keys per bit size, refilled by a background thread.
+
+    A size is refilled once it drops below ``low`` and topped up to ``high``,
+    as long as the pool stays under ``max_bytes``.
+    """
+
+    def __init__(self, sizes: Iterable[int], low: int, high: int, max_bytes: int,
+                 workers: int = 1, prime_stats: Optional[PrimeStats] = None):
+        self.pools: Dict[int, Deque[Tuple[RSAKey, int]]] = {int(b): deque() for b in sizes}
+        self.low = low
+        self.high = max(high, low)
+        self.max_bytes = max_bytes
+        self.workers = max(1, workers)
+        self.prime_stats = prime_stats
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self._refilling: Set[int] = set(self.pools)
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+        self._stopped = False
+
+    def start(self):
+        """Start the background refill worker"""
+        if self._thread is not None:
+            return
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name='key-pool-refill', daemon=True)
+        self._thread.start()
+        logger.info(f"Key pool started for sizes {sorted(self.pools)} (low={self.low}, high={self.high})")
+
+    def stop(self):
+        """Stop the refill worker (keys already in the pool are kept)"""
+        with self._cond:
+            self._stopped = True
+            self._cond.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+            self._thread = None
+
+    def take(self, bits: int) -> Optional[RSAKey]:
+        """Pop a ready key of the given size, or None if the pool has none"""
+        with self._cond:
+            keys = self.pools.get(bits)
+            if keys is None:
+                return None
+            if not keys:
+                self.misses += 1
+                self._refilling.add(bits)
+                self._cond.notify()
+                return None
+            key, size = keys.popleft()
+            self.bytes_used -= size
+            self.hits += 1
+            if len(keys) < self.low:
+                self._refilling.add(bits)
+                self._cond.notify()
+            return key
+
+    def ready(self, bits: int) -> int:
+        """How many keys of the given size are ready right now"""
+        return len(self.pools.get(bits, ()))
+
+    def _next_size(self) -> Optional[int]:
+        """Pick the emptiest size still waiting for refill"""
+        candidates = [b for b in self._refilling if len(self.pools[b]) < self.high]
+        if not candidates:
+            return None
+        return min(candidates, key=lambda b: (len(self.pools[b]), b))
+
+    def _run(self):
+        while True:
+            with self._cond:
+                bits = self._next_size()
+                while bits is None and not self._stopped:
+                    self._cond.wait()
+                    bits = self._next_size()
+                if self._stopped:
+                    return
+
+            try:
+                # Generate in a worker process so the prime search does not hold this process's GIL
+                start = time.perf_counter()
+                key, stats = get_pool(self.workers).submit(generate_with_stats, bits).result()
+                KEYGEN_LATENCY.labels(bits_label(bits), 'pool').observe(time.perf_counter() - start)
+            except Exception as e:
+                logger.error(f"Key pool refill failed for {bits} bits: {e}", exc_info=True)
+                with self._cond:
+                    self._refilling.discard(bits)
+                continue
+
+            size = key_size_bytes(key)
+            with self._cond:
+                if self.prime_stats is not None:
+                    self.prime_stats.add(stats)
+                if self.bytes_used + size > self.max_bytes:
+                    logger.warning(f"Key pool memory cap reached ({self.bytes_used} bytes), pausing refill")
+                    self._refilling.discard(bits)
+                    continue
+                keys = self.pools[bits]
+                keys.append((key, size))
+                self.bytes_used += size
+                if len(keys) >= self.high:
+                    self._refilling.discard(bits)
+            logger.debug(f"Key pool: added {bits}-bit key ({len(keys)} ready)")
+
+    def stats(self) -> dict:
+        """Fill level and hit rate"""
+        with self._cond:
+            lookups = self.hits + self.misses
+            return {
+                'running': self._thread is not None,
+                'fill': {str(b): len(keys) for b, keys in sorted(self.pools.items())},
+                'low_watermark': self.low,
+                'high_watermark': self.high,
+                'bytes_used': self.bytes_used,
+                'max_bytes': self.max_bytes,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None
+            }
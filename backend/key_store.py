@@ -0,0 +1,446 @@
+# key_store.py - Storage backends for KeyManager.keys_storage
+import logging
+import os
+import sqlite3
+import sys
+import heapq
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from typing import Iterator, List, Optional, Tuple
+
+# Import RSA core from demo folder
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+demo_dir = os.path.join(project_root, 'demo')
+sys.path.insert(0, demo_dir)
+
+from rsa_core import RSAKey, key_size_bytes
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+def _built(key: RSAKey) -> Tuple[bool, bool]:
+    """Which lazy caches (exports, byte tables) a key carries; they are what changes its size"""
+    return key._export is not None, key._enc_table is not None
+
+class _Entry:
+    __slots__ = ('key', 'size', 'built', 'expires')
+
+    def __init__(self, key: RSAKey, size: int, expires: Optional[float]):
+        self.key = key
+        self.size = size
+        self.built = _built(key)
+        self.expires = expires
+
+class MemoryKeyStore(MutableMapping):
+    """Per-process bounded key cache: LRU over an entry limit and a byte budget, plus optional TTLs.
+
+    Lookups and evictions are O(1) on an OrderedDict; expired keys are dropped lazily on access
+    and by a background sweeper driven by a heap of expiry times.
+    """
+
+    def __init__(self, max_entries: int = 0, max_bytes: int = 0, ttl: Optional[float] = None,
+                 sweep_interval: float = 30):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl or None
+        self.sweep_interval = sweep_interval
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._entries: 'OrderedDict[str, _Entry]' = OrderedDict()
+        self._expiry_heap: List[Tuple[float, str]] = []
+        self._lock = threading.Lock()
+        self._sweeper: Optional[threading.Thread] = None
+
+    def _expired(self, entry: _Entry, now: float) -> bool:
+        return entry.expires is not None and entry.expires <= now
+
+    def _remove(self, key_id: str) -> _Entry:
+        entry = self._entries.pop(key_id)
+        self.bytes_used -= entry.size
+        return entry
+
+    def _evict(self):
+        """Drop least recently used keys until both limits hold (caller holds the lock)"""
+        while self._entries and (
+            (self.max_entries and len(self._entries) > self.max_entries) or
+            (self.max_bytes and self.bytes_used > self.max_bytes)
+        ):
+            key_id, entry = self._entries.popitem(last=False)
+            self.bytes_used -= entry.size
+            self.evictions += 1
+            logger.debug(f"Evicted key {key_id} from cache")
+
+    def _store(self, key_id: str, key: RSAKey, ttl: Optional[float]):
+        ttl = ttl or self.ttl
+        expires = time.time() + ttl if ttl else None
+        if key_id in self._entries:
+            self._remove(key_id)
+        entry = _Entry(key, key_size_bytes(key), expires)
+        self._entries[key_id] = entry
+        self.bytes_used += entry.size
+        if expires is not None:
+            heapq.heappush(self._expiry_heap, (expires, key_id))
+            self._start_sweeper()
+        self._evict()
+
+    def __getitem__(self, key_id: str) -> RSAKey:
+        with self._lock:
+            entry = self._entries.get(key_id)
+            if entry is None:
+                self.misses += 1
+                raise KeyError(key_id)
+            if self._expired(entry, time.time()):
+                self._remove(key_id)
+                self.expirations += 1
+                self.misses += 1
+                raise KeyError(key_id)
+            self._entries.move_to_end(key_id)
+            self.hits += 1
+            if _built(entry.key) != entry.built:
+                # byte tables or exports were built since the key was sized; charge them to the budget
+                size = key_size_bytes(entry.key)
+                self.bytes_used += size - entry.size
+                entry.size = size
+                entry.built = _built(entry.key)
+                self._evict()
+            return entry.key
+
+    def peek(self, key_id: str) -> Optional[RSAKey]:
+        """Key for key_id, or None; leaves the LRU order and hit/miss counters alone"""
+        with self._lock:
+            entry = self._entries.get(key_id)
+            if entry is None or self._expired(entry, time.time()):
+                return None
+            return entry.key
+
+    def __contains__(self, key_id) -> bool:
+        with self._lock:
+            entry = self._entries.get(key_id)
+            return entry is not None and not self._expired(entry, time.time())
+
+    def moduli(self) -> List[Tuple[str, int]]:
+        """(key_id, n) for every live key, oldest first; leaves the LRU order and counters alone"""
+        now = time.time()
+        with self._lock:
+            return [(k, e.key.n) for k, e in self._entries.items() if not self._expired(e, now)]
+
+    def __setitem__(self, key_id: str, key: RSAKey):
+        with self._lock:
+            self._store(key_id, key, None)
+
+    def insert_new(self, key_id: str, key: RSAKey, ttl: Optional[float] = None) -> bool:
+        """Store key unless key_id is already taken; ttl (seconds) overrides the default.
+
+        Raises ValueError for a key larger than the whole byte budget, which would be evicted at once.
+        """
+        if self.max_bytes and key_size_bytes(key) > self.max_bytes:
+            raise ValueError(f'Key needs more than the key cache byte budget ({self.max_bytes} bytes)')
+        with self._lock:
+            entry = self._entries.get(key_id)
+            if entry is not None and not self._expired(entry, time.time()):
+                return False
+            self._store(key_id, key, ttl)
+            return True
+
+    def __delitem__(self, key_id: str):
+        with self._lock:
+            self._remove(key_id)
+
+    def __iter__(self) -> Iterator[str]:
+        now = time.time()
+        with self._lock:
+            return iter([k for k, e in self._entries.items() if not self._expired(e, now)])
+
+    def __len__(self) -> int:
+        # expired keys wait for the sweeper, but they are already gone for lookups and iteration
+        now = time.time()
+        with self._lock:
+            return sum(1 for e in self._entries.values() if not self._expired(e, now))
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._expiry_heap.clear()
+            self.bytes_used = 0
+
+    def sweep(self) -> int:
+        """Remove every expired key; returns how many were removed"""
+        removed = 0
+        now = time.time()
+        with self._lock:
+            while self._expiry_heap and self._expiry_heap[0][0] <= now:
+                expires, key_id = heapq.heappop(self._expiry_heap)
+                entry = self._entries.get(key_id)
+                # heap items are not removed on overwrite/delete, so check they still apply
+                if entry is not None and entry.expires == expires:
+                    self._remove(key_id)
+                    removed += 1
+            self.expirations += removed
+        if removed:
+            logger.info(f"Expired {removed} keys")
+        return removed
+
+    def _start_sweeper(self):
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='key-cache-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Key cache sweep failed: {e}", exc_info=True)
+
+    def stats(self) -> dict:
+        """Size and hit/miss/eviction counters"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'backend': 'memory',
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'bytes_used': self.bytes_used,
+                'max_bytes': self.max_bytes,
+                'default_ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else None,
+                'evictions': self.evictions,
+                'expirations': self.expirations
+            }
+
+class SQLiteKeyStore(MutableMapping):
+    """Keys in an on-disk SQLite database (WAL), shared by every worker process.
+
+    Each process keeps a bounded LRU cache of deserialized RSAKey objects (with their CRT values
+    and lookup tables), so hot lookups are a cache hit plus one tiny generation read. Keys are
+    never modified in place; deletes bump a generation counter that invalidates the caches.
+    Keys with a TTL carry an ``expires`` time that every read checks; a sweeper deletes them.
+    """
+
+    def __init__(self, path: str, max_entries: int = 0, max_bytes: int = 0, ttl: Optional[float] = None,
+                 sweep_interval: float = 30):
+        self.path = path
+        self.ttl = ttl or None
+        self.sweep_interval = sweep_interval
+        self.expirations = 0
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        self._local = threading.local()
+        self._cache = MemoryKeyStore(max_entries=max_entries, max_bytes=max_bytes, sweep_interval=sweep_interval)
+        self._generation = -1
+        self._sweeper: Optional[threading.Thread] = None
+
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('''
+            CREATE TABLE IF NOT EXISTS rsa_keys (
+                key_id TEXT PRIMARY KEY,
+                n TEXT NOT NULL, e TEXT NOT NULL, d TEXT NOT NULL,
+                p TEXT NOT NULL, q TEXT NOT NULL,
+                created REAL NOT NULL,
+                expires REAL
+            )
+        ''')
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(rsa_keys)')}
+        if 'expires' not in columns:
+            # stores created before TTL support
+            conn.execute('ALTER TABLE rsa_keys ADD COLUMN expires REAL')
+        conn.execute('CREATE INDEX IF NOT EXISTS rsa_keys_expires ON rsa_keys (expires) WHERE expires IS NOT NULL')
+        conn.execute('CREATE TABLE IF NOT EXISTS rsa_keys_meta (id INTEGER PRIMARY KEY CHECK (id = 0), generation INTEGER NOT NULL)')
+        conn.execute('INSERT OR IGNORE INTO rsa_keys_meta (id, generation) VALUES (0, 0)')
+        conn.commit()
+        if self.ttl or conn.execute('SELECT 1 FROM rsa_keys WHERE expires IS NOT NULL LIMIT 1').fetchone():
+            self._start_sweeper()
+        logger.info(f"SQLite key store at {path}")
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are thread-bound)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=10)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def _sync(self):
+        """Drop the process cache if another worker deleted keys since we last looked"""
+        generation = self._conn().execute('SELECT generation FROM rsa_keys_meta WHERE id = 0').fetchone()[0]
+        if generation != self._generation:
+            self._cache.clear()
+            self._generation = generation
+
+    def _bump_generation(self, conn: sqlite3.Connection):
+        conn.execute('UPDATE rsa_keys_meta SET generation = generation + 1 WHERE id = 0')
+
+    @staticmethod
+    def _row_to_key(row) -> RSAKey:
+        # hex keeps (de)serialization linear-time for 4096-bit ints
+        return RSAKey(*(int(v, 16) for v in row))
+
+    def _cache_put(self, key_id: str, key: RSAKey, expires: Optional[float]):
+        # cached copies expire with the row (a non-positive ttl is already past, so skip those)
+        ttl = expires - time.time() if expires is not None else None
+        if ttl is None or ttl > 0:
+            try:
+                self._cache.insert_new(key_id, key, ttl)
+            except ValueError:
+                pass  # larger than the whole cache budget: served from the table every time
+
+    def __getitem__(self, key_id: str) -> RSAKey:
+        self._sync()
+        try:
+            return self._cache[key_id]
+        except KeyError:
+            pass
+        row = self._conn().execute(
+            'SELECT n, e, d, p, q, expires FROM rsa_keys WHERE key_id = ? AND (expires IS NULL OR expires > ?)',
+            (key_id, time.time())
+        ).fetchone()
+        if row is None:
+            raise KeyError(key_id)
+        key = self._row_to_key(row[:5])
+        self._cache_put(key_id, key, row[5])
+        return key
+
+    def peek(self, key_id: str) -> Optional[RSAKey]:
+        """Key for key_id, or None; leaves the cache order and counters alone"""
+        self._sync()
+        key = self._cache.peek(key_id)
+        if key is not None:
+            return key
+        row = self._conn().execute(
+            'SELECT n, e, d, p, q FROM rsa_keys WHERE key_id = ? AND (expires IS NULL OR expires > ?)',
+            (key_id, time.time())
+        ).fetchone()
+        return self._row_to_key(row) if row is not None else None
+
+    def moduli(self) -> List[Tuple[str, int]]:
+        """(key_id, n) for every live key, oldest first, read straight from the table (the cache is untouched)"""
+        rows = self._conn().execute(
+            'SELECT key_id, n FROM rsa_keys WHERE expires IS NULL OR expires > ? ORDER BY created', (time.time(),)
+        ).fetchall()
+        return [(key_id, int(n, 16)) for key_id, n in rows]
+
+    def _insert(self, key_id: str, key: RSAKey, replace: bool, ttl: Optional[float] = None) -> bool:
+        conn = self._conn()
+        now = time.time()
+        ttl = ttl or self.ttl
+        expires = now + ttl if ttl else None
+        values = (key_id, *(format(v, 'x') for v in (key.n, key.e, key.d, key.p, key.q)), now, expires)
+        verb = 'INSERT OR REPLACE' if replace else 'INSERT OR IGNORE'
+        with conn:
+            if not replace:
+                # an expired key no longer holds its ID
+                conn.execute('DELETE FROM rsa_keys WHERE key_id = ? AND expires <= ?', (key_id, now))
+            cur = conn.execute(f'{verb} INTO rsa_keys (key_id, n, e, d, p, q, created, expires) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', values)
+            if replace:
+                self._bump_generation(conn)
+        if cur.rowcount != 1:
+            return False
+        if expires is not None:
+            self._start_sweeper()
+        self._cache_put(key_id, key, expires)
+        return True
+
+    def __setitem__(self, key_id: str, key: RSAKey):
+        self._insert(key_id, key, replace=True)
+
+    def insert_new(self, key_id: str, key: RSAKey, ttl: Optional[float] = None) -> bool:
+        """Store key unless key_id is already taken (atomic across processes); ttl (seconds) overrides the default"""
+        return self._insert(key_id, key, replace=False, ttl=ttl)
+
+    def __delitem__(self, key_id: str):
+        conn = self._conn()
+        with conn:
+            cur = conn.execute('DELETE FROM rsa_keys WHERE key_id = ?', (key_id,))
+            if cur.rowcount:
+                self._bump_generation(conn)
+        try:
+            del self._cache[key_id]
+        except KeyError:
+            pass
+        if not cur.rowcount:
+            raise KeyError(key_id)
+
+    def __contains__(self, key_id) -> bool:
+        self._sync()
+        if key_id in self._cache:
+            return True
+        return self._conn().execute(
+            'SELECT 1 FROM rsa_keys WHERE key_id = ? AND (expires IS NULL OR expires > ?)', (key_id, time.time())
+        ).fetchone() is not None
+
+    def __iter__(self) -> Iterator[str]:
+        rows = self._conn().execute(
+            'SELECT key_id FROM rsa_keys WHERE expires IS NULL OR expires > ? ORDER BY created', (time.time(),)
+        ).fetchall()
+        return iter([r[0] for r in rows])
+
+    def __len__(self) -> int:
+        return self._conn().execute(
+            'SELECT COUNT(*) FROM rsa_keys WHERE expires IS NULL OR expires > ?', (time.time(),)
+        ).fetchone()[0]
+
+    def sweep(self) -> int:
+        """Delete every expired key; returns how many were removed"""
+        conn = self._conn()
+        with conn:
+            removed = conn.execute('DELETE FROM rsa_keys WHERE expires <= ?', (time.time(),)).rowcount
+        self.expirations += removed
+        if removed:
+            logger.info(f"Expired {removed} keys")
+        return removed
+
+    def _start_sweeper(self):
+        if self._sweeper is None:
+            self._sweeper = threading.Thread(target=self._sweep_loop, name='key-store-sweeper', daemon=True)
+            self._sweeper.start()
+
+    def _sweep_loop(self):
+        while True:
+            time.sleep(self.sweep_interval)
+            try:
+                self.sweep()
+            except Exception as e:
+                logger.error(f"Key store sweep failed: {e}", exc_info=True)
+
+    def stats(self) -> dict:
+        """Store size and this process's cache counters"""
+        cache = self._cache.stats()
+        return {**cache, 'backend': 'sqlite', 'entries': len(self), 'cached': cache['entries'],
+                'default_ttl': self.ttl, 'expirations': self.expirations}
+
+    def clear(self):
+        conn = self._conn()
+        with conn:
+            conn.execute('DELETE FROM rsa_keys')
+            self._bump_generation(conn)
+        self._cache.clear()
+
+def create_key_store(backend: Optional[str] = None):
+    """Build the key store selected by Config.KEY_STORE ('memory' or 'sqlite')"""
+    backend = (backend or Config.KEY_STORE).strip().lower()
+    if backend == 'sqlite':
+        return SQLiteKeyStore(
+            Config.KEY_STORE_PATH,
+            max_entries=Config.KEY_CACHE_MAX_ENTRIES,
+            max_bytes=Config.KEY_CACHE_MAX_BYTES,
+            ttl=Config.KEY_CACHE_TTL,
+            sweep_interval=Config.KEY_CACHE_SWEEP_INTERVAL
+        )
+    if backend != 'memory':
+        raise ValueError(f"Unknown key store backend: {backend}")
+    return MemoryKeyStore(
+        max_entries=Config.KEY_CACHE_MAX_ENTRIES,
+        max_bytes=Config.KEY_CACHE_MAX_BYTES,
+        ttl=Config.KEY_CACHE_TTL,
+        sweep_interval=Config.KEY_CACHE_SWEEP_INTERVAL
+    )
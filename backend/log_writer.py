@@ -0,0 +1,163 @@
+# log_writer.py - Background writer that batches log entries into insert_many calls
+import logging
+import queue
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ('drop_new', 'drop_oldest')
+
+class LogWriter:
+    """Queues log documents and writes them from one thread in batches.
+
+    A batch is flushed once it reaches ``batch_size`` entries or ``flush_interval`` seconds
+    after its first entry, whichever comes first. When the queue is full, ``drop_new``
+    rejects the incoming entry and ``drop_oldest`` discards the oldest queued one instead;
+    either way request threads never block on MongoDB.
+    """
+
+    def __init__(self, insert_many: Callable[[List[Dict[str, Any]]], Any], max_queue: int = 10000,
+                 batch_size: int = 500, flush_interval: float = 1.0, overflow: str = 'drop_oldest'):
+        if overflow not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown overflow policy: {overflow}")
+        self.insert_many = insert_many
+        self.batch_size = max(1, batch_size)
+        self.flush_interval = flush_interval
+        self.overflow = overflow
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+        self._queue: 'queue.Queue[Dict[str, Any]]' = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stopping = threading.Event()
+
+    def start(self):
+        """Start the writer thread (done automatically on first submit)"""
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._stopping.clear()
+            self._thread = threading.Thread(target=self._run, name='log-writer', daemon=True)
+            self._thread.start()
+
+    def submit(self, entry: Dict[str, Any]) -> bool:
+        """Queue one entry; returns False if it was dropped because the queue is full"""
+        if self._thread is None:
+            self.start()
+        try:
+            self._queue.put_nowait(entry)
+            return True
+        except queue.Full:
+            pass
+        if self.overflow == 'drop_oldest':
+            try:
+                self._queue.get_nowait()
+                self._queue.task_done()
+            except queue.Empty:
+                pass
+            with self._lock:
+                self.dropped += 1
+            try:
+                self._queue.put_nowait(entry)
+                return True
+            except queue.Full:
+                pass
+        with self._lock:
+            self.dropped += 1
+        return False
+
+    def submit_many(self, entries: List[Dict[str, Any]]) -> int:
+        """Queue several entries; returns how many were accepted"""
+        return sum(1 for entry in entries if self.submit(entry))
+
+    def _next_batch(self) -> List[Dict[str, Any]]:
+        """Block for the first entry, then gather more until the batch is full or its time is up"""
+        try:
+            batch = [self._queue.get(timeout=0.5)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or self._stopping.is_set():
+                # time's up: take only what is already waiting
+                try:
+                    while len(batch) < self.batch_size:
+                        batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    pass
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch: List[Dict[str, Any]]):
+        try:
+            self.insert_many(batch)
+            with self._lock:
+                self.written += len(batch)
+                self.batches += 1
+        except Exception as e:
+            with self._lock:
+                self.failed += len(batch)
+            logger.warning(f"Log writer: dropped batch of {len(batch)} entries: {str(e)[:200]}")
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+            if self._stopping.is_set() and self._queue.empty():
+                return
+
+    def flush(self, timeout: float = 10.0) -> bool:
+        """Wait until everything queued so far has been written (or failed); False on timeout"""
+        deadline = time.monotonic() + timeout
+        done = self._queue.all_tasks_done
+        with done:
+            while self._queue.unfinished_tasks:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0 or self._thread is None:
+                    return False
+                done.wait(remaining)
+        return True
+
+    def stop(self, timeout: float = 10.0) -> bool:
+        """Flush what is queued and stop the thread; False if entries were still pending at timeout"""
+        self._stopping.set()
+        thread = self._thread
+        if thread is None:
+            return True
+        thread.join(timeout)
+        pending = self._queue.unfinished_tasks
+        if thread.is_alive():
+            logger.warning(f"Log writer did not finish within {timeout}s, {pending} entries pending")
+            return False
+        with self._lock:
+            self._thread = None
+        return pending == 0
+
+    def stats(self) -> dict:
+        """Queue depth and write/drop counters"""
+        with self._lock:
+            return {
+                'running': self._thread is not None,
+                'queue_depth': self._queue.qsize(),
+                'queue_max': self._queue.maxsize,
+                'overflow_policy': self.overflow,
+                'batch_size': self.batch_size,
+                'flush_interval': self.flush_interval,
+                'written': self.written,
+                'batches': self.batches,
+                'dropped': self.dropped,
+                'failed': self.failed
+            }
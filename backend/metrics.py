@@ -0,0 +1,192 @@
+# metrics.py - Prometheus text-format metrics; each thread records into its own shard, so no locks on the hot path
+import math
+import threading
+from bisect import bisect_left
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+# Seconds; wide enough for a text-mode encrypt (~10us) and a 4096-bit key generation (seconds)
+DEFAULT_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+                   0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+class _Sharded:
+    """Values kept per thread: a thread only ever writes its own shard, readers add them all up.
+
+    Shards are keyed by thread ident; idents of finished threads get reused, and so do their
+    shards, so thread-per-request servers do not grow this without bound.
+    """
+
+    def __init__(self, width: int):
+        self.width = width
+        self._shards: Dict[int, List[float]] = {}
+
+    def _shard(self) -> List[float]:
+        shard = self._shards.get(threading.get_ident())
+        if shard is None:
+            shard = self._shards.setdefault(threading.get_ident(), [0.0] * self.width)
+        return shard
+
+    def _total(self) -> List[float]:
+        total = [0.0] * self.width
+        for shard in list(self._shards.values()):
+            for i, v in enumerate(shard):
+                total[i] += v
+        return total
+
+class Counter(_Sharded):
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1.0):
+        self._shard()[0] += amount
+
+    def samples(self, name: str, labels: str) -> Iterable[str]:
+        yield f'{name}{labels} {_fmt(self._total()[0])}'
+
+class Gauge(_Sharded):
+    """Up/down gauge; inc and dec may come from different threads, the shards still sum up"""
+
+    def __init__(self):
+        super().__init__(1)
+
+    def inc(self, amount: float = 1.0):
+        self._shard()[0] += amount
+
+    def dec(self, amount: float = 1.0):
+        self._shard()[0] -= amount
+
+    def samples(self, name: str, labels: str) -> Iterable[str]:
+        yield f'{name}{labels} {_fmt(self._total()[0])}'
+
+class Histogram(_Sharded):
+    """Fixed buckets; each shard holds per-bucket counts (the last one is +Inf) followed by the sum"""
+
+    def __init__(self, buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.bounds = tuple(buckets)
+        super().__init__(len(self.bounds) + 2)
+
+    def observe(self, value: float):
+        shard = self._shard()
+        shard[bisect_left(self.bounds, value)] += 1
+        shard[-1] += value
+
+    def samples(self, name: str, labels: str) -> Iterable[str]:
+        total = self._total()
+        inner = labels[1:-1] + ',' if labels else ''
+        running = 0.0
+        for bound, n in zip(self.bounds + (math.inf,), total):
+            running += n
+            le = '+Inf' if bound == math.inf else _fmt(bound)
+            yield f'{name}_bucket{{{inner}le="{le}"}} {_fmt(running)}'
+        yield f'{name}_sum{labels} {_fmt(total[-1])}'
+        yield f'{name}_count{labels} {_fmt(running)}'
+
+class Family:
+    """A metric name with one child per label-value combination, created on first use"""
+
+    def __init__(self, name: str, help_text: str, kind: str, labelnames: Tuple[str, ...],
+                 factory: Callable[[], _Sharded]):
+        self.name = name
+        self.help = help_text
+        self.kind = kind
+        self.labelnames = labelnames
+        self._factory = factory
+        self._children: Dict[Tuple[str, ...], _Sharded] = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values: str):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = self._children[values] = self._factory()
+        return child
+
+    def render(self) -> Iterable[str]:
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} {self.kind}'
+        for values, child in sorted(self._children.items()):
+            yield from child.samples(self.name, _labels(self.labelnames, values))
+
+class Registry:
+    def __init__(self):
+        self.families: List[Family] = []
+        self.collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Tuple[dict, float]]]]]] = []
+
+    def _add(self, family: Family) -> Family:
+        self.families.append(family)
+        return family
+
+    def counter(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Family:
+        return self._add(Family(name, help_text, 'counter', labelnames, Counter))
+
+    def gauge(self, name: str, help_text: str, labelnames: Tuple[str, ...] = ()) -> Family:
+        return self._add(Family(name, help_text, 'gauge', labelnames, Gauge))
+
+    def histogram(self, name: str, help_text: str, labelnames: Tuple[str, ...] = (),
+                  buckets: Sequence[float] = DEFAULT_BUCKETS) -> Family:
+        return self._add(Family(name, help_text, 'histogram', labelnames, lambda: Histogram(buckets)))
+
+    def register_collector(self, collect: Callable):
+        """collect() returns (name, type, help, [(labels, value), ...]) tuples, read at scrape time"""
+        self.collectors.append(collect)
+
+    def render(self) -> str:
+        lines: List[str] = []
+        for family in self.families:
+            lines.extend(family.render())
+        for collect in self.collectors:
+            for name, kind, help_text, samples in collect():
+                lines.append(f'# HELP {name} {help_text}')
+                lines.append(f'# TYPE {name} {kind}')
+                for labels, value in samples:
+                    lines.append(f'{name}{_labels(tuple(labels), tuple(labels.values()))} {_fmt(value)}')
+        return '\n'.join(lines) + '\n'
+
+def _fmt(value: float) -> str:
+    if value == math.inf:
+        return '+Inf'
+    return repr(int(value)) if float(value).is_integer() else repr(float(value))
+
+def _labels(names: Tuple[str, ...], values: Tuple[str, ...]) -> str:
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{k}="{v}"' for k, v in zip(names, escaped)) + '}'
+
+_bits_labels: Dict[int, str] = {}
+
+def bits_label(bits: int) -> str:
+    """Key size label, rounded up to a multiple of 512 bits to keep label sets small"""
+    label = _bits_labels.get(bits)
+    if label is None:
+        label = _bits_labels[bits] = str(max(512, -(-bits // 512) * 512))
+    return label
+
+# Global registry and the metrics recorded across the backend
+registry = Registry()
+
+REQUEST_LATENCY = registry.histogram(
+    'rsa_http_request_duration_seconds', 'Request handling time by route and mode', ('route', 'mode'))
+REQUESTS_IN_FLIGHT = registry.gauge(
+    'rsa_http_requests_in_flight', 'Requests currently being handled', ('route',))
+RESPONSES = registry.counter(
+    'rsa_http_responses_total', 'Responses by route and status code', ('route', 'status'))
+MODEXP_LATENCY = registry.histogram(
+    'rsa_modexp_duration_seconds', 'Time in rsa_core encrypt/decrypt/sign/verify calls by operation, mode and key size',
+    ('op', 'mode', 'bits'))
+MODEXP_BLOCKS = registry.counter(
+    'rsa_modexp_blocks_total', 'Blocks processed by rsa_core encrypt/decrypt/sign/verify calls', ('op', 'mode', 'bits'))
+KEYGEN_LATENCY = registry.histogram(
+    'rsa_keygen_duration_seconds', 'Key pair generation time by key size and caller', ('bits', 'source'))
+MONGO_WRITE_LATENCY = registry.histogram(
+    'rsa_mongo_write_duration_seconds', 'MongoDB write time by operation', ('op',))
+MONGO_WRITE_FAILURES = registry.counter(
+    'rsa_mongo_write_failures_total', 'Failed MongoDB writes by operation', ('op',))
+
+def observe_modexp(op: str, mode: str, n_bits: int, blocks: int, seconds: float):
+    """Record one rsa_core call; pool workers cannot record here, so callers time work in this process"""
+    bits = bits_label(n_bits)
+    MODEXP_LATENCY.labels(op, mode, bits).observe(seconds)
+    MODEXP_BLOCKS.labels(op, mode, bits).inc(blocks)
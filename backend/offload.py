@@ -0,0 +1,43 @@
+# offload.py - Run CPU-heavy rsa_core calls in the shared process pool instead of the request thread
+import os
+import sys
+from collections import OrderedDict
+from typing import Any, Callable, Tuple
+
+# Import RSA core from demo folder
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+demo_dir = os.path.join(project_root, 'demo')
+sys.path.insert(0, demo_dir)
+
+from rsa_core import RSAKey, get_pool
+from config import Config
+
+# Per worker process: keys seen recently, so their byte tables survive between calls
+# (RSAKey pickles without its tables)
+_WORKER_KEYS_MAX = 64
+_worker_keys: 'OrderedDict[Tuple[int, int], RSAKey]' = OrderedDict()
+
+def _worker_key(K: RSAKey) -> RSAKey:
+    ident = (K.n, K.d)
+    cached = _worker_keys.get(ident)
+    if cached is None:
+        _worker_keys[ident] = cached = K
+        if len(_worker_keys) > _WORKER_KEYS_MAX:
+            _worker_keys.popitem(last=False)
+    else:
+        _worker_keys.move_to_end(ident)
+    return cached
+
+def _call(fn: Callable, args: tuple, kwargs: dict) -> Any:
+    args = tuple(_worker_key(a) if isinstance(a, RSAKey) else a for a in args)
+    return fn(*args, **kwargs)
+
+def run_cpu(fn: Callable, *args, **kwargs) -> Any:
+    """Call fn(*args, **kwargs) in a pool worker when Config.CPU_OFFLOAD is on, inline otherwise.
+
+    The calling thread just waits on the result, so it holds no GIL while the math runs and
+    other requests in this process keep being served. fn must be a module-level function.
+    """
+    if not Config.CPU_OFFLOAD:
+        return fn(*args, **kwargs)
+    return get_pool(Config.CPU_OFFLOAD_WORKERS).submit(_call, fn, args, kwargs).result()
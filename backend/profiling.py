@@ -0,0 +1,167 @@
+# profiling.py - Opt-in tracing of single requests: collapsed stacks (flamegraph input) and per-phase timings
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Dict, Iterator, List, Optional
+
+from config import Config
+
+# Phases of a request, recognised by function (qualified) name. A phase's time is the
+# inclusive time of its outermost matching frames, so nested matches are not counted twice.
+PHASES = (
+    ('decode', {'get_json', 'get_data', 'b64_to_int_list', 'unpack_packed', 'unpack_binary', 'b64decode'}),
+    ('compute', {'run_cpu', 'rsa_encrypt_text', 'rsa_decrypt_text', 'rsa_encrypt_packed',
+                 'rsa_decrypt_packed', 'KeyManager.generate_key', 'generate_rsa', 'sign_item',
+                 'verify_item', 'run_batch', 'JobManager.start_generate_key'}),
+    ('encode', {'int_list_to_b64', 'pack_packed', 'pack_binary', 'export_public', 'export_private', 'b64encode'}),
+    ('serialize', {'jsonify', 'OrjsonProvider.response', 'DefaultJSONProvider.response'})
+)
+PHASE_NAMES = ('validate',) + tuple(name for name, _ in PHASES)
+
+class _Node:
+    """One call path in the trace tree; time is self time in seconds"""
+    __slots__ = ('name', 'label', 'phase', 'time', 'children')
+
+    def __init__(self, name: str, label: str, phase: Optional[str]):
+        self.name = name
+        self.label = label
+        self.phase = phase
+        self.time = 0.0
+        self.children: Dict[str, '_Node'] = {}
+
+    def total(self) -> float:
+        return self.time + sum(child.total() for child in self.children.values())
+
+def _phase_of(name: str, filename: str) -> Optional[str]:
+    # the validators' decorators wrap whole handlers, so they are not the validate phase
+    if filename == 'validators.py' and not name.endswith('decorated_function'):
+        return 'validate'
+    for phase, names in PHASES:
+        if name in names:
+            return phase
+    return None
+
+class RequestProfiler:
+    """Deterministic profiler for the current thread (sys.setprofile), so C calls such as
+    gmpy2.powmod or base64 show up as frames. Only ever installed for a flagged request.
+    """
+
+    def __init__(self, root: str):
+        self.root = _Node(root, root, None)
+        self._stack: List[_Node] = [self.root]
+        self._labels: Dict[object, tuple] = {}
+        self._last = 0.0
+        self.started = 0.0
+        self.elapsed = 0.0
+
+    def start(self):
+        self.started = self._last = time.perf_counter()
+        sys.setprofile(self._event)
+
+    def stop(self):
+        sys.setprofile(None)
+        now = time.perf_counter()
+        self._stack[-1].time += now - self._last
+        self.elapsed = now - self.started
+
+    def _code_label(self, code) -> tuple:
+        info = self._labels.get(code)
+        if info is None:
+            name = getattr(code, 'co_qualname', code.co_name)
+            filename = os.path.basename(code.co_filename)
+            info = self._labels[code] = (name, f'{name} ({filename}:{code.co_firstlineno})', _phase_of(name, filename))
+        return info
+
+    def _event(self, frame, event, arg):
+        now = time.perf_counter()
+        stack = self._stack
+        node = stack[-1]
+        node.time += now - self._last
+        if event == 'call':
+            name, label, phase = self._code_label(frame.f_code)
+            self._push(node, name, label, phase)
+        elif event == 'c_call':
+            name = getattr(arg, '__qualname__', None) or getattr(arg, '__name__', '?')
+            module = getattr(arg, '__module__', None)
+            self._push(node, name, f'{module}.{name}' if module else name, None)
+        elif len(stack) > 1:
+            # return / c_return / c_exception; returns from frames entered before start() are ignored
+            stack.pop()
+        self._last = time.perf_counter()
+
+    def _push(self, parent: _Node, name: str, label: str, phase: Optional[str]):
+        child = parent.children.get(label)
+        if child is None:
+            child = parent.children[label] = _Node(name, label, phase)
+        self._stack.append(child)
+
+    def collapsed(self) -> Iterator[str]:
+        """Folded stacks ('a;b;c <microseconds>' per line), as read by flamegraph.pl and speedscope"""
+        def walk(node: _Node, prefix: str):
+            path = f'{prefix};{node.label}' if prefix else node.label
+            micros = int(node.time * 1e6)
+            if micros:
+                yield f'{path} {micros}'
+            for child in node.children.values():
+                yield from walk(child, path)
+        return walk(self.root, '')
+
+    def phases(self) -> Dict[str, float]:
+        """Milliseconds per phase; 'other' is whatever the phases do not cover"""
+        totals = dict.fromkeys(PHASE_NAMES, 0.0)
+
+        def walk(node: _Node):
+            for child in node.children.values():
+                if child.phase is not None:
+                    totals[child.phase] += child.total()
+                else:
+                    walk(child)
+        walk(self.root)
+        result = {name: round(seconds * 1000, 3) for name, seconds in totals.items()}
+        result['other'] = round(max(0.0, self.elapsed - sum(totals.values())) * 1000, 3)
+        result['total'] = round(self.elapsed * 1000, 3)
+        return result
+
+class ProfileStore:
+    """The most recent request profiles, kept in memory"""
+
+    def __init__(self, max_profiles: int):
+        self.max_profiles = max_profiles
+        self._profiles: 'OrderedDict[str, dict]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def add(self, method: str, path: str, status: int, profiler: RequestProfiler) -> dict:
+        profile = {
+            'profile_id': uuid.uuid4().hex,
+            'method': method,
+            'path': path,
+            'status': status,
+            'timestamp': time.time(),
+            'phases_ms': profiler.phases(),
+            'collapsed': list(profiler.collapsed())
+        }
+        with self._lock:
+            self._profiles[profile['profile_id']] = profile
+            while len(self._profiles) > self.max_profiles:
+                self._profiles.popitem(last=False)
+        return profile
+
+    def get(self, profile_id: str) -> Optional[dict]:
+        with self._lock:
+            return self._profiles.get(profile_id)
+
+    def list(self) -> List[dict]:
+        """Newest first, without the stacks"""
+        with self._lock:
+            profiles = list(self._profiles.values())
+        return [{k: v for k, v in p.items() if k != 'collapsed'} for p in reversed(profiles)]
+
+def server_timing(phases_ms: Dict[str, float]) -> str:
+    """Server-Timing header value, shown per request in browser dev tools"""
+    return ', '.join(f'{name};dur={ms}' for name, ms in phases_ms.items())
+
+# Global profile store
+profile_store = ProfileStore(Config.PROFILE_STORE_MAX)
@@ -0,0 +1,308 @@
+# rate_limit.py - Per-client token buckets charged by estimated CPU cost, with memory or SQLite state
+import logging
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+# Estimated CPU time (ms) of one RSA block at 1024 bits and how it grows with key size:
+# ms(bits) = base * (bits / 1024) ** exponent. Measured on the demo server; only the ratios matter.
+BLOCK_COSTS = {
+    'private': (0.75, 2.6),    # packed decrypt, sign (CRT modexp)
+    'public': (0.05, 1.6),     # packed encrypt, verify (e = 65537)
+    'table': (0.0005, 1.0)     # text mode: byte lookup tables
+}
+KEYGEN_COST = (30.0, 2.5)
+# Shared-prime audit (batch GCD): ms per stored key per tree level, measured with gmpy2 on 2048-bit keys
+AUDIT_KEY_MS = 0.05
+# /api/factor: ms charged per CPU-second a job is expected to use (at most its budget). The job runs in
+# the factor pool, not on the request path, so the default 5 s budget costs a few units, not a bucket.
+# Expected time follows Pollard rho: about n ** (1/4) steps of FACTOR_STEP_MS each
+FACTOR_MS_PER_CPU_SECOND = 20.0
+FACTOR_STEP_MS = 0.001
+# Paths that are never charged, and prefixes of job status/progress endpoints whose GETs are free
+EXEMPT_PATHS = ('/', '/api/health', '/api/metrics')
+POLL_PREFIXES = ('/api/factor/', '/api/jobs/')
+
+def is_exempt(method: str, path: str) -> bool:
+    """Requests the limiter never charges: health/metrics and polling a job's status or events"""
+    return path in EXEMPT_PATHS or (method == 'GET' and path.startswith(POLL_PREFIXES))
+
+def block_ms(kind: str, bits: int) -> float:
+    """Estimated CPU time of one block operation"""
+    base, exponent = BLOCK_COSTS[kind]
+    return base * (max(bits, 1) / 1024) ** exponent
+
+def keygen_ms(bits: int) -> float:
+    base, exponent = KEYGEN_COST
+    return base * (max(bits, 1) / 1024) ** exponent
+
+def factor_ms(bits: float, budget_ms: float) -> float:
+    expected_ms = 2 ** (min(bits, 1024) / 4) * FACTOR_STEP_MS
+    return min(budget_ms, expected_ms) / 1000 * FACTOR_MS_PER_CPU_SECOND
+
+def audit_ms(keys: int) -> float:
+    return AUDIT_KEY_MS * keys * math.log2(max(keys, 2))
+
+def packed_blocks(byte_count: int, bits: int) -> int:
+    """Blocks needed for byte_count bytes of packed data under a bits-sized modulus"""
+    return math.ceil(byte_count / max(bits // 8 - 1, 1))
+
+def _item_ms(op: str, item: Dict[str, Any], key_bits: Callable[[Any], int]) -> float:
+    """Estimated CPU time of one encrypt/decrypt/sign/verify request body (or batch item)"""
+    if not isinstance(item, dict):
+        return 0.0
+    bits = key_bits(item.get('key_id'))
+    if not bits:
+        return 0.0  # unknown key: the handler answers 404 without doing RSA work
+    mode = str(item.get('mode') or 'text').strip().lower()
+
+    if op == 'encrypt':
+        message = item.get('message')
+        length = len(message) if isinstance(message, str) else 0
+        if mode == 'packed':
+            return packed_blocks(length, bits) * block_ms('public', bits)
+        return length * block_ms('table', bits)
+    if op == 'decrypt':
+        if 'ciphertext_bin' in item:
+            blob = item['ciphertext_bin'] or b''
+            size = len(blob) * 3 // 4 if isinstance(blob, str) else len(blob)
+            blocks = math.ceil(size / max(bits // 8, 1))
+        elif mode == 'packed':
+            ciphertext = item.get('ciphertext')
+            blocks = ciphertext.get('c') if isinstance(ciphertext, dict) else None
+            blocks = len(blocks) if isinstance(blocks, list) else 0
+        else:
+            blocks_b64 = item.get('ciphertext_blocks_b64')
+            blocks = len(blocks_b64) if isinstance(blocks_b64, list) else 0
+        # text mode too: blocks missing from the byte tables fall back to a CRT modexp
+        return blocks * block_ms('private', bits)
+    if op == 'sign':
+        return block_ms('private', bits)
+    if op == 'verify':
+        return block_ms('public', bits)
+    return 0.0
+
+def estimate_cost_ms(path: str, data: Optional[Dict[str, Any]], key_bits: Callable[[Any], int],
+                     content_length: int = 0, pool_ready: Callable[[int], bool] = lambda bits: False,
+                     key_count: Callable[[], int] = lambda: 0) -> float:
+    """Estimated CPU time (ms) a request will cost, from its path and (already parsed) body"""
+    data = data if isinstance(data, dict) else {}
+
+    if path in ('/api/generate-key', '/api/jobs/generate-key'):
+        try:
+            bits = int(data.get('bits', 1024))
+        except (TypeError, ValueError):
+            return 0.0
+        # a pre-generated key is handed out without a prime search
+        return 0.0 if pool_ready(bits) else keygen_ms(bits)
+    if path in ('/api/encrypt', '/api/decrypt', '/api/sign', '/api/verify'):
+        return _item_ms(path.rsplit('/', 1)[1], data, key_bits)
+    if path in ('/api/encrypt/batch', '/api/decrypt/batch', '/api/verify/batch'):
+        op = path.split('/')[2]
+        items = data.get('items')
+        if not isinstance(items, list):
+            return 0.0
+        return sum(_item_ms(op, item, key_bits) for item in items[:Config.VERIFY_BATCH_MAX_ITEMS])
+    if path in ('/api/encrypt/stream', '/api/decrypt/stream'):
+        bits = key_bits(data.get('key_id'))
+        if not bits:
+            return 0.0
+        # at least one block, so an empty or tiny body still pays for a modexp
+        if path == '/api/encrypt/stream':
+            return max(1, packed_blocks(content_length, bits)) * block_ms('public', bits)
+        # NDJSON lines carry base64 blocks: ~4/3 of the modulus size each
+        return max(1, math.ceil(content_length * 3 / 4 / (bits // 8))) * block_ms('private', bits)
+    if path == '/api/keys/audit':
+        return audit_ms(key_count())
+    if path == '/api/factor':
+        try:
+            budget_ms = float(data.get('budget_ms', Config.FACTOR_DEFAULT_BUDGET_MS))
+        except (TypeError, ValueError):
+            return 0.0
+        digits = str(data.get('n', '')).strip()
+        bits = len(digits) * math.log2(10) if digits.isdigit() else key_bits(data.get('key_id'))
+        return factor_ms(bits, budget_ms) if bits else 0.0
+    return 0.0
+
+@dataclass
+class Decision:
+    """Outcome of charging one request against a client's bucket"""
+    allowed: bool
+    limit: int
+    remaining: float
+    reset: float        # seconds until the bucket is full again
+    retry_after: float  # seconds until this request's cost would fit (0 when allowed)
+    cost: float
+
+def take_tokens(state: Optional[Tuple[float, float]], cost: float, capacity: float,
+                rate: float, now: float) -> Tuple[Tuple[float, float], bool]:
+    """Refill a (tokens, stamp) bucket to now and take cost from it if it fits"""
+    tokens, stamp = state if state is not None else (capacity, now)
+    tokens = min(capacity, tokens + max(0.0, now - stamp) * rate)
+    allowed = tokens >= cost
+    if allowed:
+        tokens -= cost
+    return (tokens, now), allowed
+
+class MemoryRateLimitBackend:
+    """Buckets in this process only; the least recently seen clients are forgotten beyond max_clients"""
+
+    def __init__(self, max_clients: int = 100000):
+        self.max_clients = max_clients
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def consume(self, client: str, cost: float, capacity: float, rate: float) -> Tuple[float, bool]:
+        """Charge cost to client's bucket; returns (tokens left, allowed)"""
+        now = time.monotonic()
+        with self._lock:
+            state, allowed = take_tokens(self._buckets.get(client), cost, capacity, rate, now)
+            self._buckets[client] = state
+            self._buckets.move_to_end(client)
+            if len(self._buckets) > self.max_clients:
+                # a forgotten client starts again with a full bucket
+                self._buckets.popitem(last=False)
+        return state[0], allowed
+
+    def stats(self) -> dict:
+        return {'backend': 'memory', 'clients': len(self._buckets), 'max_clients': self.max_clients}
+
+class SQLiteRateLimitBackend:
+    """Buckets in a SQLite database (WAL) shared by every worker process on the host"""
+
+    PRUNE_EVERY = 1000  # writes between sweeps of idle (full) buckets
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._local = threading.local()
+        self._writes = 0
+        conn = self._conn()
+        conn.execute('PRAGMA journal_mode=WAL')
+        conn.execute('CREATE TABLE IF NOT EXISTS rate_limits (client TEXT PRIMARY KEY, tokens REAL NOT NULL, stamp REAL NOT NULL)')
+        conn.commit()
+        logger.info(f"SQLite rate limit state at {path}")
+
+    def _conn(self) -> sqlite3.Connection:
+        """One connection per thread (sqlite3 connections are thread-bound)"""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self._local.conn = conn
+        return conn
+
+    def consume(self, client: str, cost: float, capacity: float, rate: float) -> Tuple[float, bool]:
+        """Charge cost to client's bucket; returns (tokens left, allowed)"""
+        # wall clock: stamps are compared across processes
+        now = time.time()
+        conn = self._conn()
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute('SELECT tokens, stamp FROM rate_limits WHERE client = ?', (client,)).fetchone()
+            state, allowed = take_tokens(row, cost, capacity, rate, now)
+            conn.execute('INSERT OR REPLACE INTO rate_limits (client, tokens, stamp) VALUES (?, ?, ?)', (client, *state))
+            self._writes += 1
+            if self._writes % self.PRUNE_EVERY == 0:
+                # buckets idle long enough to have refilled carry no information
+                conn.execute('DELETE FROM rate_limits WHERE stamp < ?', (now - capacity / rate,))
+            conn.execute('COMMIT')
+        except Exception:
+            conn.execute('ROLLBACK')
+            raise
+        return state[0], allowed
+
+    def stats(self) -> dict:
+        clients = self._conn().execute('SELECT COUNT(*) FROM rate_limits').fetchone()[0]
+        return {'backend': 'sqlite', 'path': self.path, 'clients': clients}
+
+class RateLimiter:
+    """Token bucket per client: `capacity` cost units, refilled evenly over `window` seconds.
+
+    A request costs 1 unit plus 1 per ``cost_unit_ms`` of estimated CPU time, capped at the
+    capacity so that any single request can still run once the bucket is full.
+    """
+
+    def __init__(self, backend, capacity: int, window: float, cost_unit_ms: float):
+        self.backend = backend
+        self.capacity = max(1, capacity)
+        self.window = window
+        self.rate = self.capacity / window
+        self.cost_unit_ms = cost_unit_ms
+        self.allowed = 0
+        self.limited = 0
+        self.errors = 0
+
+    def cost(self, cpu_ms: float) -> float:
+        return min(float(self.capacity), 1.0 + cpu_ms / self.cost_unit_ms)
+
+    def check(self, client: str, cpu_ms: float = 0.0) -> Optional[Decision]:
+        """Charge a request; None if the backend failed (requests are then let through)"""
+        cost = self.cost(cpu_ms)
+        try:
+            tokens, allowed = self.backend.consume(client, cost, self.capacity, self.rate)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"Rate limit backend error, letting request through: {e}")
+            return None
+        if allowed:
+            self.allowed += 1
+        else:
+            self.limited += 1
+        return Decision(
+            allowed=allowed,
+            limit=self.capacity,
+            remaining=tokens,
+            reset=(self.capacity - tokens) / self.rate,
+            retry_after=0.0 if allowed else (cost - tokens) / self.rate,
+            cost=cost
+        )
+
+    def headers(self, decision: Decision) -> Dict[str, str]:
+        """RateLimit-* headers (IETF draft), plus Retry-After when the request was refused"""
+        headers = {
+            'RateLimit-Limit': str(decision.limit),
+            'RateLimit-Remaining': str(int(decision.remaining)),
+            'RateLimit-Reset': str(math.ceil(decision.reset)),
+            'RateLimit-Policy': f'{self.capacity};w={int(self.window)}'
+        }
+        if not decision.allowed:
+            headers['Retry-After'] = str(max(1, math.ceil(decision.retry_after)))
+        return headers
+
+    def stats(self) -> dict:
+        return {
+            'capacity': self.capacity,
+            'window': self.window,
+            'cost_unit_ms': self.cost_unit_ms,
+            'allowed': self.allowed,
+            'limited': self.limited,
+            'errors': self.errors,
+            **self.backend.stats()
+        }
+
+def create_rate_limit_backend(backend: Optional[str] = None):
+    """Build the bucket store selected by Config.RATE_LIMIT_BACKEND ('memory' or 'sqlite')"""
+    backend = (backend or Config.RATE_LIMIT_BACKEND).strip().lower()
+    if backend == 'sqlite':
+        return SQLiteRateLimitBackend(Config.RATE_LIMIT_PATH)
+    if backend != 'memory':
+        raise ValueError(f"Unknown rate limit backend: {backend}")
+    return MemoryRateLimitBackend(Config.RATE_LIMIT_MAX_CLIENTS)
+
+# Global rate limiter instance
+rate_limiter = RateLimiter(
+    create_rate_limit_backend(),
+    capacity=Config.MAX_REQUESTS_PER_WINDOW,
+    window=Config.RATE_LIMIT_WINDOW,
+    cost_unit_ms=Config.RATE_LIMIT_COST_UNIT_MS
+)
@@ -1,34 +1,212 @@
 # routes.py - API route handlers
+import base64
+import itertools
 import logging
+import math
 import os
 import sys
-from datetime import datetime
-from flask import request, jsonify
+import time
+from dataclasses import asdict
+from datetime import datetime, timedelta, timezone
+from flask import current_app, g, request, jsonify, Response, stream_with_context
 
 # Import RSA core from demo folder
 project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 demo_dir = os.path.join(project_root, 'demo')
 sys.path.insert(0, demo_dir)
 
+import rsa_core
 from rsa_core import (
     rsa_encrypt_text, rsa_decrypt_text,
     rsa_encrypt_packed, rsa_decrypt_packed,
     pack_packed, unpack_packed,
-    int_list_to_b64, b64_to_int_list
+    int_list_to_b64, b64_to_int_list,
+    pack_binary, unpack_binary,
+    export_public, export_private
 )
+from config import Config
 from validators import (
-    validate_json_required, validate_encryption_request,
-    validate_decryption_request, validate_key_size,
-    ValidationError
+    validate_json_required, validate_json_or_binary, validate_key_id_format, validate_encryption_request,
+    validate_decryption_request, validate_key_generation_request,
+    validate_batch_request, validate_factor_request,
+    validate_sign_request, validate_verify_request, validate_log_query, validate_stats_query,
+    validate_number_range, ValidationError
 )
+from batch import run_batch, sign_item, verify_item
+from streaming import encrypt_ndjson, decrypt_ndjson
 from key_manager import key_manager
+from factorization import factor_engine
+from jobs import job_manager
 from database import db_manager
+from offload import run_cpu
+from rate_limit import rate_limiter, estimate_cost_ms, is_exempt
+from metrics import (
+    registry, CONTENT_TYPE, REQUEST_LATENCY, REQUESTS_IN_FLIGHT, RESPONSES,
+    observe_modexp
+)
+from profiling import RequestProfiler, profile_store, server_timing
 
 logger = logging.getLogger(__name__)
 
+def _client_id() -> str:
+    """Rate limit identity: the peer address, or the first X-Forwarded-For hop behind a trusted proxy"""
+    if Config.RATE_LIMIT_TRUST_PROXY:
+        forwarded = request.headers.get('X-Forwarded-For', '')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.remote_addr or 'unknown'
+
+def _key_bits(key_id) -> int:
+    """Modulus size of a stored key, 0 if unknown (memoized per request: batches repeat key ids)"""
+    if not isinstance(key_id, str):
+        return 0
+    cache = g.setdefault('key_bits', {})
+    if key_id not in cache:
+        key = key_manager.peek_key(key_id) if validate_key_id_format(key_id) else None
+        cache[key_id] = key.n.bit_length() if key is not None else 0
+    return cache[key_id]
+
+def _request_cost_ms() -> float:
+    """Estimated RSA work of the current request; the body parsed here is reused by the handler"""
+    if request.path.endswith('/stream'):
+        # never read a streaming body up front; chunked bodies (no Content-Length) pay a fixed size
+        length = request.content_length
+        if length is None:
+            length = Config.STREAM_UNKNOWN_LENGTH_BYTES
+        return estimate_cost_ms(request.path, request.args, _key_bits, length)
+    if request.mimetype == 'application/octet-stream':
+        data = {'key_id': request.args.get('key_id'), 'mode': request.args.get('mode', 'packed'),
+                'ciphertext_bin': request.get_data()}
+    else:
+        data = request.get_json(silent=True)
+    pool = key_manager.pool
+    return estimate_cost_ms(request.path, data, _key_bits,
+                            pool_ready=lambda bits: pool is not None and pool.ready(bits) > 0,
+                            key_count=lambda: len(key_manager.keys_storage))
+
+# Routes whose latency is broken down by mode
+MODE_ROUTES = ('/api/encrypt', '/api/decrypt')
+
+def _mode_label() -> str:
+    if request.mimetype == 'application/octet-stream':
+        mode = request.args.get('mode', 'packed')
+    else:
+        data = request.get_json(silent=True)
+        mode = (data.get('mode') or 'text') if isinstance(data, dict) else 'text'
+    return mode if mode in ('text', 'packed') else 'other'
+
+def _observe_modexp(op: str, mode: str, key, blocks: int, start: float):
+    """Record one rsa_core encrypt/decrypt call started at perf_counter() time `start`"""
+    observe_modexp(op, mode, key.n.bit_length(), blocks, time.perf_counter() - start)
+
+def _component_metrics():
+    """Counters kept by other components, read when /api/metrics is scraped"""
+    ps = key_manager.prime_stats
+    yield 'rsa_gen_prime_windows_total', 'counter', 'Random sieve windows drawn by gen_prime', [({}, ps.windows)]
+    yield 'rsa_gen_prime_sieved_total', 'counter', 'Candidates covered by the gen_prime sieve', [({}, ps.sieved)]
+    yield 'rsa_gen_prime_mr_tested_total', 'counter', 'Sieve survivors sent to Miller-Rabin', [({}, ps.mr_tested)]
+    yield 'rsa_gen_prime_primes_total', 'counter', 'Primes found by gen_prime', [({}, ps.primes)]
+    yield 'rsa_gen_prime_seconds_total', 'counter', 'Time spent searching for primes, summed over workers', [({}, ps.seconds)]
+    if key_manager.pool is not None:
+        pool = key_manager.pool.stats()
+        yield 'rsa_key_pool_ready', 'gauge', 'Pre-generated keys ready by key size', \
+            [({'bits': b}, n) for b, n in pool['fill'].items()]
+    cache = key_manager.keys_storage.stats()
+    yield 'rsa_key_store_entries', 'gauge', 'Keys held in the key store', [({}, cache['entries'])]
+    writer = db_manager.writer_stats()
+    if writer is not None:
+        yield 'rsa_log_writer_queue_depth', 'gauge', 'Log entries waiting to be written', [({}, writer['queue_depth'])]
+        yield 'rsa_log_writer_entries_total', 'counter', 'Log entries by outcome', \
+            [({'outcome': k}, writer[k]) for k in ('written', 'dropped', 'failed')]
+    if Config.RATE_LIMIT_ENABLED:
+        yield 'rsa_rate_limit_requests_total', 'counter', 'Rate limit decisions', \
+            [({'decision': 'allowed'}, rate_limiter.allowed), ({'decision': 'limited'}, rate_limiter.limited)]
+
+registry.register_collector(_component_metrics)
+
+def _profile_requested() -> bool:
+    flag = request.headers.get('X-Profile') or request.args.get('profile')
+    if not flag:
+        return False
+    if Config.PROFILE_TOKEN:
+        return flag == Config.PROFILE_TOKEN
+    return flag.lower() in ('1', 'true')
+
 def register_routes(app):
     """Register all API routes"""
     
+    if Config.PROFILING_ENABLED:
+        # registered first: the trace covers the other hooks, its after_request hook runs last
+        @app.before_request
+        def profile_start():
+            if _profile_requested():
+                g.profiler = RequestProfiler(f'{request.method} {request.path}')
+                g.profiler.start()
+
+        @app.after_request
+        def profile_finish(response):
+            profiler = g.pop('profiler', None)
+            if profiler is not None:
+                profiler.stop()
+                profile = profile_store.add(request.method, request.path, response.status_code, profiler)
+                response.headers['X-Profile-Id'] = profile['profile_id']
+                response.headers['Server-Timing'] = server_timing(profile['phases_ms'])
+            return response
+
+        @app.teardown_request
+        def profile_teardown(exc):
+            # an unhandled error skips after_request; never leave the tracer installed
+            profiler = g.pop('profiler', None)
+            if profiler is not None:
+                profiler.stop()
+    
+    if Config.METRICS_ENABLED:
+        @app.before_request
+        def metrics_start():
+            g.metrics_route = request.url_rule.rule if request.url_rule is not None else 'unmatched'
+            REQUESTS_IN_FLIGHT.labels(g.metrics_route).inc()
+            g.metrics_start = time.perf_counter()
+
+        @app.after_request
+        def metrics_finish(response):
+            route = g.get('metrics_route')
+            if route is not None:
+                mode = _mode_label() if route in MODE_ROUTES else ''
+                REQUEST_LATENCY.labels(route, mode).observe(time.perf_counter() - g.metrics_start)
+                RESPONSES.labels(route, str(response.status_code)).inc()
+            return response
+
+        @app.teardown_request
+        def metrics_teardown(exc):
+            # after streamed bodies finish, and on unhandled errors
+            route = g.pop('metrics_route', None)
+            if route is not None:
+                REQUESTS_IN_FLIGHT.labels(route).dec()
+    
+    @app.before_request
+    def rate_limit():
+        """Charge the request's estimated CPU cost to its client's token bucket; 429 when empty"""
+        if not Config.RATE_LIMIT_ENABLED or request.method == 'OPTIONS' or is_exempt(request.method, request.path):
+            return None
+        decision = rate_limiter.check(_client_id(), _request_cost_ms())
+        if decision is None:
+            return None
+        g.rate_limit = decision
+        if not decision.allowed:
+            logger.warning(f"Rate limited {_client_id()} on {request.path} (cost {decision.cost:.1f})")
+            return jsonify({
+                'success': False,
+                'error': 'Rate limit exceeded, please retry later',
+                'retry_after': max(1, math.ceil(decision.retry_after))
+            }), 429
+
+    @app.after_request
+    def rate_limit_headers(response):
+        decision = g.get('rate_limit')
+        if decision is not None:
+            response.headers.update(rate_limiter.headers(decision))
+        return response
+    
     @app.route('/', methods=['GET'])
     def index():
         """Landing page"""
@@ -84,11 +262,26 @@ def register_routes(app):
                 </div>
                 <h2 style="margin-top: 40px;">API Endpoints:</h2>
                 <div class="endpoint">GET /api/health</div>
+                <div class="endpoint">GET /api/metrics (Prometheus)</div>
+                <div class="endpoint">GET /api/profiles[/&lt;profile_id&gt;] (X-Profile: 1, PROFILING_ENABLED)</div>
                 <div class="endpoint">POST /api/generate-key</div>
                 <div class="endpoint">POST /api/encrypt</div>
                 <div class="endpoint">POST /api/decrypt</div>
                 <div class="endpoint">POST /api/encrypt (mode: text | packed)</div>
                 <div class="endpoint">POST /api/decrypt (mode: text | packed)</div>
+                <div class="endpoint">POST /api/encrypt/batch</div>
+                <div class="endpoint">POST /api/decrypt/batch</div>
+                <div class="endpoint">POST /api/encrypt/stream?key_id=...</div>
+                <div class="endpoint">POST /api/decrypt/stream?key_id=...</div>
+                <div class="endpoint">POST /api/sign</div>
+                <div class="endpoint">POST /api/verify</div>
+                <div class="endpoint">POST /api/verify/batch</div>
+                <div class="endpoint">GET /api/keys/audit</div>
+                <div class="endpoint">POST /api/factor</div>
+                <div class="endpoint">GET | DELETE /api/factor/&lt;job_id&gt;</div>
+                <div class="endpoint">POST /api/jobs/generate-key</div>
+                <div class="endpoint">GET | DELETE /api/jobs/&lt;job_id&gt;</div>
+                <div class="endpoint">GET /api/jobs/&lt;job_id&gt;/events (SSE)</div>
             </div>
         </body>
         </html>
@@ -98,7 +291,43 @@ def register_routes(app):
     def health():
         """Health check endpoint"""
         logger.info("Health check request")
-        return jsonify({'status': 'healthy', 'timestamp': datetime.now().isoformat()})
+        return jsonify({
+            'status': 'healthy',
+            'timestamp': datetime.now().isoformat(),
+            'bigint_backend': rsa_core.BACKEND,
+            'prime_search': asdict(key_manager.prime_stats),
+            'key_pool': key_manager.pool.stats() if key_manager.pool else None,
+            'key_cache': key_manager.keys_storage.stats(),
+            'json_encoder': current_app.config.get('JSON_ENCODER_NAME', 'json'),
+            'log_writer': db_manager.writer_stats(),
+            'jobs': job_manager.stats(),
+            'rate_limit': rate_limiter.stats() if Config.RATE_LIMIT_ENABLED else None,
+            'admission': current_app.config['ADMISSION'].stats() if 'ADMISSION' in current_app.config else None
+        })
+
+    @app.route('/api/metrics', methods=['GET'])
+    def metrics():
+        """Prometheus text exposition of this process's metrics"""
+        if not Config.METRICS_ENABLED:
+            return jsonify({'success': False, 'error': 'Metrics are disabled'}), 404
+        return Response(registry.render(), content_type=CONTENT_TYPE)
+
+    @app.route('/api/profiles', methods=['GET'])
+    def list_profiles():
+        """Recent request profiles (phase timings only)"""
+        if not Config.PROFILING_ENABLED:
+            return jsonify({'success': False, 'error': 'Profiling is disabled'}), 404
+        return jsonify({'success': True, 'profiles': profile_store.list()})
+
+    @app.route('/api/profiles/<profile_id>', methods=['GET'])
+    def get_profile(profile_id):
+        """One request profile; ?format=collapsed returns the folded stacks for flamegraph tools"""
+        profile = profile_store.get(profile_id) if Config.PROFILING_ENABLED else None
+        if profile is None:
+            return jsonify({'success': False, 'error': 'Profile not found'}), 404
+        if request.args.get('format') == 'collapsed':
+            return Response('\n'.join(profile['collapsed']) + '\n', mimetype='text/plain')
+        return jsonify({'success': True, **profile})
 
     @app.route('/api/generate-key', methods=['POST'])
     @validate_json_required
@@ -106,26 +335,44 @@ def register_routes(app):
         """Generate new RSA key pair"""
         try:
             data = request.get_json() or {}
-            bits = data.get('bits', 1024)
-            
-            # Validate key size
-            if not validate_key_size(bits):
-                logger.warning(f"Invalid bits value: {bits}")
-                return jsonify({'success': False, 'error': f'bits must be between {1024} and {4096}'}), 400
+            bits, ttl = validate_key_generation_request(data)
             
-            key_id, key = key_manager.generate_key(bits)
+            key_id, key = key_manager.generate_key(bits, ttl=ttl)
             
             return jsonify({
                 'success': True,
                 'key_id': key_id,
-                'public_key': key_manager.get_key_info(key_id)['public_key'],
-                'private_key': key_manager.get_key_info(key_id)['private_key'],
+                'public_key': export_public(key),
+                'private_key': export_private(key),
                 'bit_length': key.n.bit_length()
             })
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Error generating key: {str(e)}", exc_info=True)
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    def _wire_format(data: dict):
+        """Pick the binary wire format: raw bytes via Accept, or a base64 blob via format=binary"""
+        best = request.accept_mimetypes.best_match(['application/json', 'application/octet-stream'])
+        if best == 'application/octet-stream':
+            return 'raw'
+        if (data.get('format') or '').strip().lower() == 'binary':
+            return 'base64'
+        return None
+
+    def _binary_response(wire: str, mode: str, blob: bytes, block_count: int):
+        """Serve binary ciphertext as octet-stream or as one base64 string"""
+        if wire == 'raw':
+            return Response(blob, mimetype='application/octet-stream',
+                            headers={'X-Mode': mode, 'X-Block-Count': str(block_count)})
+        return jsonify({
+            'success': True,
+            'mode': mode,
+            'ciphertext_bin': base64.b64encode(blob).decode(),
+            'block_count': block_count
+        })
+
     @app.route('/api/encrypt', methods=['POST'])
     @validate_json_required
     def encrypt():
@@ -145,8 +392,13 @@ def register_routes(app):
             key = key_manager.get_key(key_id)
             logger.info(f"Encryption request. mode={mode} Key ID: {key_id}, Message length: {len(message)}")
             
+            wire = _wire_format(data)
+            start = time.perf_counter()
             if mode == 'text':
-                blocks = rsa_encrypt_text(message, key)
+                blocks = run_cpu(rsa_encrypt_text, message, key)
+                _observe_modexp('encrypt', 'text', key, len(blocks), start)
+                if wire:
+                    return _binary_response(wire, 'text', pack_binary(blocks, key), len(blocks))
                 blocks_b64 = int_list_to_b64(blocks)
                 return jsonify({
                     'success': True,
@@ -155,7 +407,10 @@ def register_routes(app):
                     'block_count': len(blocks_b64)
                 })
             elif mode == 'packed':
-                blocks, sizes = rsa_encrypt_packed(message, key)
+                blocks, sizes = run_cpu(rsa_encrypt_packed, message, key)
+                _observe_modexp('encrypt', 'packed', key, len(blocks), start)
+                if wire:
+                    return _binary_response(wire, 'packed', pack_binary(blocks, key, sizes[-1]), len(blocks))
                 packed_data = pack_packed(blocks, sizes)
                 return jsonify({
                     'success': True,
@@ -170,12 +425,28 @@ def register_routes(app):
             logger.error(f"Error encrypting: {str(e)}", exc_info=True)
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    def _decrypt_packed(blocks: list, sizes: list, key):
+        """Packed decryption: sharded across the pool when large, else one offloadable call"""
+        if Config.DECRYPT_WORKERS > 1 and len(blocks) * key.n.bit_length() >= Config.PARALLEL_DECRYPT_THRESHOLD:
+            return rsa_decrypt_packed(blocks, sizes, key,
+                                      workers=Config.DECRYPT_WORKERS,
+                                      threshold=Config.PARALLEL_DECRYPT_THRESHOLD)
+        return run_cpu(rsa_decrypt_packed, blocks, sizes, key)
+
     @app.route('/api/decrypt', methods=['POST'])
-    @validate_json_required
+    @validate_json_or_binary
     def decrypt():
         """Decrypt message using RSA in two modes: 'text' or 'packed'"""
         try:
-            data = request.get_json()
+            if request.mimetype == 'application/octet-stream':
+                # Raw binary wire format: key_id and mode travel in the query string
+                data = {
+                    'key_id': request.args.get('key_id'),
+                    'mode': request.args.get('mode', 'packed'),
+                    'ciphertext_bin': request.get_data()
+                }
+            else:
+                data = request.get_json()
             validate_decryption_request(data)
             
             key_id = data['key_id']
@@ -187,12 +458,34 @@ def register_routes(app):
             
             key = key_manager.get_key(key_id)
             
+            if 'ciphertext_bin' in data:
+                blob = data['ciphertext_bin']
+                try:
+                    if isinstance(blob, str):
+                        blob = base64.b64decode(blob, validate=True)
+                    blocks, sizes = unpack_binary(blob, key, packed=(mode == 'packed'))
+                except ValueError as e:
+                    raise ValidationError(f'Invalid binary ciphertext: {e}')
+                logger.info(f"Decryption request (binary, {mode}). Key ID: {key_id}, Blocks count: {len(blocks)}")
+                
+                start = time.perf_counter()
+                if mode == 'text':
+                    if len(blocks) > Config.MAX_BLOCKS_COUNT:
+                        raise ValidationError(f'Too many blocks (max {Config.MAX_BLOCKS_COUNT})')
+                    plaintext = run_cpu(rsa_decrypt_text, blocks, key)
+                else:
+                    plaintext = _decrypt_packed(blocks, sizes, key)
+                _observe_modexp('decrypt', 'text' if mode == 'text' else 'packed', key, len(blocks), start)
+                return jsonify({'success': True, 'mode': mode, 'plaintext': plaintext})
+            
             if mode == 'text':
                 blocks_b64 = data['ciphertext_blocks_b64']
                 logger.info(f"Decryption request (text). Key ID: {key_id}, Blocks count: {len(blocks_b64)}")
                 
                 ct_blocks = b64_to_int_list(blocks_b64)
-                plaintext = rsa_decrypt_text(ct_blocks, key)
+                start = time.perf_counter()
+                plaintext = run_cpu(rsa_decrypt_text, ct_blocks, key)
+                _observe_modexp('decrypt', 'text', key, len(ct_blocks), start)
                 return jsonify({'success': True, 'mode': 'text', 'plaintext': plaintext})
             
             elif mode == 'packed':
@@ -200,7 +493,9 @@ def register_routes(app):
                 logger.info(f"Decryption request (packed). Key ID: {key_id}")
                 
                 blocks, sizes = unpack_packed(ciphertext)
-                plaintext = rsa_decrypt_packed(blocks, sizes, key)
+                start = time.perf_counter()
+                plaintext = _decrypt_packed(blocks, sizes, key)
+                _observe_modexp('decrypt', 'packed', key, len(blocks), start)
                 return jsonify({'success': True, 'mode': 'packed', 'plaintext': plaintext})
             
         except ValidationError as e:
@@ -209,6 +504,320 @@ def register_routes(app):
             logger.error(f"Error decrypting: {str(e)}", exc_info=True)
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    @app.route('/api/encrypt/batch', methods=['POST'])
+    @validate_json_required
+    def encrypt_batch():
+        """Encrypt many messages in one request, with per-item results"""
+        try:
+            items = validate_batch_request(request.get_json())
+            logger.info(f"Batch encryption request. Items: {len(items)}")
+            
+            results = run_batch('encrypt', items, key_manager.get_key)
+            return jsonify({
+                'success': True,
+                'results': results,
+                'failed': sum(1 for r in results if not r['success'])
+            })
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error in batch encryption: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/decrypt/batch', methods=['POST'])
+    @validate_json_required
+    def decrypt_batch():
+        """Decrypt many ciphertexts in one request, with per-item results"""
+        try:
+            items = validate_batch_request(request.get_json())
+            logger.info(f"Batch decryption request. Items: {len(items)}")
+            
+            results = run_batch('decrypt', items, key_manager.get_key)
+            return jsonify({
+                'success': True,
+                'results': results,
+                'failed': sum(1 for r in results if not r['success'])
+            })
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error in batch decryption: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/sign', methods=['POST'])
+    @validate_json_required
+    def sign():
+        """Sign a message with the PSS-like scheme"""
+        try:
+            data = request.get_json()
+            validate_sign_request(data)
+            
+            key = key_manager.get_key(data['key_id'])
+            if key is None:
+                logger.error(f"Key not found: {data['key_id']}")
+                return jsonify({'success': False, 'error': 'Key not found'}), 404
+            
+            logger.info(f"Sign request. Key ID: {data['key_id']}, Message length: {len(data['message'])}")
+            start = time.perf_counter()
+            result = run_cpu(sign_item, key, data)
+            _observe_modexp('sign', 'pss', key, 1, start)
+            return jsonify(result)
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error signing: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/verify', methods=['POST'])
+    @validate_json_required
+    def verify():
+        """Verify a PSS-like signature"""
+        try:
+            data = request.get_json()
+            validate_verify_request(data)
+            
+            key = key_manager.get_key(data['key_id'])
+            if key is None:
+                logger.error(f"Key not found: {data['key_id']}")
+                return jsonify({'success': False, 'error': 'Key not found'}), 404
+            
+            logger.info(f"Verify request. Key ID: {data['key_id']}")
+            start = time.perf_counter()
+            result = verify_item(key, data)
+            _observe_modexp('verify', 'pss', key, 1, start)
+            return jsonify(result)
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error verifying: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/verify/batch', methods=['POST'])
+    @validate_json_required
+    def verify_batch():
+        """Verify many signatures in one request, with per-item results"""
+        try:
+            items = validate_batch_request(request.get_json(), Config.VERIFY_BATCH_MAX_ITEMS)
+            logger.info(f"Batch verify request. Items: {len(items)}")
+            
+            results = run_batch('verify', items, key_manager.get_key)
+            return jsonify({
+                'success': True,
+                'results': results,
+                'failed': sum(1 for r in results if not r['success']),
+                'valid': sum(1 for r in results if r.get('is_valid'))
+            })
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error in batch verify: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    def _stream_key():
+        """Resolve key_id from the query string for streaming endpoints"""
+        key_id = request.args.get('key_id', '')
+        if not validate_key_id_format(key_id):
+            raise ValidationError('Invalid key_id format')
+        key = key_manager.get_key(key_id)
+        if key is None:
+            logger.error(f"Key not found: {key_id}")
+        return key_id, key
+
+    @app.route('/api/encrypt/stream', methods=['POST'])
+    def encrypt_stream():
+        """Encrypt a raw request body in packed mode, streaming NDJSON blocks back"""
+        try:
+            key_id, key = _stream_key()
+            if key is None:
+                return jsonify({'success': False, 'error': 'Key not found'}), 404
+            
+            logger.info(f"Streaming encryption request. Key ID: {key_id}")
+            body = encrypt_ndjson(request.stream, key)
+            return Response(stream_with_context(body), mimetype='application/x-ndjson')
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error in streaming encryption: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/decrypt/stream', methods=['POST'])
+    def decrypt_stream():
+        """Decrypt NDJSON packed blocks from the request body, streaming raw plaintext back"""
+        try:
+            key_id, key = _stream_key()
+            if key is None:
+                return jsonify({'success': False, 'error': 'Key not found'}), 404
+            
+            logger.info(f"Streaming decryption request. Key ID: {key_id}")
+            body = decrypt_ndjson(request.stream, key)
+            try:
+                # decrypt the first chunk before answering, so a malformed body gets a 400, not a cut-off 200
+                first = next(body, b'')
+            except ValueError as e:
+                raise ValidationError(str(e))
+            return Response(stream_with_context(itertools.chain((first,), body)), mimetype='application/octet-stream')
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error in streaming decryption: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/keys/audit', methods=['GET'])
+    def audit_keys():
+        """Report stored keys whose moduli share a prime factor"""
+        try:
+            report = key_manager.audit_shared_primes()
+            return jsonify({'success': True, **report})
+            
+        except RuntimeError as e:
+            return jsonify({'success': False, 'error': str(e)}), 503
+        except Exception as e:
+            logger.error(f"Error auditing keys: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/factor', methods=['POST'])
+    @validate_json_required
+    def factor():
+        """Start a time-budgeted factorization of a demo-size modulus"""
+        try:
+            data = request.get_json()
+            validate_factor_request(data)
+            
+            if 'n' in data:
+                n = int(str(data['n']).strip())
+            else:
+                key = key_manager.get_key(data['key_id'])
+                if key is None:
+                    logger.error(f"Key not found: {data['key_id']}")
+                    return jsonify({'success': False, 'error': 'Key not found'}), 404
+                n = key.n
+            
+            if n.bit_length() > Config.FACTOR_MAX_BITS:
+                raise ValidationError(f'n too large (max {Config.FACTOR_MAX_BITS} bits)')
+            
+            budget_ms = int(data.get('budget_ms', Config.FACTOR_DEFAULT_BUDGET_MS))
+            wait_ms = min(int(data.get('wait_ms', Config.FACTOR_DEFAULT_WAIT_MS)), budget_ms)
+            try:
+                job = factor_engine.start(n, budget_ms, data.get('methods'))
+            except ValueError as e:
+                raise ValidationError(str(e))
+            except RuntimeError as e:
+                return jsonify({'success': False, 'error': str(e)}), 503
+            
+            # Short wait so small moduli answer in one round trip; otherwise poll the job
+            if wait_ms > 0:
+                factor_engine.wait(job, wait_ms / 1000)
+            job = factor_engine.get(job.job_id) or job
+            finished = job.status != 'running'
+            return jsonify({'success': True, **job.to_dict()}), 200 if finished else 202
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error factoring: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/factor/<job_id>', methods=['GET'])
+    def factor_status(job_id):
+        """Progress or result of a factorization job"""
+        job = factor_engine.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        return jsonify({'success': True, **job.to_dict()})
+
+    @app.route('/api/factor/<job_id>', methods=['DELETE'])
+    def factor_cancel(job_id):
+        """Cancel a running factorization job"""
+        job = factor_engine.cancel(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        return jsonify({'success': True, **job.to_dict()})
+
+    @app.route('/api/jobs/generate-key', methods=['POST'])
+    @validate_json_required
+    def start_key_job():
+        """Start a background key generation; poll /api/jobs/<id> or follow its /events stream"""
+        try:
+            bits, ttl = validate_key_generation_request(request.get_json() or {})
+            try:
+                job = job_manager.start_generate_key(bits, ttl)
+            except RuntimeError as e:
+                return jsonify({'success': False, 'error': str(e)}), 503
+            
+            status = 200 if job.status == 'done' else 202
+            return jsonify({'success': True, **job.to_dict()}), status, {'Location': f'/api/jobs/{job.job_id}'}
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error starting key generation job: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/jobs/<job_id>', methods=['GET'])
+    def job_status(job_id):
+        """Progress or result of a background job"""
+        job = job_manager.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        return jsonify({'success': True, **job.to_dict()})
+
+    @app.route('/api/jobs/<job_id>/events', methods=['GET'])
+    def job_events(job_id):
+        """Server-Sent Events: 'progress' while the job runs, then one 'done' event with the final state"""
+        job = job_manager.get(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        
+        dumps = current_app.json.dumps
+        
+        def events():
+            last = None
+            while True:
+                finished = job_manager.wait(job, Config.JOB_SSE_INTERVAL)
+                state = job_manager.get(job_id) or job
+                if finished:
+                    yield f"event: done\ndata: {dumps(state.to_dict())}\n\n"
+                    return
+                if state.progress != last:
+                    last = dict(state.progress)
+                    yield f"event: progress\ndata: {dumps(state.to_dict())}\n\n"
+                else:
+                    # keeps proxies from closing an idle connection
+                    yield ": keep-alive\n\n"
+        
+        return Response(stream_with_context(events()), mimetype='text/event-stream',
+                        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+    @app.route('/api/jobs/<job_id>', methods=['DELETE'])
+    def job_cancel(job_id):
+        """Cancel a queued or running job"""
+        job = job_manager.cancel(job_id)
+        if job is None:
+            return jsonify({'success': False, 'error': 'Job not found'}), 404
+        return jsonify({'success': True, **job.to_dict()})
+
+    def _log_entry(data: dict) -> dict:
+        """Build the stored log document from a client log payload"""
+        return {
+            'type': data.get('type', 'info'),
+            'message': data.get('message', ''),
+            'timestamp': datetime.now(timezone.utc),
+            'operation': data.get('operation', ''),
+            'keyId': data.get('keyId'),
+            'duration': data.get('duration'),
+            'blockCount': data.get('blockCount'),
+            'isValid': data.get('isValid'),
+            'bitLength': data.get('bitLength'),
+            'signatureLength': data.get('signatureLength')
+        }
+
     @app.route('/api/logs', methods=['POST'])
     def save_log():
         """Save operation log to MongoDB"""
@@ -217,48 +826,137 @@ def register_routes(app):
             if not data:
                 return jsonify({'success': False, 'error': 'No data provided'}), 400
             
-            log_entry = {
-                'type': data.get('type', 'info'),
-                'message': data.get('message', ''),
-                'timestamp': datetime.now().isoformat(),
-                'operation': data.get('operation', ''),
-                'keyId': data.get('keyId'),
-                'duration': data.get('duration'),
-                'blockCount': data.get('blockCount'),
-                'isValid': data.get('isValid'),
-                'bitLength': data.get('bitLength'),
-                'signatureLength': data.get('signatureLength')
-            }
-            
-            success = db_manager.save_log(log_entry)
+            success = db_manager.save_log(_log_entry(data))
             return jsonify({'success': success})
             
         except Exception as e:
             logger.error(f"Error saving log: {str(e)}")
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    @app.route('/api/logs/batch', methods=['POST'])
+    @validate_json_required
+    def save_logs_batch():
+        """Save many operation logs in one request"""
+        try:
+            items = validate_batch_request(request.get_json(), Config.LOG_BATCH_MAX_ITEMS)
+            entries = [_log_entry(item) for item in items if isinstance(item, dict)]
+            accepted = db_manager.save_logs(entries)
+            return jsonify({
+                'success': accepted > 0,
+                'accepted': accepted,
+                'rejected': len(items) - accepted
+            })
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error saving log batch: {str(e)}")
+            return jsonify({'success': False, 'error': str(e)}), 500
+
     @app.route('/api/logs', methods=['GET'])
     def get_logs():
-        """Get logs from MongoDB"""
+        """Get logs from MongoDB, newest first, with filters and cursor pagination"""
         try:
             limit = request.args.get('limit', 50, type=int)
-            logs = db_manager.get_logs(limit)
+            if not validate_number_range(limit, 1, Config.LOG_PAGE_MAX):
+                raise ValidationError(f'limit must be between 1 and {Config.LOG_PAGE_MAX}')
+            filters = validate_log_query(request.args)
+            try:
+                page = db_manager.get_logs(limit, request.args.get('cursor'), filters)
+            except ValueError as e:
+                raise ValidationError(str(e))
             
-            if logs is None:
+            if page is None:
                 return jsonify({'success': False, 'error': 'MongoDB not connected'}), 503
             
-            return jsonify({'success': True, 'logs': logs})
+            logs, next_cursor = page
+            return jsonify({'success': True, 'logs': logs, 'next_cursor': next_cursor})
             
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         except Exception as e:
             logger.error(f"Error getting logs: {str(e)}", exc_info=True)
             return jsonify({'success': False, 'error': str(e)}), 500
 
+    @app.route('/api/logs/export', methods=['GET'])
+    def export_logs():
+        """Stream every matching log as NDJSON (same filters as GET /api/logs)"""
+        try:
+            filters = validate_log_query(request.args)
+            if not db_manager.is_connected():
+                return jsonify({'success': False, 'error': 'MongoDB not connected'}), 503
+            
+            logs = db_manager.iter_logs(filters, Config.LOG_EXPORT_BATCH_SIZE)
+            dumps = current_app.json.dumps
+            body = (dumps(log) + '\n' for log in logs)
+            return Response(stream_with_context(body), mimetype='application/x-ndjson')
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error exporting logs: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/stats', methods=['GET'])
+    def get_stats():
+        """Timing stats (count, mean, p50/p95/p99) per operation and key size, in time buckets"""
+        try:
+            since, until, step, filters = validate_stats_query(request.args)
+            series = db_manager.get_stats(since, until, step, filters)
+            if series is None:
+                return jsonify({'success': False, 'error': 'MongoDB not connected'}), 503
+            
+            return jsonify({
+                'success': True,
+                'since': datetime.fromtimestamp(since, timezone.utc).isoformat(),
+                'until': datetime.fromtimestamp(until, timezone.utc).isoformat(),
+                'bucket_seconds': step,
+                'series': series
+            })
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error getting stats: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
+    @app.route('/api/logs/prune', methods=['DELETE'])
+    def prune_logs():
+        """Delete logs older than older_than_days, in bounded batches"""
+        try:
+            days = request.args.get('older_than_days', type=float)
+            if days is None or not 1 <= days <= Config.LOG_PRUNE_MAX_DAYS:
+                raise ValidationError(f'older_than_days must be between 1 and {Config.LOG_PRUNE_MAX_DAYS}')
+            max_batches = request.args.get('max_batches', Config.LOG_PRUNE_MAX_BATCHES, type=int)
+            if not validate_number_range(max_batches, 1, Config.LOG_PRUNE_MAX_BATCHES):
+                raise ValidationError(f'max_batches must be between 1 and {Config.LOG_PRUNE_MAX_BATCHES}')
+            
+            cutoff = datetime.now(timezone.utc) - timedelta(days=days)
+            deleted_count = db_manager.prune_logs(cutoff, max_batches=max_batches)
+            return jsonify({
+                'success': True,
+                'deleted': deleted_count,
+                'cutoff': cutoff.isoformat(),
+                'more': deleted_count >= max_batches * Config.LOG_PRUNE_BATCH_SIZE
+            })
+            
+        except ValidationError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
+        except Exception as e:
+            logger.error(f"Error pruning logs: {str(e)}", exc_info=True)
+            return jsonify({'success': False, 'error': str(e)}), 500
+
     @app.route('/api/logs/clear', methods=['DELETE'])
     def clear_logs():
         """Clear all logs from MongoDB"""
         try:
-            deleted_count = db_manager.clear_logs()
-            return jsonify({'success': True, 'deleted': deleted_count})
+            # bounded per request like prune; repeat while 'more' is true
+            deleted_count = db_manager.clear_logs(max_batches=Config.LOG_PRUNE_MAX_BATCHES)
+            return jsonify({
+                'success': True,
+                'deleted': deleted_count,
+                'more': deleted_count >= Config.LOG_PRUNE_MAX_BATCHES * Config.LOG_PRUNE_BATCH_SIZE
+            })
             
         except Exception as e:
             logger.error(f"Error clearing logs: {str(e)}", exc_info=True)
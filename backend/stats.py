@@ -0,0 +1,147 @@
+# stats.py - Incremental per-operation timing rollups and percentile summaries
+import math
+import time
+from datetime import datetime, timezone
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from pymongo import UpdateOne
+
+# Durations (seconds) are counted in log-scale bins: BINS_PER_OCTAVE bins per doubling from
+# HIST_MIN up, so a percentile read from the histogram is within ~4.5% of the true value.
+HIST_MIN = 1e-6
+BINS_PER_OCTAVE = 8
+PERCENTILES = (50, 95, 99)
+
+def duration_bin(duration: float) -> int:
+    """Histogram bin for a duration in seconds"""
+    if duration <= HIST_MIN:
+        return 0
+    return int(math.log2(duration / HIST_MIN) * BINS_PER_OCTAVE)
+
+def bin_value(index: int) -> float:
+    """Representative duration of a bin (its geometric midpoint)"""
+    return HIST_MIN * 2 ** ((index + 0.5) / BINS_PER_OCTAVE)
+
+def _epoch(timestamp: Any) -> float:
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return timestamp.timestamp()
+    return time.time()
+
+def rollup_updates(entries: Iterable[Dict[str, Any]], bucket_seconds: int) -> List[UpdateOne]:
+    """Fold log entries into one upsert per (operation, bitLength, bucket) rollup document"""
+    groups: Dict[Tuple[str, Optional[int], int], Dict[str, Any]] = {}
+    for entry in entries:
+        try:
+            duration = float(entry.get('duration'))
+        except (TypeError, ValueError):
+            continue
+        if not math.isfinite(duration) or duration < 0 or not entry.get('operation'):
+            continue
+        bits = entry.get('bitLength')
+        bits = int(bits) if isinstance(bits, (int, float)) and not isinstance(bits, bool) else None
+        bucket = int(_epoch(entry.get('timestamp')) // bucket_seconds * bucket_seconds)
+        key = (str(entry['operation']), bits, bucket)
+
+        g = groups.get(key)
+        if g is None:
+            g = groups[key] = {'count': 0, 'sum': 0.0, 'min': duration, 'max': duration, 'blocks': 0, 'hist': {}}
+        g['count'] += 1
+        g['sum'] += duration
+        g['min'] = min(g['min'], duration)
+        g['max'] = max(g['max'], duration)
+        blocks = entry.get('blockCount')
+        if isinstance(blocks, int) and not isinstance(blocks, bool):
+            g['blocks'] += blocks
+        b = str(duration_bin(duration))
+        g['hist'][b] = g['hist'].get(b, 0) + 1
+
+    updates = []
+    for (operation, bits, bucket), g in groups.items():
+        inc = {'count': g['count'], 'sum': g['sum'], 'blockCount': g['blocks']}
+        inc.update({f'hist.{b}': n for b, n in g['hist'].items()})
+        updates.append(UpdateOne(
+            {'operation': operation, 'bitLength': bits, 'bucket': bucket},
+            {
+                '$inc': inc,
+                '$min': {'min': g['min']},
+                '$max': {'max': g['max']},
+                '$setOnInsert': {'start': datetime.fromtimestamp(bucket, timezone.utc)}
+            },
+            upsert=True
+        ))
+    return updates
+
+def stats_pipeline(since: float, until: float, step: int, filters: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Aggregation over rollup documents, regrouped into buckets of `step` seconds"""
+    match: Dict[str, Any] = {'bucket': {'$gte': int(since), '$lt': int(until)}}
+    match.update(filters)
+    return [
+        {'$match': match},
+        {'$group': {
+            '_id': {
+                'operation': '$operation',
+                'bitLength': '$bitLength',
+                'bucket': {'$subtract': ['$bucket', {'$mod': ['$bucket', step]}]}
+            },
+            'count': {'$sum': '$count'},
+            'sum': {'$sum': '$sum'},
+            'min': {'$min': '$min'},
+            'max': {'$max': '$max'},
+            'blockCount': {'$sum': '$blockCount'},
+            'hists': {'$push': '$hist'}
+        }},
+        {'$sort': {'_id.operation': 1, '_id.bitLength': 1, '_id.bucket': 1}}
+    ]
+
+def percentiles(hist: Dict[int, int], count: int) -> Dict[str, Optional[float]]:
+    """Approximate percentiles from a merged histogram"""
+    result: Dict[str, Optional[float]] = {f'p{p}': None for p in PERCENTILES}
+    if not count:
+        return result
+    running = 0
+    targets = [(p, math.ceil(count * p / 100)) for p in PERCENTILES]
+    for index in sorted(hist):
+        running += hist[index]
+        while targets and running >= targets[0][1]:
+            result[f'p{targets.pop(0)[0]}'] = bin_value(index)
+        if not targets:
+            break
+    return result
+
+def _summary(count: int, total: float, lo: float, hi: float, blocks: int, hist: Dict[int, int]) -> Dict[str, Any]:
+    # min/max are exact; keep histogram estimates inside them
+    pct = {k: min(max(v, lo), hi) if v is not None else None for k, v in percentiles(hist, count).items()}
+    return {'count': count, 'mean': total / count if count else None, 'min': lo, 'max': hi,
+            'blockCount': blocks, **pct}
+
+def summarize(groups: Iterable[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Turn aggregation output into one series per (operation, bitLength) with per-bucket and overall figures"""
+    series: Dict[Tuple[str, Optional[int]], Dict[str, Any]] = {}
+    totals: Dict[Tuple[str, Optional[int]], Dict[str, Any]] = {}
+    for g in groups:
+        key = (g['_id']['operation'], g['_id']['bitLength'])
+        hist: Dict[int, int] = {}
+        for h in g['hists']:
+            for b, n in (h or {}).items():
+                hist[int(b)] = hist.get(int(b), 0) + n
+        s = series.setdefault(key, {'operation': key[0], 'bitLength': key[1], 'buckets': []})
+        s['buckets'].append({
+            'start': datetime.fromtimestamp(int(g['_id']['bucket']), timezone.utc).isoformat(),
+            **_summary(g['count'], g['sum'], g['min'], g['max'], g['blockCount'], hist)
+        })
+
+        t = totals.setdefault(key, {'count': 0, 'sum': 0.0, 'min': g['min'], 'max': g['max'], 'blocks': 0, 'hist': {}})
+        t['count'] += g['count']
+        t['sum'] += g['sum']
+        t['min'] = min(t['min'], g['min'])
+        t['max'] = max(t['max'], g['max'])
+        t['blocks'] += g['blockCount']
+        for b, n in hist.items():
+            t['hist'][b] = t['hist'].get(b, 0) + n
+
+    for key, s in series.items():
+        t = totals[key]
+        s['total'] = _summary(t['count'], t['sum'], t['min'], t['max'], t['blocks'], t['hist'])
+    return list(series.values())
@@ -0,0 +1,114 @@
+# streaming.py - Chunked packed-mode encryption/decryption for large payloads
+import json
+import os
+import sys
+import time
+from typing import IO, Iterator, List, Tuple
+
+# Import RSA core from demo folder
+project_root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+demo_dir = os.path.join(project_root, 'demo')
+sys.path.insert(0, demo_dir)
+
+from rsa_core import (
+    RSAKey, rsa_encrypt_stream, rsa_decrypt_stream, max_bytes_per_block,
+    int_list_to_b64, b64_to_int_list
+)
+from config import Config
+from metrics import observe_modexp
+from offload import run_cpu
+
+def read_chunks(stream: IO[bytes], size: int = Config.STREAM_CHUNK_SIZE) -> Iterator[bytes]:
+    """Read a request body incrementally"""
+    while True:
+        chunk = stream.read(size)
+        if not chunk:
+            return
+        yield chunk
+
+def read_lines(stream: IO[bytes], max_line: int = Config.STREAM_MAX_LINE) -> Iterator[bytes]:
+    """Split a request body into non-empty lines without buffering the whole body"""
+    buf = b''
+    for chunk in read_chunks(stream):
+        buf += chunk
+        lines = buf.split(b'\n')
+        buf = lines.pop()
+        if len(buf) > max_line:
+            raise ValueError(f'Stream line too long (max {max_line} bytes)')
+        for line in lines:
+            if line.strip():
+                yield line
+    if buf.strip():
+        yield buf
+
+def _encrypt_lines(data: bytes, key: RSAKey) -> str:
+    """JSON lines for data cut into blocks (only the last may be short)"""
+    return ''.join(json.dumps({'c': int_list_to_b64([block])[0], 'size': size}) + '\n'
+                   for block, size in rsa_encrypt_stream((data,), key))
+
+def _encrypt_chunk(data: bytes, key: RSAKey, k: int) -> str:
+    start = time.perf_counter()
+    lines = run_cpu(_encrypt_lines, data, key)
+    observe_modexp('encrypt', 'stream', key.n.bit_length(), -(-len(data) // k), time.perf_counter() - start)
+    return lines
+
+def encrypt_ndjson(stream: IO[bytes], key: RSAKey) -> Iterator[str]:
+    """Encrypt a raw byte stream, emitting one {"c", "size"} JSON line per block.
+
+    The full blocks of each read chunk go through run_cpu in one call; the remainder waits for the next chunk.
+    """
+    k = max_bytes_per_block(key)
+    buf = bytearray()
+    for chunk in read_chunks(stream):
+        buf.extend(chunk)
+        full = len(buf) - len(buf) % k
+        if full:
+            yield _encrypt_chunk(bytes(buf[:full]), key, k)
+            del buf[:full]
+    if buf:
+        yield _encrypt_chunk(bytes(buf), key, k)
+
+def _parse_blocks(lines: Iterator[bytes], key: RSAKey) -> Iterator[Tuple[int, int]]:
+    """(block, size) per line; size is bounded like unpack_binary's, so a line cannot ask for a huge output"""
+    max_size = max_bytes_per_block(key)
+    for number, line in enumerate(lines, 1):
+        try:
+            entry = json.loads(line)
+            block = b64_to_int_list([entry['c']])[0]
+            size = entry['size']
+        except (ValueError, KeyError, TypeError):
+            raise ValueError(f'Line {number}: expected {{"c": <base64>, "size": <int>}}')
+        if not isinstance(size, int) or isinstance(size, bool) or not 1 <= size <= max_size:
+            raise ValueError(f'Line {number}: size must be between 1 and {max_size}')
+        if block >= key.n:
+            raise ValueError(f'Line {number}: block out of range for this key')
+        yield block, size
+
+def _decrypt_blocks(blocks: List[Tuple[int, int]], key: RSAKey) -> bytes:
+    return b''.join(rsa_decrypt_stream(blocks, key))
+
+def _decrypt_batch(batch: List[Tuple[int, int]], key: RSAKey) -> bytes:
+    start = time.perf_counter()
+    try:
+        plaintext = run_cpu(_decrypt_blocks, batch, key)
+    except OverflowError:
+        raise ValueError('A block does not decrypt to its declared size (wrong key or tampered data)')
+    observe_modexp('decrypt', 'stream', key.n.bit_length(), len(batch), time.perf_counter() - start)
+    return plaintext
+
+def decrypt_ndjson(stream: IO[bytes], key: RSAKey) -> Iterator[bytes]:
+    """Decrypt a stream of {"c", "size"} JSON lines back to raw plaintext bytes.
+
+    Blocks are decrypted through run_cpu about STREAM_CHUNK_SIZE plaintext bytes at a time.
+    Raises ValueError on a malformed line or a block that does not decrypt to its declared size.
+    """
+    batch: List[Tuple[int, int]] = []
+    pending = 0
+    for block in _parse_blocks(read_lines(stream), key):
+        batch.append(block)
+        pending += block[1]
+        if pending >= Config.STREAM_CHUNK_SIZE:
+            yield _decrypt_batch(batch, key)
+            batch, pending = [], 0
+    if batch:
+        yield _decrypt_batch(batch, key)
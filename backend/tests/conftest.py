@@ -0,0 +1,15 @@
+# conftest.py - Make the backend modules (and rsa_core from demo/) importable the way app.py sees them
+import os
+import sys
+
+import pytest
+
+backend_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, backend_dir)
+sys.path.insert(0, os.path.join(os.path.dirname(backend_dir), 'demo'))
+
+@pytest.fixture(scope='session')
+def key():
+    """A small key shared by the crypto tests (512 bits keeps generation fast)"""
+    from rsa_core import generate_rsa
+    return generate_rsa(512)
@@ -0,0 +1,30 @@
+# test_batch.py - Batch operations: per-item results and modexp metrics recorded in this process
+from metrics import MODEXP_BLOCKS, bits_label
+from batch import run_batch
+
+KEY_ID = '20240101_000000'
+
+def test_batch_round_trip_records_blocks(key):
+    label = bits_label(key.n.bit_length())
+    encrypted = MODEXP_BLOCKS.labels('encrypt', 'packed', label)
+    decrypted = MODEXP_BLOCKS.labels('decrypt', 'packed', label)
+    before = encrypted._total()[0], decrypted._total()[0]
+
+    messages = ['hello', 'x' * 500, 'é' * 40]
+    items = [{'key_id': KEY_ID, 'mode': 'packed', 'message': m} for m in messages]
+    results = run_batch('encrypt', items, lambda key_id: key)
+    assert all(r['success'] for r in results)
+    blocks = sum(r['block_count'] for r in results)
+    assert encrypted._total()[0] - before[0] == blocks
+
+    items = [{'key_id': KEY_ID, 'mode': 'packed', 'ciphertext': r['ciphertext']} for r in results]
+    results = run_batch('decrypt', items, lambda key_id: key)
+    assert [r['plaintext'] for r in results] == messages
+    assert decrypted._total()[0] - before[1] == blocks
+
+def test_batch_item_errors(key):
+    items = [{'key_id': KEY_ID, 'mode': 'packed', 'message': 'ok'}, 'nope', {'key_id': '20240101_000001', 'message': 'x'}]
+    results = run_batch('encrypt', items, lambda key_id: key if key_id == KEY_ID else None)
+    assert results[0]['success']
+    assert results[1] == {'success': False, 'error': 'Item must be an object'}
+    assert results[2] == {'success': False, 'error': 'Key not found'}
@@ -0,0 +1,45 @@
+# test_batch_gcd.py - Batch GCD and the shared-prime key audit
+import pytest
+
+from rsa_core import RSAKey, batch_gcd, gen_prime, modinv
+from key_manager import KeyManager
+from key_store import MemoryKeyStore
+
+@pytest.fixture(scope='module')
+def primes():
+    return [gen_prime(128) for _ in range(5)]
+
+def make_key(p: int, q: int) -> RSAKey:
+    e = 65537
+    return RSAKey(p * q, e, modinv(e, (p - 1) * (q - 1)), p, q)
+
+def test_distinct_moduli(primes):
+    p = primes
+    assert batch_gcd([p[0] * p[1], p[2] * p[3]]) == [1, 1]
+
+def test_shared_prime_found(primes):
+    p = primes
+    moduli = [p[0] * p[1], p[2] * p[3], p[0] * p[4]]
+    assert batch_gcd(moduli) == [p[0], 1, p[0]]
+
+def test_duplicate_modulus_is_fully_factored(primes):
+    n = primes[0] * primes[1]
+    assert batch_gcd([n, n, primes[2] * primes[3]]) == [n, n, 1]
+
+def test_fewer_than_two_moduli():
+    assert batch_gcd([]) == []
+    assert batch_gcd([15]) == [1]
+
+def test_audit_reports_affected_keys_without_touching_the_cache(primes):
+    p = primes
+    manager = KeyManager()
+    manager.keys_storage = store = MemoryKeyStore()
+    store['a'] = make_key(p[0], p[1])
+    store['b'] = make_key(p[2], p[3])
+    store['c'] = make_key(p[0], p[4])
+    order = list(store)
+
+    report = manager.audit_shared_primes()
+    assert report['key_count'] == 3
+    assert {item['key_id']: item['shares_with'] for item in report['affected']} == {'a': ['c'], 'c': ['a']}
+    assert store.stats()['hits'] == 0 and list(store) == order
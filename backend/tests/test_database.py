@@ -0,0 +1,95 @@
+# test_database.py - DatabaseManager against mongomock: log writer path, keyset pagination, pruning
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+mongomock = pytest.importorskip('mongomock')
+
+from database import DatabaseManager
+
+BASE = datetime(2024, 1, 1)
+
+@pytest.fixture
+def db():
+    manager = DatabaseManager(mongomock.MongoClient())
+    yield manager
+    manager.close()
+
+def insert_logs(db, count, operations=('encrypt', 'decrypt')):
+    """count logs one second apart; every third one shares its timestamp with the previous log"""
+    docs = []
+    for i in range(count):
+        seconds = i - (1 if i % 3 == 2 else 0)
+        docs.append({'type': 'info', 'message': f'log {i}', 'operation': operations[i % len(operations)],
+                     'timestamp': BASE + timedelta(seconds=seconds)})
+    db.logs_collection.insert_many(docs)
+
+def all_pages(db, limit, filters=None):
+    pages = []
+    cursor = None
+    while True:
+        logs, cursor = db.get_logs(limit=limit, cursor=cursor, filters=filters)
+        pages.append(logs)
+        if cursor is None:
+            return pages
+
+def test_pages_cover_every_log_newest_first(db):
+    insert_logs(db, 25)
+    pages = all_pages(db, limit=10)
+    assert [len(page) for page in pages] == [10, 10, 5]
+    logs = [log for page in pages for log in page]
+    assert len({log['_id'] for log in logs}) == 25
+    keys = [(log['timestamp'], log['_id']) for log in logs]
+    assert keys == sorted(keys, reverse=True)
+
+def test_exact_page_boundary_has_no_empty_last_page(db):
+    insert_logs(db, 20)
+    assert [len(page) for page in all_pages(db, limit=10)] == [10, 10]
+
+def test_cursor_keeps_filters(db):
+    insert_logs(db, 20)
+    logs = [log for page in all_pages(db, limit=3, filters={'operation': 'decrypt'}) for log in page]
+    assert len(logs) == 10
+    assert {log['operation'] for log in logs} == {'decrypt'}
+
+def test_timestamps_are_returned_as_utc_iso(db):
+    insert_logs(db, 1)
+    logs, _ = db.get_logs(limit=1)
+    assert datetime.fromisoformat(logs[0]['timestamp']).tzinfo == timezone.utc
+
+def test_unavailable_database_returns_none(db):
+    db.logs_collection = None
+    assert db.get_logs(limit=10) is None
+
+def test_invalid_cursor(db):
+    with pytest.raises(ValueError):
+        db.get_logs(limit=10, cursor='not-a-cursor')
+
+def test_save_log_goes_through_the_writer(db):
+    assert db.writer is not None
+    for i in range(3):
+        assert db.save_log({'type': 'info', 'message': f'log {i}', 'operation': 'encrypt',
+                            'timestamp': BASE + timedelta(seconds=i)})
+    assert db.writer.flush(timeout=5)
+    assert db.logs_collection.count_documents({}) == 3
+    assert db.writer_stats()['written'] == 3
+
+def test_close_flushes_queued_logs(db):
+    db.save_logs([{'type': 'info', 'message': 'queued', 'operation': 'encrypt', 'timestamp': BASE} for _ in range(4)])
+    logs = db.logs_collection
+    db.close()
+    assert logs.count_documents({}) == 4
+
+def test_prune_deletes_oldest_first(db):
+    insert_logs(db, 10)
+    assert db.prune_logs(batch_size=3, max_batches=1) == 3
+    oldest = db.logs_collection.find_one(sort=[('timestamp', 1)])
+    assert oldest['timestamp'] == BASE + timedelta(seconds=3)
+
+def test_prune_older_than(db):
+    insert_logs(db, 10)
+    cutoff = (BASE + timedelta(seconds=5)).replace(tzinfo=timezone.utc)
+    deleted = db.prune_logs(cutoff)
+    assert deleted == 6
+    assert db.logs_collection.count_documents({}) == 4
+    assert db.logs_collection.count_documents({'timestamp': {'$lt': BASE + timedelta(seconds=5)}}) == 0
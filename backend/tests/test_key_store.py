@@ -0,0 +1,140 @@
+# test_key_store.py - SQLite and in-memory key stores: round trips, TTLs, limits and side-effect-free reads
+import sqlite3
+import time
+
+import pytest
+
+from rsa_core import RSAKey, key_size_bytes, rsa_decrypt_text, rsa_encrypt_text
+from key_store import MemoryKeyStore, SQLiteKeyStore
+
+@pytest.fixture
+def sqlite_path(tmp_path):
+    return str(tmp_path / 'keys.sqlite3')
+
+def test_sqlite_round_trip(sqlite_path, key):
+    store = SQLiteKeyStore(sqlite_path)
+    store['a'] = key
+    fresh = SQLiteKeyStore(sqlite_path)
+    loaded = fresh['a']
+    assert (loaded.n, loaded.e, loaded.d, loaded.p, loaded.q) == (key.n, key.e, key.d, key.p, key.q)
+    assert (loaded.dP, loaded.dQ, loaded.qInv) == (key.dP, key.dQ, key.qInv)
+    assert 'a' in fresh and list(fresh) == ['a'] and len(fresh) == 1
+    with pytest.raises(KeyError):
+        fresh['missing']
+
+def test_sqlite_insert_new_does_not_overwrite(sqlite_path, key):
+    store = SQLiteKeyStore(sqlite_path)
+    assert store.insert_new('a', key)
+    assert not SQLiteKeyStore(sqlite_path).insert_new('a', key)
+
+def test_sqlite_ttl_expires_everywhere(sqlite_path, key):
+    store = SQLiteKeyStore(sqlite_path, sweep_interval=3600)
+    store['kept'] = key
+    assert store.insert_new('short', key, ttl=0.05)
+    assert store['short'].n == key.n
+    time.sleep(0.1)
+    assert 'short' not in store
+    with pytest.raises(KeyError):
+        store['short']
+    assert store.peek('short') is None
+    assert list(store) == ['kept'] and len(store) == 1
+    assert [key_id for key_id, _ in store.moduli()] == ['kept']
+    # an expired key gives its ID back
+    assert store.insert_new('short', key)
+    store.insert_new('gone', key, ttl=0.01)
+    time.sleep(0.05)
+    assert store.sweep() == 1
+
+def test_sqlite_deletes_invalidate_other_caches(sqlite_path, key):
+    first, second = SQLiteKeyStore(sqlite_path), SQLiteKeyStore(sqlite_path)
+    first['a'] = key
+    assert second['a'].n == key.n
+    del first['a']
+    with pytest.raises(KeyError):
+        second['a']
+    with pytest.raises(KeyError):
+        del first['a']
+
+def test_sqlite_cache_is_bounded(sqlite_path, key):
+    store = SQLiteKeyStore(sqlite_path, max_entries=2)
+    for i in range(5):
+        store.insert_new(f'k{i}', key)
+    for i in range(5):
+        store[f'k{i}']
+    stats = store.stats()
+    assert stats['entries'] == 5 and stats['cached'] == 2
+
+def test_sqlite_peek_and_moduli_leave_counters_alone(sqlite_path, key):
+    store = SQLiteKeyStore(sqlite_path)
+    store.insert_new('a', key)
+    before = store.stats()
+    assert store.peek('a').n == key.n
+    assert store.peek('missing') is None
+    assert store.moduli() == [('a', key.n)]
+    after = store.stats()
+    assert (after['hits'], after['misses']) == (before['hits'], before['misses'])
+
+def test_sqlite_adds_expires_column_to_old_databases(sqlite_path, key):
+    conn = sqlite3.connect(sqlite_path)
+    conn.execute('CREATE TABLE rsa_keys (key_id TEXT PRIMARY KEY, n TEXT NOT NULL, e TEXT NOT NULL, d TEXT NOT NULL, '
+                 'p TEXT NOT NULL, q TEXT NOT NULL, created REAL NOT NULL)')
+    conn.commit()
+    conn.close()
+    store = SQLiteKeyStore(sqlite_path)
+    assert store.insert_new('a', key, ttl=60)
+    assert store['a'].n == key.n
+
+def test_memory_lru_eviction_by_count(key):
+    store = MemoryKeyStore(max_entries=2)
+    store['a'] = key
+    store['b'] = key
+    store['a']
+    store['c'] = key
+    assert list(store) == ['a', 'c']
+    assert store.stats()['evictions'] == 1
+
+def test_memory_byte_budget_includes_lookup_tables(key):
+    key = RSAKey(key.n, key.e, key.d, key.p, key.q)  # no tables or exports built yet
+    store = MemoryKeyStore()
+    store['a'] = key
+    before = store.stats()['bytes_used']
+    rsa_decrypt_text(rsa_encrypt_text('hi', store['a']), store['a'])
+    store['a']
+    assert store.stats()['bytes_used'] > before
+    assert store.stats()['bytes_used'] == key_size_bytes(key)
+
+def test_memory_rejects_keys_larger_than_the_budget(key):
+    store = MemoryKeyStore(max_bytes=key_size_bytes(key) - 1)
+    with pytest.raises(ValueError):
+        store.insert_new('a', key)
+    assert len(store) == 0 and store.stats()['evictions'] == 0
+
+def test_memory_ttl_hides_expired_keys_everywhere(key):
+    store = MemoryKeyStore(sweep_interval=3600)
+    store['kept'] = key
+    store.insert_new('short', key, ttl=0.05)
+    assert len(store) == 2
+    time.sleep(0.1)
+    assert 'short' not in store and store.peek('short') is None
+    assert list(store) == ['kept'] and len(store) == 1
+    assert [key_id for key_id, _ in store.moduli()] == ['kept']
+    assert store.insert_new('short', key)
+    with pytest.raises(KeyError):
+        store['missing']
+
+def test_memory_sweep_removes_expired(key):
+    store = MemoryKeyStore(sweep_interval=3600)
+    store.insert_new('a', key, ttl=0.01)
+    time.sleep(0.05)
+    assert store.sweep() == 1
+    assert store.stats()['entries'] == 0 and store.stats()['bytes_used'] == 0
+
+def test_memory_peek_leaves_lru_and_counters_alone(key):
+    store = MemoryKeyStore(max_entries=2)
+    store['a'] = key
+    store['b'] = key
+    assert store.peek('a') is key
+    store['c'] = key
+    # 'a' was not touched by peek, so it is the one evicted
+    assert list(store) == ['b', 'c']
+    assert store.stats()['hits'] == 0
@@ -0,0 +1,114 @@
+# test_log_writer.py - LogWriter batching, overflow policies and shutdown
+import threading
+import time
+
+import pytest
+
+from log_writer import LogWriter
+
+class Recorder:
+    """insert_many stand-in that keeps every batch; can be held to keep the writer busy"""
+
+    def __init__(self, fail: bool = False):
+        self.batches = []
+        self.fail = fail
+        self.entered = threading.Event()
+        self.release = threading.Event()
+        self.release.set()
+
+    def __call__(self, batch):
+        self.entered.set()
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError('write failed')
+        self.batches.append([entry['i'] for entry in batch])
+
+    @property
+    def written(self):
+        return [i for batch in self.batches for i in batch]
+
+def hold_writer(writer: LogWriter, recorder: Recorder):
+    """Submit entry 0 and wait until the writer thread is stuck writing it"""
+    recorder.release.clear()
+    writer.submit({'i': 0})
+    assert recorder.entered.wait(5)
+
+def test_flush_writes_everything_in_batches():
+    recorder = Recorder()
+    writer = LogWriter(recorder, batch_size=3, flush_interval=0.05)
+    assert writer.submit_many([{'i': i} for i in range(7)]) == 7
+    assert writer.flush(timeout=5)
+    assert recorder.written == list(range(7))
+    assert all(len(batch) <= 3 for batch in recorder.batches)
+    stats = writer.stats()
+    assert stats['written'] == 7 and stats['batches'] == len(recorder.batches)
+    writer.stop()
+
+def test_partial_batch_flushed_after_interval():
+    recorder = Recorder()
+    writer = LogWriter(recorder, batch_size=100, flush_interval=0.05)
+    writer.submit({'i': 1})
+    start = time.monotonic()
+    assert writer.flush(timeout=5)
+    assert time.monotonic() - start < 2
+    assert recorder.batches == [[1]]
+    writer.stop()
+
+def test_drop_new_rejects_entries_when_full():
+    recorder = Recorder()
+    writer = LogWriter(recorder, max_queue=2, batch_size=1, flush_interval=0.01, overflow='drop_new')
+    hold_writer(writer, recorder)
+    assert writer.submit({'i': 1})
+    assert writer.submit({'i': 2})
+    assert not writer.submit({'i': 3})
+    recorder.release.set()
+    assert writer.flush(timeout=5)
+    assert recorder.written == [0, 1, 2]
+    assert writer.stats()['dropped'] == 1
+    writer.stop()
+
+def test_drop_oldest_keeps_newest_entries():
+    recorder = Recorder()
+    writer = LogWriter(recorder, max_queue=2, batch_size=1, flush_interval=0.01, overflow='drop_oldest')
+    hold_writer(writer, recorder)
+    assert all(writer.submit({'i': i}) for i in (1, 2, 3))
+    recorder.release.set()
+    assert writer.flush(timeout=5)
+    assert recorder.written == [0, 2, 3]
+    assert writer.stats()['dropped'] == 1
+    writer.stop()
+
+def test_failed_batches_are_counted_not_retried():
+    recorder = Recorder(fail=True)
+    writer = LogWriter(recorder, batch_size=10, flush_interval=0.01)
+    writer.submit_many([{'i': i} for i in range(4)])
+    assert writer.flush(timeout=5)
+    stats = writer.stats()
+    assert stats['failed'] == 4 and stats['written'] == 0
+    writer.stop()
+
+def test_stop_drains_queue_without_waiting_for_interval():
+    recorder = Recorder()
+    writer = LogWriter(recorder, batch_size=1000, flush_interval=30)
+    writer.submit_many([{'i': i} for i in range(5)])
+    start = time.monotonic()
+    assert writer.stop(timeout=5)
+    assert time.monotonic() - start < 5
+    assert recorder.written == list(range(5))
+    assert not writer.stats()['running']
+
+def test_stop_times_out_while_a_write_hangs():
+    recorder = Recorder()
+    writer = LogWriter(recorder, batch_size=1, flush_interval=0.01)
+    hold_writer(writer, recorder)
+    assert not writer.stop(timeout=0.1)
+    recorder.release.set()
+    assert writer.stop(timeout=5)
+
+def test_stop_before_start_is_a_no_op():
+    writer = LogWriter(Recorder())
+    assert writer.stop(timeout=0.1)
+
+def test_unknown_overflow_policy():
+    with pytest.raises(ValueError):
+        LogWriter(Recorder(), overflow='block')
@@ -0,0 +1,99 @@
+# test_rate_limit.py - Cost estimates, token buckets and the memory/SQLite bucket stores
+import pytest
+
+from config import Config
+from rate_limit import (
+    MemoryRateLimitBackend, RateLimiter, SQLiteRateLimitBackend,
+    block_ms, estimate_cost_ms, is_exempt, take_tokens
+)
+
+def key_bits(key_id):
+    return 2048 if key_id == 'known' else 0
+
+def test_take_tokens_refills_and_refuses():
+    state, allowed = take_tokens(None, 3, capacity=5, rate=1, now=100)
+    assert allowed and state == (2, 100)
+    state, allowed = take_tokens(state, 4, capacity=5, rate=1, now=101)
+    assert not allowed and state == (3, 101)
+    state, allowed = take_tokens(state, 1, capacity=5, rate=1, now=1000)
+    assert allowed and state == (4, 1000)
+
+def test_text_decrypt_charged_at_private_rate():
+    data = {'key_id': 'known', 'mode': 'text', 'ciphertext_blocks_b64': ['AQ=='] * 10}
+    assert estimate_cost_ms('/api/decrypt', data, key_bits) == pytest.approx(10 * block_ms('private', 2048))
+
+def test_unknown_key_and_bad_input_cost_nothing():
+    assert estimate_cost_ms('/api/encrypt', {'key_id': 'missing', 'message': 'x' * 100}, key_bits) == 0
+    assert estimate_cost_ms('/api/generate-key', {'bits': 'many'}, key_bits) == 0
+    assert estimate_cost_ms('/api/encrypt/batch', {'items': 'nope'}, key_bits) == 0
+    assert estimate_cost_ms('/api/decrypt', None, key_bits) == 0
+
+def test_streams_cost_at_least_one_block():
+    assert estimate_cost_ms('/api/encrypt/stream', {'key_id': 'known'}, key_bits, 0) == block_ms('public', 2048)
+    assert estimate_cost_ms('/api/decrypt/stream', {'key_id': 'known'}, key_bits, 0) == block_ms('private', 2048)
+    big = estimate_cost_ms('/api/encrypt/stream', {'key_id': 'known'}, key_bits, 1024 * 1024)
+    assert big > 1000 * block_ms('public', 2048)
+
+def test_audit_grows_with_key_count():
+    few = estimate_cost_ms('/api/keys/audit', {}, key_bits, key_count=lambda: 10)
+    many = estimate_cost_ms('/api/keys/audit', {}, key_bits, key_count=lambda: 1000)
+    assert 0 < few < many
+
+def test_factor_cost_is_well_below_capacity():
+    limiter = RateLimiter(MemoryRateLimitBackend(), capacity=100, window=60, cost_unit_ms=25)
+    small = limiter.cost(estimate_cost_ms('/api/factor', {'n': str(1000003 * 1000033)}, key_bits))
+    assert small < 1.1
+    # a modulus rho cannot finish within the budget pays for the whole (default 5 s) budget
+    full = limiter.cost(estimate_cost_ms('/api/factor', {'n': str(2 ** 200 + 1)}, key_bits))
+    assert small < full < 10
+    assert estimate_cost_ms('/api/factor', {'key_id': 'known'}, key_bits) == estimate_cost_ms(
+        '/api/factor', {'key_id': 'known', 'budget_ms': Config.FACTOR_DEFAULT_BUDGET_MS}, key_bits)
+    assert estimate_cost_ms('/api/factor', {'n': '77', 'budget_ms': 'x'}, key_bits) == 0
+
+def test_job_polling_is_exempt():
+    assert is_exempt('GET', '/api/health')
+    assert is_exempt('GET', '/api/factor/abc')
+    assert is_exempt('GET', '/api/jobs/abc/events')
+    assert not is_exempt('POST', '/api/jobs/generate-key')
+    assert not is_exempt('DELETE', '/api/jobs/abc')
+    assert not is_exempt('POST', '/api/factor')
+
+def test_limiter_refuses_when_bucket_is_empty():
+    limiter = RateLimiter(MemoryRateLimitBackend(), capacity=3, window=60, cost_unit_ms=25)
+    assert all(limiter.check('client').allowed for _ in range(3))
+    decision = limiter.check('client')
+    assert not decision.allowed and decision.retry_after > 0
+    headers = limiter.headers(decision)
+    assert headers['RateLimit-Limit'] == '3' and 'Retry-After' in headers
+    assert limiter.check('other').allowed
+
+def test_single_request_is_capped_at_capacity():
+    limiter = RateLimiter(MemoryRateLimitBackend(), capacity=10, window=60, cost_unit_ms=25)
+    decision = limiter.check('client', cpu_ms=1e9)
+    assert decision.allowed and decision.cost == 10
+
+def test_memory_backend_forgets_least_recent_clients():
+    backend = MemoryRateLimitBackend(max_clients=2)
+    for client in ('a', 'b', 'c'):
+        backend.consume(client, 1, 5, 1)
+    assert backend.stats()['clients'] == 2
+
+def test_sqlite_backend_shares_buckets(tmp_path):
+    path = str(tmp_path / 'limits.sqlite3')
+    first = RateLimiter(SQLiteRateLimitBackend(path), capacity=2, window=60, cost_unit_ms=25)
+    second = RateLimiter(SQLiteRateLimitBackend(path), capacity=2, window=60, cost_unit_ms=25)
+    assert first.check('client').allowed
+    assert second.check('client').allowed
+    assert not first.check('client').allowed
+
+def test_backend_errors_let_requests_through():
+    class Broken:
+        def consume(self, *args):
+            raise RuntimeError('down')
+
+        def stats(self):
+            return {}
+
+    limiter = RateLimiter(Broken(), capacity=5, window=60, cost_unit_ms=Config.RATE_LIMIT_COST_UNIT_MS)
+    assert limiter.check('client') is None
+    assert limiter.errors == 1
@@ -0,0 +1,145 @@
+# test_rsa_core.py - rsa_core primitives: CRT decryption, byte tables, prime sieve, wire format, PSS signatures
+import secrets
+
+import pytest
+
+from rsa_core import (
+    RSAKey, generate_rsa, rsa_private, powmod, byte_tables, key_size_bytes,
+    rsa_encrypt_text, rsa_decrypt_text, rsa_encrypt_packed, rsa_decrypt_packed,
+    PrimeStats, SMALL_PRIMES, gen_prime, is_probable_prime, sieve_window,
+    WIRE_HEADER, block_width, max_bytes_per_block, pack_binary, unpack_binary,
+    SALT_LEN, pss_encode, rsa_sign, rsa_verify
+)
+
+def test_crt_matches_full_modulus(key):
+    for _ in range(20):
+        c = secrets.randbelow(key.n)
+        assert rsa_private(c, key, crt=True) == rsa_private(c, key, crt=False)
+    assert rsa_private(0, key) == 0
+    assert rsa_private(key.n - 1, key) == key.n - 1
+
+def test_crt_parameters(key):
+    assert key.dP == key.d % (key.p - 1)
+    assert key.dQ == key.d % (key.q - 1)
+    assert key.qInv * key.q % key.p == 1
+
+@pytest.mark.parametrize('message', ['', 'hello', 'xin chào ' * 50])
+def test_crt_round_trips(key, message):
+    blocks, sizes = rsa_encrypt_packed(message, key)
+    assert rsa_decrypt_packed(blocks, sizes, key, crt=True) == message
+    assert rsa_decrypt_packed(blocks, sizes, key, crt=False) == message
+    assert rsa_decrypt_text(rsa_encrypt_text(message, key), key, crt=True) == message
+
+def test_crt_wrong_key_does_not_fit_declared_size(key):
+    other = generate_rsa(512)
+    blocks, sizes = rsa_encrypt_packed('x' * 200, key)
+    with pytest.raises(OverflowError):
+        rsa_decrypt_packed(blocks, sizes, other)
+
+def fresh(key) -> RSAKey:
+    """Same key without any lazily built tables"""
+    return RSAKey(key.n, key.e, key.d, key.p, key.q)
+
+def test_byte_tables_built_once_and_sized(key):
+    k = fresh(key)
+    before = key_size_bytes(k)
+    enc, dec = byte_tables(k)
+    assert enc == [powmod(b, k.e, k.n) for b in range(256)]
+    assert all(dec[c] == b for b, c in enumerate(enc))
+    assert byte_tables(k)[0] is enc
+    assert key_size_bytes(k) > before
+
+@pytest.mark.parametrize('message', ['', 'a', 'xin chào 🔐', bytes(range(128)).decode()])
+def test_byte_table_text_round_trip(key, message):
+    blocks = rsa_encrypt_text(message, fresh(key))
+    assert rsa_decrypt_text(blocks, fresh(key)) == message
+    assert rsa_decrypt_text(blocks, key, crt=False) == message
+
+def test_byte_table_misses_fall_back_to_modexp(key):
+    # a block that is not in the table (not a byte's encryption) still decrypts through rsa_private
+    c = powmod(256 + 65, key.e, key.n)
+    assert c not in byte_tables(key)[1]
+    assert rsa_decrypt_text([c], key) == 'A'
+
+@pytest.mark.parametrize('bits', [16, 64, 256])
+def test_gen_prime_exact_bit_length(bits):
+    stats = PrimeStats()
+    for _ in range(5):
+        p = gen_prime(bits, stats)
+        assert p.bit_length() == bits
+        assert is_probable_prime(p)
+    assert stats.primes == 5
+    assert stats.windows >= stats.primes
+    assert stats.sieved >= stats.mr_tested >= stats.primes
+
+def test_sieve_window_survivors_skip_small_factors():
+    stats = PrimeStats()
+    while (p := sieve_window(128, stats)) is None:
+        pass
+    assert all(p % q for q in SMALL_PRIMES)
+    assert stats.mr_tested < stats.sieved
+
+@pytest.mark.parametrize('n, expected', [
+    (-7, False), (0, False), (1, False), (2, True), (29, True), (561, False),
+    (2**61 - 1, True), (2**61 + 1, False), (3215031751, False),
+])
+def test_is_probable_prime(n, expected):
+    assert is_probable_prime(n) is expected
+
+@pytest.mark.parametrize('message', ['', 'a', 'x' * 63, 'x' * 64, 'xin chào ' * 30])
+def test_binary_wire_round_trip_packed(key, message):
+    blocks, sizes = rsa_encrypt_packed(message, key)
+    blob = pack_binary(blocks, key, sizes[-1] if sizes else 1)
+    assert len(blob) == WIRE_HEADER.size + len(blocks) * block_width(key)
+    assert unpack_binary(blob, key) == (blocks, sizes)
+    assert rsa_decrypt_packed(*unpack_binary(blob, key), key) == message
+
+def test_binary_wire_round_trip_text(key):
+    blocks = rsa_encrypt_text('hello', key)
+    out, sizes = unpack_binary(pack_binary(blocks, key), key, packed=False)
+    assert out == blocks and sizes == [1] * len(blocks)
+    assert rsa_decrypt_text(out, key) == 'hello'
+
+@pytest.mark.parametrize('last', [0, 'full+1'])
+def test_binary_wire_rejects_last_block_size(key, last):
+    full = max_bytes_per_block(key)
+    blocks, _ = rsa_encrypt_packed('x' * 100, key)
+    blob = pack_binary(blocks, key, full + 1 if last == 'full+1' else last)
+    with pytest.raises(ValueError, match='last block length'):
+        unpack_binary(blob, key)
+    with pytest.raises(ValueError, match='last block length'):
+        unpack_binary(pack_binary(blocks, key, 2), key, packed=False)
+
+def test_binary_wire_rejects_bad_lengths(key):
+    blob = pack_binary(rsa_encrypt_text('hi', key), key)
+    with pytest.raises(ValueError, match='shorter than header'):
+        unpack_binary(blob[:WIRE_HEADER.size - 1], key)
+    with pytest.raises(ValueError, match='does not match block count'):
+        unpack_binary(blob[:-1], key)
+    with pytest.raises(ValueError, match='does not match block count'):
+        unpack_binary(blob + b'\0', key)
+
+@pytest.mark.parametrize('message', ['', 'hello', 'xin chào ' * 100])
+def test_pss_sign_verify_round_trip(key, message):
+    signature, salt = rsa_sign(message, key)
+    assert len(salt) == SALT_LEN
+    assert 0 <= signature < key.n
+    assert rsa_verify(message, signature, salt, key)
+    # fresh salt each time, same message still verifies
+    assert rsa_sign(message, key)[1] != salt
+    assert rsa_sign(message, key, salt, crt=False) == (signature, salt)
+
+def test_pss_representative_below_modulus(key):
+    assert pss_encode(b'x', b'\xff' * SALT_LEN, key).bit_length() <= key.n.bit_length() - 1
+
+def test_pss_rejects_tampering(key):
+    signature, salt = rsa_sign('hello', key)
+    assert not rsa_verify('hellO', signature, salt, key)
+    assert not rsa_verify('hello', signature ^ 1, salt, key)
+    assert not rsa_verify('hello', signature, bytes([salt[0] ^ 1]) + salt[1:], key)
+    assert not rsa_verify('hello', signature, salt, generate_rsa(512))
+
+def test_pss_rejects_out_of_range_signature(key):
+    signature, salt = rsa_sign('hello', key)
+    assert not rsa_verify('hello', signature + key.n, salt, key)
+    assert not rsa_verify('hello', -signature, salt, key)
@@ -0,0 +1,68 @@
+# test_streaming.py - NDJSON streaming encrypt/decrypt round trips and malformed input
+import io
+import json
+
+import pytest
+
+from metrics import MODEXP_BLOCKS, bits_label
+from rsa_core import b64_to_int_list, int_list_to_b64, max_bytes_per_block
+from streaming import decrypt_ndjson, encrypt_ndjson, read_lines
+
+def encrypt(data: bytes, key) -> bytes:
+    return ''.join(encrypt_ndjson(io.BytesIO(data), key)).encode()
+
+def decrypt(body: bytes, key) -> bytes:
+    return b''.join(decrypt_ndjson(io.BytesIO(body), key))
+
+@pytest.mark.parametrize('length', [0, 1, 63, 64, 65, 200_000])
+def test_round_trip(key, length):
+    data = bytes(i % 251 for i in range(length))
+    body = encrypt(data, key)
+    lines = body.splitlines()
+    k = max_bytes_per_block(key)
+    assert len(lines) == -(-length // k)
+    assert all(json.loads(line)['size'] == k for line in lines[:-1])
+    assert decrypt(body, key) == data
+
+def line(c: int, size) -> bytes:
+    return json.dumps({'c': int_list_to_b64([c])[0], 'size': size}).encode() + b'\n'
+
+@pytest.mark.parametrize('size', [0, -1, 300_000_000, True, '5', 1.5])
+def test_size_out_of_range(key, size):
+    with pytest.raises(ValueError, match='size must be between'):
+        decrypt(line(1, size), key)
+
+@pytest.mark.parametrize('body', [b'not json\n', b'{"size": 1}\n', b'[1, 2]\n', b'{"c": 5, "size": 1}\n'])
+def test_malformed_lines(key, body):
+    with pytest.raises(ValueError, match='Line 1'):
+        decrypt(body, key)
+
+def test_block_not_below_modulus(key):
+    with pytest.raises(ValueError, match='out of range'):
+        decrypt(line(key.n, 1), key)
+
+def test_block_larger_than_declared_size(key):
+    body = encrypt(b'\xff' * max_bytes_per_block(key), key)
+    block = b64_to_int_list([json.loads(body)['c']])[0]
+    with pytest.raises(ValueError, match='declared size'):
+        decrypt(line(block, 1), key)
+
+def test_error_reports_line_number(key):
+    body = encrypt(b'hello', key) + line(1, 0)
+    with pytest.raises(ValueError, match='Line 2'):
+        decrypt(body, key)
+
+def test_read_lines_limits_line_length():
+    with pytest.raises(ValueError, match='too long'):
+        list(read_lines(io.BytesIO(b'x' * 100), max_line=10))
+    assert list(read_lines(io.BytesIO(b'a\n\n b\nc'))) == [b'a', b' b', b'c']
+
+def test_modexp_metrics_count_stream_blocks(key):
+    counter = MODEXP_BLOCKS.labels('encrypt', 'stream', bits_label(key.n.bit_length()))
+    before = counter._total()[0]
+    body = encrypt(b'x' * 1000, key)
+    assert counter._total()[0] - before == len(body.splitlines())
+    counter = MODEXP_BLOCKS.labels('decrypt', 'stream', bits_label(key.n.bit_length()))
+    before = counter._total()[0]
+    decrypt(body, key)
+    assert counter._total()[0] - before == len(body.splitlines())
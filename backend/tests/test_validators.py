@@ -0,0 +1,31 @@
+# test_validators.py - Request validation messages and bounds
+import pytest
+
+from config import Config
+from validators import ValidationError, validate_factor_request, validate_key_generation_request
+
+def test_factor_request_accepts_defaults_and_bounds():
+    validate_factor_request({'n': '77'})
+    validate_factor_request({'n': '77', 'budget_ms': 1, 'wait_ms': 0})
+    validate_factor_request({'n': '77', 'wait_ms': Config.FACTOR_MAX_BUDGET_MS})
+
+@pytest.mark.parametrize('data, message', [
+    ({}, 'Either n or key_id'),
+    ({'n': '-5'}, 'n must be'),
+    ({'n': '77', 'budget_ms': 0}, 'budget_ms'),
+    ({'n': '77', 'wait_ms': 'x'}, 'wait_ms must be between 0 and'),
+    ({'n': '77', 'wait_ms': -1}, 'wait_ms'),
+    ({'n': '77', 'wait_ms': Config.FACTOR_MAX_BUDGET_MS + 1}, 'wait_ms'),
+    ({'n': '77', 'methods': []}, 'methods'),
+])
+def test_factor_request_rejects(data, message):
+    with pytest.raises(ValidationError, match=message):
+        validate_factor_request(data)
+
+def test_key_generation_bounds_match_message():
+    assert validate_key_generation_request({'bits': Config.MIN_KEY_SIZE}) == (Config.MIN_KEY_SIZE, None)
+    assert validate_key_generation_request({'bits': Config.MAX_KEY_SIZE, 'ttl': 60}) == (Config.MAX_KEY_SIZE, 60)
+    message = f'bits must be between {Config.MIN_KEY_SIZE} and {Config.MAX_KEY_SIZE}'
+    for bits in (Config.MIN_KEY_SIZE - 1, Config.MAX_KEY_SIZE + 1, 'x'):
+        with pytest.raises(ValidationError, match=message):
+            validate_key_generation_request({'bits': bits})
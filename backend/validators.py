@@ -2,6 +2,7 @@
 import re
 import logging
 from typing import Any, Optional
+from datetime import datetime, timedelta, timezone
 from functools import wraps
 from flask import request, jsonify
 from config import Config
@@ -13,10 +14,10 @@ class ValidationError(Exception):
     pass
 
 def validate_key_id_format(key_id: str) -> bool:
-    """Validate key_id follows expected format (YYYYMMDD_HHMMSS)"""
+    """Validate key_id follows expected format (YYYYMMDD_HHMMSS, optional _N suffix)"""
     if not key_id or not isinstance(key_id, str):
         return False
-    pattern = r'^\d{8}_\d{6}$'
+    pattern = r'^\d{8}_\d{6}(_\d+)?$'
     return bool(re.match(pattern, key_id))
 
 def validate_message_length(message: str, max_length: Optional[int] = None) -> bool:
@@ -43,6 +44,19 @@ def validate_key_size(bits: Any) -> bool:
     """Validate RSA key size"""
     return validate_number_range(bits, Config.MIN_KEY_SIZE, Config.MAX_KEY_SIZE)
 
+def validate_key_generation_request(data: dict) -> tuple:
+    """Validate key generation request data; returns (bits, ttl)"""
+    bits = data.get('bits', 1024)
+    if not validate_key_size(bits):
+        logger.warning(f"Invalid bits value: {bits}")
+        raise ValidationError(f'bits must be between {Config.MIN_KEY_SIZE} and {Config.MAX_KEY_SIZE}')
+    
+    ttl = data.get('ttl')
+    if ttl is not None and (not isinstance(ttl, (int, float)) or isinstance(ttl, bool) or ttl <= 0):
+        raise ValidationError('ttl must be a positive number of seconds')
+    
+    return int(bits), ttl
+
 def validate_blocks_count(blocks: list) -> bool:
     """Validate ciphertext blocks count"""
     return isinstance(blocks, list) and len(blocks) <= Config.MAX_BLOCKS_COUNT
@@ -56,6 +70,15 @@ def validate_json_required(f):
         return f(*args, **kwargs)
     return decorated_function
 
+def validate_json_or_binary(f):
+    """Decorator to check the body is JSON or raw application/octet-stream"""
+    @wraps(f)
+    def decorated_function(*args, **kwargs):
+        if not request.is_json and request.mimetype != 'application/octet-stream':
+            return jsonify({'success': False, 'error': 'JSON or application/octet-stream required'}), 400
+        return f(*args, **kwargs)
+    return decorated_function
+
 def validate_request_data(data: dict, required_fields: list) -> None:
     """Validate required fields in request data"""
     missing_fields = [field for field in required_fields if field not in data]
@@ -81,7 +104,13 @@ def validate_decryption_request(data: dict) -> None:
     
     mode = (data.get('mode') or 'text').strip().lower()
     
-    if mode == 'text':
+    if 'ciphertext_bin' in data:
+        if mode not in ('text', 'packed'):
+            raise ValidationError("Invalid mode. Use 'text' or 'packed'")
+        if not isinstance(data['ciphertext_bin'], (str, bytes)):
+            raise ValidationError('ciphertext_bin must be a base64 string')
+    
+    elif mode == 'text':
         if 'ciphertext_blocks_b64' not in data:
             raise ValidationError('ciphertext_blocks_b64 required for text mode')
         
@@ -99,3 +128,104 @@ def validate_decryption_request(data: dict) -> None:
     
     else:
         raise ValidationError("Invalid mode. Use 'text' or 'packed'")
+
+def validate_sign_request(data: dict) -> None:
+    """Validate signing request data"""
+    validate_request_data(data, ['key_id', 'message'])
+    
+    if not validate_key_id_format(data['key_id']):
+        raise ValidationError('Invalid key_id format')
+    
+    if not validate_message_length(data['message']):
+        raise ValidationError(f'Message too long (max {Config.MAX_MESSAGE_LENGTH} chars)')
+
+def validate_verify_request(data: dict) -> None:
+    """Validate verification request data"""
+    validate_sign_request(data)
+    validate_request_data(data, ['signature', 'salt'])
+    
+    if not isinstance(data['signature'], str) or not isinstance(data['salt'], str):
+        raise ValidationError('signature and salt must be base64 strings')
+
+def validate_batch_request(data: dict, max_items: Optional[int] = None) -> list:
+    """Validate batch request envelope and return its items"""
+    validate_request_data(data, ['items'])
+    
+    items = data['items']
+    if not isinstance(items, list) or not items:
+        raise ValidationError('items must be a non-empty list')
+    
+    max_items = max_items or Config.BATCH_MAX_ITEMS
+    if len(items) > max_items:
+        raise ValidationError(f'Too many items (max {max_items})')
+    
+    return items
+
+def validate_factor_request(data: dict) -> None:
+    """Validate factorization request data"""
+    if 'n' not in data and 'key_id' not in data:
+        raise ValidationError('Either n or key_id is required')
+    
+    if 'n' in data and not str(data['n']).strip().isdigit():
+        raise ValidationError('n must be a positive integer (decimal)')
+    
+    if 'key_id' in data and 'n' not in data and not validate_key_id_format(data['key_id']):
+        raise ValidationError('Invalid key_id format')
+    
+    if 'budget_ms' in data and not validate_number_range(data['budget_ms'], 1, Config.FACTOR_MAX_BUDGET_MS):
+        raise ValidationError(f'budget_ms must be between 1 and {Config.FACTOR_MAX_BUDGET_MS}')
+    
+    if 'wait_ms' in data and not validate_number_range(data['wait_ms'], 0, Config.FACTOR_MAX_BUDGET_MS):
+        raise ValidationError(f'wait_ms must be between 0 and {Config.FACTOR_MAX_BUDGET_MS}')
+    
+    methods = data.get('methods')
+    if methods is not None and (not isinstance(methods, list) or not methods):
+        raise ValidationError('methods must be a non-empty list')
+
+def _parse_timestamp(value: str, name: str) -> datetime:
+    """Parse an ISO 8601 timestamp; values without an offset are taken as UTC"""
+    try:
+        parsed = datetime.fromisoformat(value)
+    except ValueError:
+        raise ValidationError(f'{name} must be an ISO 8601 timestamp')
+    return parsed if parsed.tzinfo else parsed.replace(tzinfo=timezone.utc)
+
+def validate_log_query(args) -> dict:
+    """Validate GET /api/logs query parameters; returns the filters to apply"""
+    filters = {}
+    for param, field in (('operation', 'operation'), ('key_id', 'keyId'), ('type', 'type')):
+        value = args.get(param)
+        if value:
+            filters[field] = value
+    
+    for param in ('since', 'until'):
+        value = args.get(param)
+        if value:
+            filters[param] = _parse_timestamp(value, param)
+    
+    return filters
+
+def validate_stats_query(args) -> tuple:
+    """Validate GET /api/stats query parameters; returns (since, until, bucket seconds, filters)"""
+    now = datetime.now(timezone.utc)
+    until = _parse_timestamp(args['until'], 'until') if args.get('until') else now
+    since = _parse_timestamp(args['since'], 'since') if args.get('since') else until - timedelta(days=1)
+    if since >= until:
+        raise ValidationError('since must be earlier than until')
+    
+    step = args.get('bucket', 3600)
+    if not validate_number_range(step, Config.STATS_ROLLUP_SECONDS) or int(step) % Config.STATS_ROLLUP_SECONDS:
+        raise ValidationError(f'bucket must be a multiple of {Config.STATS_ROLLUP_SECONDS} seconds')
+    step = int(step)
+    if (until - since).total_seconds() / step > Config.STATS_MAX_BUCKETS:
+        raise ValidationError(f'Too many buckets (max {Config.STATS_MAX_BUCKETS}); use a larger bucket')
+    
+    filters = {}
+    if args.get('operation'):
+        filters['operation'] = args['operation']
+    if args.get('bit_length'):
+        if not validate_number_range(args['bit_length'], 1):
+            raise ValidationError('bit_length must be a positive integer')
+        filters['bitLength'] = int(args['bit_length'])
+    
+    return since.timestamp(), until.timestamp(), step, filters
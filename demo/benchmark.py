@@ -0,0 +1,69 @@
+# benchmark.py - So sánh backend số nguyên lớn (python vs gmpy2) cho rsa_core
+import argparse
+import secrets
+import time
+
+import rsa_core
+from rsa_core import (
+    generate_rsa, is_probable_prime, modinv,
+    rsa_private, rsa_encrypt_packed, rsa_decrypt_packed,
+)
+
+def timed(fn, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        result = fn()
+    return (time.perf_counter() - start) / repeat, result
+
+def bench_size(bits, repeat, backends):
+    # Same key and inputs for every backend so outputs can be compared
+    rsa_core.set_backend("python")
+    K = generate_rsa(bits)
+    C = secrets.randbelow(K.n)
+    message = "RSA benchmark ✓ " * 64
+    blocks, sizes = rsa_encrypt_packed(message, K)
+
+    cases = {
+        "private modexp (CRT)": lambda: rsa_private(C, K),
+        "private modexp (full)": lambda: rsa_private(C, K, crt=False),
+        "encrypt packed": lambda: rsa_encrypt_packed(message, K),
+        "decrypt packed": lambda: rsa_decrypt_packed(blocks, sizes, K),
+        "Miller-Rabin (prime p)": lambda: is_probable_prime(K.p),
+        "modinv(e, phi)": lambda: modinv(K.e, (K.p - 1) * (K.q - 1)),
+    }
+
+    rows = []
+    for name, fn in cases.items():
+        timings, outputs = [], []
+        for backend in backends:
+            rsa_core.set_backend(backend)
+            t, out = timed(fn, repeat)
+            timings.append(t)
+            outputs.append(out)
+        same = all(o == outputs[0] for o in outputs)
+        rows.append((name, timings, same))
+    return rows
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark rsa_core bigint backends")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1024, 2048, 4096])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    backends = ["python"] + (["gmpy2"] if rsa_core.gmpy2 is not None else [])
+    if len(backends) == 1:
+        print("gmpy2 chưa được cài, chỉ đo backend python")
+
+    header = f"{'bits':>5}  {'operation':<24}" + "".join(f"{b + ' (ms)':>14}" for b in backends)
+    if len(backends) > 1:
+        header += f"{'speedup':>10}{'same':>6}"
+    print(header)
+    for bits in args.sizes:
+        for name, timings, same in bench_size(bits, args.repeat, backends):
+            line = f"{bits:>5}  {name:<24}" + "".join(f"{t * 1000:>14.3f}" for t in timings)
+            if len(backends) > 1:
+                line += f"{timings[0] / timings[1]:>9.1f}x{'yes' if same else 'NO':>6}"
+            print(line)
+
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,98 @@
+import os
+import sys
 import secrets
 import math
-from dataclasses import dataclass
-from typing import List, Tuple, Dict
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from dataclasses import dataclass, field
+from typing import Callable, List, Tuple, Dict, Optional, Iterable, Iterator
 import base64
+import hashlib
+import struct
 
 def egcd(a: int, b: int):
-    if b == 0:
-        return (a, 1, 0)
-    g, x1, y1 = egcd(b, a % b)
-    return g, y1, x1 - (a // b) * y1
+    # iterative so 2048-bit operands (qInv for 4096-bit keys) cannot hit the recursion limit
+    x0, y0, x1, y1 = 1, 0, 0, 1
+    while b:
+        q, a, b = a // b, b, a % b
+        x0, x1 = x1, x0 - q * x1
+        y0, y1 = y1, y0 - q * y1
+    return a, x0, y0
 
-def modinv(a: int, m: int):
+try:
+    import gmpy2
+except ImportError:
+    gmpy2 = None
+
+# Big-integer backend. Both produce identical (plain int) results; gmpy2 is just faster.
+# Chosen by RSA_BIGINT_BACKEND=auto|gmpy2|python, or set_backend() at runtime.
+BACKEND = "python"
+
+def _py_powmod(b: int, e: int, m: int) -> int:
+    return pow(b, e, m)
+
+def _py_invert(a: int, m: int) -> int:
     g, x, _ = egcd(a % m, m)
     if g != 1:
         raise ValueError("No modular inverse")
     return x % m
 
+def _py_strong_prp(n: int, a: int, d: int, r: int) -> bool:
+    x = pow(a, d, n)
+    if x in (1, n - 1):
+        return True
+    for _ in range(r - 1):
+        x = (x * x) % n
+        if x == n - 1:
+            return True
+    return False
+
+def _gmp_powmod(b: int, e: int, m: int) -> int:
+    return int(gmpy2.powmod(b, e, m))
+
+def _gmp_invert(a: int, m: int) -> int:
+    try:
+        return int(gmpy2.invert(a, m))
+    except ZeroDivisionError:
+        raise ValueError("No modular inverse")
+
+def _gmp_strong_prp(n: int, a: int, d: int, r: int) -> bool:
+    # same single-base Miller-Rabin as _py_strong_prp, so both backends accept the same candidates
+    a %= n
+    if a in (1, n - 1):
+        return True
+    return gmpy2.is_strong_prp(n, a)
+
+powmod = _py_powmod
+invert = _py_invert
+strong_prp = _py_strong_prp
+
+def set_backend(name: str = "auto") -> str:
+    global BACKEND, powmod, invert, strong_prp
+    name = (name or "auto").strip().lower()
+    if name == "auto":
+        name = "gmpy2" if gmpy2 is not None else "python"
+    if name == "gmpy2":
+        if gmpy2 is None:
+            raise ValueError("gmpy2 backend requested but gmpy2 is not installed")
+        powmod, invert, strong_prp = _gmp_powmod, _gmp_invert, _gmp_strong_prp
+    elif name == "python":
+        powmod, invert, strong_prp = _py_powmod, _py_invert, _py_strong_prp
+    else:
+        raise ValueError(f"Unknown bigint backend: {name}")
+    BACKEND = name
+    return name
+
+def mpz(x: int):
+    # fast big-int type of the active backend, for bulk arithmetic such as product trees
+    return gmpy2.mpz(x) if BACKEND == "gmpy2" else x
+
+set_backend(os.environ.get("RSA_BIGINT_BACKEND", "auto"))
+
+def modinv(a: int, m: int):
+    return invert(a, m)
+
 def is_probable_prime(n: int) -> bool:
     if n < 2:
         return False
@@ -33,23 +110,126 @@ def is_probable_prime(n: int) -> bool:
     for a in [2,325,9375,28178,450775,9780504,1795265022]:
         if a % n == 0:
             continue
-        x = pow(a, d, n)
-        if x in (1, n - 1):
-            continue
-        for _ in range(r - 1):
-            x = (x * x) % n
-            if x == n - 1:
-                break
-        else:
+        if not strong_prp(n, a, d, r):
             return False
     return True
 
-def gen_prime(bits: int) -> int:
-    while True:
-        x = secrets.randbits(bits)
-        x |= (1 << (bits - 1)) | 1
+def _small_primes(limit: int) -> List[int]:
+    sieve = bytearray([1]) * (limit + 1)
+    sieve[0:2] = b"\x00\x00"
+    for i in range(2, math.isqrt(limit) + 1):
+        if sieve[i]:
+            sieve[i*i::i] = bytes(len(range(i*i, limit + 1, i)))
+    return [i for i, v in enumerate(sieve) if v]
+
+# Odd primes below 30000 (~3200 of them) used to sieve prime candidates
+SMALL_PRIMES = _small_primes(30000)[1:]
+# Number of consecutive odd candidates sieved after each random start
+SIEVE_WINDOW = 4096
+
+@dataclass
+class PrimeStats:
+    windows: int = 0     # random starts drawn
+    sieved: int = 0      # odd candidates covered by the sieve
+    mr_tested: int = 0   # sieve survivors sent to Miller-Rabin
+    primes: int = 0      # windows that yielded a prime
+    seconds: float = 0.0 # time spent in sieve_window (summed over workers)
+
+    def add(self, other: "PrimeStats") -> None:
+        self.windows += other.windows
+        self.sieved += other.sieved
+        self.mr_tested += other.mr_tested
+        self.primes += other.primes
+        self.seconds += other.seconds
+
+def sieve_window(bits: int, stats: Optional[PrimeStats] = None) -> Optional[int]:
+    if stats is None:
+        return _sieve_window(bits, None)
+    t0 = time.perf_counter()
+    x = _sieve_window(bits, stats)
+    stats.seconds += time.perf_counter() - t0
+    if x is not None:
+        stats.primes += 1
+    return x
+
+def _sieve_window(bits: int, stats: Optional[PrimeStats]) -> Optional[int]:
+    # One random start, then sieve start, start+2, ... so only survivors reach Miller-Rabin
+    start = secrets.randbits(bits) | (1 << (bits - 1)) | 1
+    count = min(SIEVE_WINDOW, ((1 << bits) - start + 1) // 2)
+    alive = bytearray([1]) * count
+    for p in SMALL_PRIMES:
+        if p >= start:
+            break
+        # first i with p | start + 2i
+        i = (-start % p) * ((p + 1) // 2) % p
+        if i < count:
+            alive[i::p] = bytes(len(range(i, count, p)))
+    if stats is not None:
+        stats.windows += 1
+        stats.sieved += count
+    i = alive.find(1)
+    while i != -1:
+        if stats is not None:
+            stats.mr_tested += 1
+        x = start + 2 * i
         if is_probable_prime(x):
             return x
+        i = alive.find(1, i + 1)
+    return None
+
+class GenerationCancelled(Exception):
+    pass
+
+def gen_prime(bits: int, stats: Optional[PrimeStats] = None,
+              should_stop: Optional[Callable[[], bool]] = None) -> int:
+    # should_stop() is polled after every fruitless window; True abandons the search
+    while True:
+        x = sieve_window(bits, stats)
+        if x is not None:
+            return x
+        if should_stop is not None and should_stop():
+            raise GenerationCancelled()
+
+_pools: Dict[int, ProcessPoolExecutor] = {}
+_pool_lock = threading.Lock()
+
+def get_pool(workers: int) -> ProcessPoolExecutor:
+    # One long-lived process pool per worker count. Pools are never replaced or shut down
+    # here, since other threads may have work queued on them (callers pass fixed, configured
+    # counts, so only a handful ever exist)
+    workers = max(1, workers)
+    with _pool_lock:
+        pool = _pools.get(workers)
+        if pool is None:
+            pool = _pools[workers] = ProcessPoolExecutor(max_workers=workers)
+        return pool
+
+def _window_task(bits: int) -> Tuple[Optional[int], PrimeStats]:
+    stats = PrimeStats()
+    return sieve_window(bits, stats), stats
+
+def gen_primes_parallel(bits: int, count: int, workers: int,
+                        stats: Optional[PrimeStats] = None) -> List[int]:
+    # Each task sieves and tests one window, so the pool stays busy with short jobs and
+    # leftover tasks can be dropped as soon as enough distinct primes have come back
+    pool = get_pool(workers)
+    found: List[int] = []
+    pending = {pool.submit(_window_task, bits) for _ in range(workers)}
+    try:
+        while len(found) < count:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for f in done:
+                x, st = f.result()
+                if stats is not None:
+                    stats.add(st)
+                if x is not None and x not in found:
+                    found.append(x)
+            if len(found) < count:
+                pending |= {pool.submit(_window_task, bits) for _ in range(workers - len(pending))}
+    finally:
+        for f in pending:
+            f.cancel()
+    return found[:count]
 
 @dataclass
 class RSAKey:
@@ -58,13 +238,50 @@ class RSAKey:
     d: int
     p: int
     q: int
+    # CRT parameters, derived once per key from p, q and d
+    dP: int = field(init=False, repr=False, compare=False)
+    dQ: int = field(init=False, repr=False, compare=False)
+    qInv: int = field(init=False, repr=False, compare=False)
+    # Byte-mode lookup tables, built lazily by byte_tables()
+    _enc_table: Optional[List[int]] = field(default=None, init=False, repr=False, compare=False)
+    _dec_table: Optional[Dict[int, int]] = field(default=None, init=False, repr=False, compare=False)
+    # Decimal strings of n, e, d, p, q, built once by export_public/export_private
+    _export: Optional[Dict[str, str]] = field(default=None, init=False, repr=False, compare=False)
+
+    def __post_init__(self):
+        self.dP = self.d % (self.p - 1)
+        self.dQ = self.d % (self.q - 1)
+        self.qInv = modinv(self.q, self.p)
 
-def generate_rsa(bits: int = 1024) -> RSAKey:
+    def __getstate__(self):
+        # Lookup tables are rebuilt on demand, so keep them out of pickles sent to pool workers
+        state = self.__dict__.copy()
+        state['_enc_table'] = state['_dec_table'] = None
+        return state
+
+def generate_rsa(bits: int = 1024, stats: Optional[PrimeStats] = None, workers: int = 1,
+                 should_stop: Optional[Callable[[int], bool]] = None) -> RSAKey:
+    # should_stop(primes_found) is polled during the search (single worker only), see gen_prime
     half = bits // 2
-    p = gen_prime(half)
-    q = gen_prime(half)
-    while q == p:
-        q = gen_prime(half)
+    if workers > 1:
+        p, q = gen_primes_parallel(half, 2, workers, stats)
+    else:
+        poll = None
+        if should_stop is not None:
+            found = [0]
+            poll = lambda: should_stop(found[0])
+        p = gen_prime(half, stats, poll)
+        if poll is not None:
+            found[0] = 1
+            if poll():
+                raise GenerationCancelled()
+        q = gen_prime(half, stats, poll)
+        while q == p:
+            q = gen_prime(half, stats, poll)
+        if poll is not None:
+            # final progress report; a cancel arriving now is too late to matter
+            found[0] = 2
+            poll()
     n = p * q
     phi = (p - 1) * (q - 1)
     e = 65537
@@ -75,17 +292,58 @@ def generate_rsa(bits: int = 1024) -> RSAKey:
     d = modinv(e, phi)
     return RSAKey(n, e, d, p, q)
 
+def _exported(K: RSAKey) -> Dict[str, str]:
+    # int -> decimal is quadratic in CPython, so convert each key once (via gmpy2 when active)
+    if K._export is None:
+        K._export = {name: str(mpz(getattr(K, name))) for name in ("n", "e", "d", "p", "q")}
+    return K._export
+
 def export_public(K: RSAKey):
-    return {"e": str(K.e), "n": str(K.n)}
+    x = _exported(K)
+    return {"e": x["e"], "n": x["n"]}
 
 def export_private(K: RSAKey):
-    return {"d": str(K.d), "p": str(K.p), "q": str(K.q)}
+    x = _exported(K)
+    return {"d": x["d"], "p": x["p"], "q": x["q"]}
+
+def rsa_private(C: int, K: RSAKey, crt: bool = True) -> int:
+    # Garner's CRT recombination; crt=False keeps the full-modulus path for cross-checking
+    if not crt:
+        return powmod(C, K.d, K.n)
+    m1 = powmod(C, K.dP, K.p)
+    m2 = powmod(C, K.dQ, K.q)
+    h = (K.qInv * (m1 - m2)) % K.p
+    return m2 + h * K.q
+
+def byte_tables(K: RSAKey) -> Tuple[List[int], Dict[int, int]]:
+    # Byte mode only ever encrypts 0..255, so 256 public modexps cover every block a key can produce
+    if K._enc_table is None:
+        enc = [powmod(b, K.e, K.n) for b in range(256)]
+        dec: Dict[int, int] = {}
+        for b, c in enumerate(enc):
+            dec.setdefault(c, b)
+        K._dec_table = dec
+        K._enc_table = enc
+    return K._enc_table, K._dec_table
+
+def key_size_bytes(K: RSAKey) -> int:
+    # approximate memory held by a key: its integers plus the byte-mode tables and exports once built
+    size = sum(sys.getsizeof(v) for v in (K.n, K.e, K.d, K.p, K.q, K.dP, K.dQ, K.qInv))
+    if K._export is not None:
+        size += sum(sys.getsizeof(v) for v in K._export.values())
+    if K._enc_table is not None:
+        size += sys.getsizeof(K._enc_table) + sys.getsizeof(K._dec_table)
+        size += sum(sys.getsizeof(c) for c in K._enc_table)
+    return size
 
 def rsa_encrypt_text(text: str, K: RSAKey) -> List[int]:
-    return [pow(b, K.e, K.n) for b in text.encode('utf-8')]
+    enc, _ = byte_tables(K)
+    return [enc[b] for b in text.encode('utf-8')]
 
-def rsa_decrypt_text(blocks: List[int], K: RSAKey) -> str:
-    data = bytes(pow(c, K.d, K.n) % 256 for c in blocks)
+def rsa_decrypt_text(blocks: List[int], K: RSAKey, crt: bool = True) -> str:
+    _, dec = byte_tables(K)
+    # Blocks missing from the reverse table (e.g. made with another key) take the modexp path
+    data = bytes(b if (b := dec.get(c)) is not None else rsa_private(c, K, crt) % 256 for c in blocks)
     return data.decode('utf-8', 'ignore')
 
 def max_bytes_per_block(K: RSAKey) -> int:
@@ -102,16 +360,79 @@ def rsa_encrypt_packed(text: str, K: RSAKey) -> Tuple[List[int], List[int]]:
     for blk in _chunk(b, k):
         sizes.append(len(blk))
         M = int.from_bytes(blk, 'big')
-        blocks.append(pow(M, K.e, K.n))
+        blocks.append(powmod(M, K.e, K.n))
     return blocks, sizes
 
-def rsa_decrypt_packed(blocks: List[int], sizes: List[int], K: RSAKey) -> str:
+# Shard decryption across processes only above this many (blocks x modulus bits)
+PARALLEL_DECRYPT_THRESHOLD = 64 * 2048
+
+def _decrypt_shard(blocks: List[int], sizes: List[int], K: RSAKey, crt: bool = True) -> bytes:
     out = bytearray()
     for C, sz in zip(blocks, sizes):
-        M = pow(C, K.d, K.n)
+        M = rsa_private(C, K, crt)
         out.extend(M.to_bytes(sz, 'big'))
+    return bytes(out)
+
+def rsa_decrypt_packed(blocks: List[int], sizes: List[int], K: RSAKey, crt: bool = True,
+                       workers: int = 1, threshold: Optional[int] = None) -> str:
+    threshold = PARALLEL_DECRYPT_THRESHOLD if threshold is None else threshold
+    if workers > 1 and len(blocks) > 1 and len(blocks) * K.n.bit_length() >= threshold:
+        # one contiguous shard per worker, joined back in submission order
+        pool = get_pool(workers)
+        step = -(-len(blocks) // workers)
+        futures = [pool.submit(_decrypt_shard, blocks[i:i+step], sizes[i:i+step], K, crt)
+                   for i in range(0, len(blocks), step)]
+        out = b"".join(f.result() for f in futures)
+    else:
+        out = _decrypt_shard(blocks, sizes, K, crt)
     return out.decode('utf-8', 'ignore')
 
+def rsa_encrypt_stream(chunks: Iterable[bytes], K: RSAKey) -> Iterator[Tuple[int, int]]:
+    # Yields (block, size) as soon as a full block of input is buffered; memory stays at one block
+    k = max_bytes_per_block(K)
+    buf = bytearray()
+    for chunk in chunks:
+        buf.extend(chunk)
+        i = 0
+        while len(buf) - i >= k:
+            yield powmod(int.from_bytes(buf[i:i+k], 'big'), K.e, K.n), k
+            i += k
+        del buf[:i]
+    if buf:
+        yield powmod(int.from_bytes(buf, 'big'), K.e, K.n), len(buf)
+
+def rsa_decrypt_stream(blocks: Iterable[Tuple[int, int]], K: RSAKey, crt: bool = True) -> Iterator[bytes]:
+    # Yields raw plaintext bytes per block; UTF-8 decoding is left to the consumer
+    for C, sz in blocks:
+        yield rsa_private(C, K, crt).to_bytes(sz, 'big')
+
+# PSS-like signatures (demo, not the PKCS#1 encoding): the representative is an MGF1
+# expansion of SHA-256(salt || message), cut to n.bit_length() - 1 bits so it is below n
+SALT_LEN = 16
+
+def _mgf1(seed: bytes, length: int) -> bytes:
+    out = bytearray()
+    counter = 0
+    while len(out) < length:
+        out += hashlib.sha256(seed + counter.to_bytes(4, 'big')).digest()
+        counter += 1
+    return bytes(out[:length])
+
+def pss_encode(message: bytes, salt: bytes, K: RSAKey) -> int:
+    em_bits = K.n.bit_length() - 1
+    digest = hashlib.sha256(salt + message).digest()
+    em = int.from_bytes(_mgf1(digest, (em_bits + 7) // 8), 'big')
+    return em >> ((em_bits + 7) // 8 * 8 - em_bits)
+
+def rsa_sign(message: str, K: RSAKey, salt: Optional[bytes] = None, crt: bool = True) -> Tuple[int, bytes]:
+    salt = secrets.token_bytes(SALT_LEN) if salt is None else salt
+    return rsa_private(pss_encode(message.encode('utf-8'), salt, K), K, crt), salt
+
+def rsa_verify(message: str, signature: int, salt: bytes, K: RSAKey) -> bool:
+    if not 0 <= signature < K.n:
+        return False
+    return powmod(signature, K.e, K.n) == pss_encode(message.encode('utf-8'), salt, K)
+
 def int_list_to_b64(lst: List[int]) -> List[str]:
     return [base64.b64encode(i.to_bytes((i.bit_length()+7)//8 or 1,'big')).decode() for i in lst]
 
@@ -123,3 +444,60 @@ def pack_packed(blocks: List[int], sizes: List[int]) -> Dict[str, List]:
 
 def unpack_packed(payload: Dict[str, List]) -> Tuple[List[int], List[int]]:
     return b64_to_int_list(payload["c"]), list(map(int, payload["sizes"]))
+
+def product_tree(X: List[int]) -> List[list]:
+    # level 0 holds the inputs, each level above the pairwise products, the root is prod(X)
+    tree = [[mpz(x) for x in X]]
+    while len(tree[-1]) > 1:
+        level = tree[-1]
+        tree.append([level[i] * level[i+1] if i + 1 < len(level) else level[i]
+                     for i in range(0, len(level), 2)])
+    return tree
+
+def remainder_tree(tree: List[list]) -> list:
+    # push the root down: at the leaves this yields prod(X) mod X_i^2
+    rems = tree[-1]
+    for level in reversed(tree[:-1]):
+        rems = [rems[i // 2] % (x * x) for i, x in enumerate(level)]
+    return rems
+
+def batch_gcd(moduli: List[int]) -> List[int]:
+    # Bernstein's batch GCD: gcd(N_i, prod_{j != i} N_j) for every i in quasi-linear time.
+    # A result other than 1 means N_i shares a prime with another modulus (N_i itself: both primes).
+    if len(moduli) < 2:
+        return [1] * len(moduli)
+    tree = product_tree(moduli)
+    rems = remainder_tree(tree)
+    gcd = gmpy2.gcd if BACKEND == "gmpy2" else math.gcd
+    return [int(gcd(r // n, n)) for r, n in zip(rems, tree[0])]
+
+# Binary wire format: header (block count, plaintext length of the last block), then every
+# block as a fixed-width big-endian integer of block_width(K) bytes. All blocks but the last
+# carry max_bytes_per_block(K) plaintext bytes in packed mode and 1 byte in text mode.
+WIRE_HEADER = struct.Struct(">IH")
+
+def block_width(K: RSAKey) -> int:
+    return (K.n.bit_length() + 7) // 8
+
+def pack_binary(blocks: List[int], K: RSAKey, last_size: int = 1) -> bytes:
+    w = block_width(K)
+    out = bytearray(WIRE_HEADER.pack(len(blocks), last_size if blocks else 0))
+    for C in blocks:
+        out += C.to_bytes(w, 'big')
+    return bytes(out)
+
+def unpack_binary(data: bytes, K: RSAKey, packed: bool = True) -> Tuple[List[int], List[int]]:
+    mv = memoryview(data)
+    if len(mv) < WIRE_HEADER.size:
+        raise ValueError("Binary ciphertext shorter than header")
+    count, last = WIRE_HEADER.unpack_from(mv)
+    w = block_width(K)
+    body = mv[WIRE_HEADER.size:]
+    if len(body) != count * w:
+        raise ValueError("Binary ciphertext length does not match block count")
+    blocks = [int.from_bytes(body[i:i+w], 'big') for i in range(0, count * w, w)]
+    full = max_bytes_per_block(K) if packed else 1
+    if count and not 1 <= last <= full:
+        raise ValueError(f"Binary ciphertext last block length {last} out of range 1..{full}")
+    sizes = [full] * (count - 1) + [last] if count else []
+    return blocks, sizes
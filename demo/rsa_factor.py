@@ -0,0 +1,109 @@
+# rsa_factor.py - Phân tích thừa số n nhỏ (demo tấn công): trial division, Fermat, Pollard rho (Brent), Pollard p-1
+import math
+import secrets
+from typing import Callable, Dict, Optional, Tuple
+
+# Every method returns (factor or None, iterations). should_stop(iterations) is polled every
+# CHECK_EVERY steps; returning True makes the method give up (deadline or cancellation).
+StopFn = Callable[[int], bool]
+CHECK_EVERY = 4096
+
+def trial_division(n: int, should_stop: StopFn) -> Tuple[Optional[int], int]:
+    if n % 2 == 0:
+        return 2, 1
+    limit = math.isqrt(n)
+    it = 0
+    for d in range(3, limit + 1, 2):
+        if n % d == 0:
+            return d, it
+        it += 1
+        if it % CHECK_EVERY == 0 and should_stop(it):
+            return None, it
+    return None, it
+
+def fermat(n: int, should_stop: StopFn) -> Tuple[Optional[int], int]:
+    # Fast when p and q are close: searches a with a^2 - n a perfect square
+    if n % 2 == 0:
+        return 2, 1
+    a = math.isqrt(n)
+    if a * a < n:
+        a += 1
+    b2 = a * a - n
+    it = 0
+    # past (n + 9) // 6 the search could only return the trivial factorization
+    while a <= (n + 9) // 6:
+        b = math.isqrt(b2)
+        if b * b == b2:
+            f = a - b
+            return (f, it) if 1 < f < n else (None, it)
+        b2 += 2 * a + 1
+        a += 1
+        it += 1
+        if it % CHECK_EVERY == 0 and should_stop(it):
+            return None, it
+    return None, it
+
+def pollard_rho_brent(n: int, should_stop: StopFn) -> Tuple[Optional[int], int]:
+    if n % 2 == 0:
+        return 2, 1
+    it = 0
+    m = 128
+    while True:
+        y, c = secrets.randbelow(n - 1) + 1, secrets.randbelow(n - 1) + 1
+        g = r = q = 1
+        x = ys = y
+        while g == 1:
+            x = y
+            for _ in range(r):
+                y = (y * y + c) % n
+                it += 1
+                if it % CHECK_EVERY == 0 and should_stop(it):
+                    return None, it
+            k = 0
+            while k < r and g == 1:
+                ys = y
+                for _ in range(min(m, r - k)):
+                    y = (y * y + c) % n
+                    q = q * abs(x - y) % n
+                g = math.gcd(q, n)
+                k += m
+                it += m
+                if it % CHECK_EVERY < m and should_stop(it):
+                    return None, it
+            r *= 2
+        if g == n:
+            # the batched product overshot; step back one at a time
+            g = 1
+            while g == 1:
+                ys = (ys * ys + c) % n
+                g = math.gcd(abs(x - ys), n)
+        if g != n:
+            return g, it
+        # unlucky cycle, retry with a new polynomial
+
+def pollard_pm1(n: int, should_stop: StopFn) -> Tuple[Optional[int], int]:
+    # a^(k!) mod n for growing k; finds p when p - 1 is smooth
+    if n % 2 == 0:
+        return 2, 1
+    a = 2
+    k = 2
+    while True:
+        a = pow(a, k, n)
+        if k % 64 == 0:
+            g = math.gcd(a - 1, n)
+            if g == n:
+                return None, k
+            if g > 1:
+                return g, k
+        if k % CHECK_EVERY == 0 and should_stop(k):
+            return None, k
+        k += 1
+
+# Ordered by how quickly they usually crack a random demo modulus, so they start first
+# when there are fewer workers than methods
+METHODS: Dict[str, Callable[[int, StopFn], Tuple[Optional[int], int]]] = {
+    'rho': pollard_rho_brent,
+    'pm1': pollard_pm1,
+    'fermat': fermat,
+    'trial': trial_division,
+}
@@ -49,20 +49,57 @@ export const ApiService = {
     return response.data;
   },
 
-  // Removed sign/verify/factor API as backend no longer supports them
+  sign: async (keyId, message) => {
+    const response = await api.post('/api/sign', {
+      key_id: keyId,
+      message: message,
+    });
+    return response.data;
+  },
+
+  verify: async (keyId, message, signature, salt) => {
+    const response = await api.post('/api/verify', {
+      key_id: keyId,
+      message: message,
+      signature: signature,
+      salt: salt,
+    });
+    return response.data;
+  },
 
   saveLog: async (logData) => {
     const response = await api.post('/api/logs', logData);
     return response.data;
   },
 
-  getLogs: async (limit = 50) => {
-    const response = await api.get(`/api/logs?limit=${limit}`);
+  saveLogs: async (logs) => {
+    const response = await api.post('/api/logs/batch', { items: logs });
     return response.data;
   },
 
-  clearLogs: async () => {
-    const response = await api.delete('/api/logs/clear');
+  getLogs: async (limit = 50, { cursor, operation, keyId, since, until } = {}) => {
+    const response = await api.get('/api/logs', {
+      params: { limit, cursor, operation, key_id: keyId, since, until },
+    });
+    return response.data;
+  },
+
+  getStats: async ({ since, until, bucket, operation, bitLength } = {}) => {
+    const response = await api.get('/api/stats', {
+      params: { since, until, bucket, operation, bit_length: bitLength },
+    });
     return response.data;
   },
+
+  clearLogs: async () => {
+    // the server deletes a bounded number of batches per request; repeat until it is done
+    let deleted = 0;
+    let data;
+    do {
+      const response = await api.delete('/api/logs/clear');
+      data = response.data;
+      deleted += data.deleted || 0;
+    } while (data.success && data.more);
+    return { ...data, deleted };
+  },
 };